@@ -0,0 +1,281 @@
+# analytics.py
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cardset import default_index
+from engine import (ATTACK_MOVE, DEFEND, HAND_SIZE, OVER, TAKE, Game, greedy_policy,
+                    random_policy)
+from factions import FACTIONS
+
+# Счетчики на (партия, игрок, карта)
+PLAYED, DEFENDED, COVERED, TAKEN = range(4)
+COUNTER_NAMES = ("played", "defended", "covered", "taken")
+CHUNK_GAMES = 1000          # Партий в одной задаче пула
+RANK_BUCKETS = 10           # Группы стартовых рук по сумме рангов
+CHUNK_ROWS = 1 << 18        # Партий в одном блоке агрегации
+
+POLICIES = {"greedy": greedy_policy, "random": random_policy}
+
+
+class Records:
+    """
+    Поколоночные записи партий.
+
+    winner (партии,) int8 - победитель, 0 или 1; first (партии,) int8 -
+    первый атакующий; turns (партии,) int16; opening (партии, 2, карты) bool -
+    стартовые руки; counts (партии, 2, 4, карты) uint8 - сколько раз игрок
+    сыграл карту в атаку, покрыл ею, получил покрытой свою атаку этой картой
+    и забрал ее со стола (см. COUNTER_NAMES, значения ограничены 255).
+    """
+
+    def __init__(self, winner, first, turns, opening, counts):
+        self.winner = winner
+        self.first = first
+        self.turns = turns
+        self.opening = opening
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.winner)
+
+    @classmethod
+    def concatenate(cls, parts):
+        return cls(*(np.concatenate([getattr(part, name) for part in parts])
+                     for name in ("winner", "first", "turns", "opening", "counts")))
+
+    def save(self, path):
+        np.savez_compressed(path, winner=self.winner, first=self.first, turns=self.turns,
+                            opening=self.opening, counts=self.counts)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["winner"], data["first"], data["turns"], data["opening"], data["counts"])
+
+
+def _simulate_chunk(task):
+    """Играет партии одной задачи; считает события в списках и переносит их в массивы один раз на партию."""
+    n_games, seed, policy_names = task
+    policies = tuple(POLICIES[name] for name in policy_names)
+    index = default_index()
+    size = len(index)
+    bits = index.bits
+    rng = random.Random(seed)
+    winner = np.empty(n_games, np.int8)
+    first = np.empty(n_games, np.int8)
+    turns = np.empty(n_games, np.int16)
+    opening = np.zeros((n_games, 2, size), bool)
+    counts = np.zeros((n_games, 2 * 4 * size), np.uint8)
+
+    for g in range(n_games):
+        game = Game.new_game(rng)
+        first[g] = game.attacker
+        for player in (0, 1):
+            for card in game.hand(player):
+                opening[g, player, bits[card].bit_length() - 1] = True
+        row = [0] * (2 * 4 * size)
+        while game.phase != OVER:
+            attacker, defender = game.attacker, game.defender
+            kind, cards = action = policies[game.to_move](game, rng)
+            if kind == ATTACK_MOVE:
+                base = (attacker * 4 + PLAYED) * size
+                for card in cards:
+                    row[base + bits[card].bit_length() - 1] += 1
+            elif kind == DEFEND:
+                base = (defender * 4 + DEFENDED) * size
+                covered = (attacker * 4 + COVERED) * size
+                for i, card in zip(game.uncovered_attacks(), cards):
+                    row[base + bits[card].bit_length() - 1] += 1
+                    row[covered + bits[game.table[i][0]].bit_length() - 1] += 1
+            elif kind == TAKE:
+                base = (defender * 4 + TAKEN) * size
+                for pair in game.table:
+                    for card in pair:
+                        if card is not None:
+                            row[base + bits[card].bit_length() - 1] += 1
+            game.step(action, validate=False)
+        winner[g] = game.winner
+        turns[g] = game.turns
+        counts[g] = np.minimum(row, 255)
+    return Records(winner, first, turns, opening, counts.reshape(n_games, 2, 4, size))
+
+
+def simulate(n_games, policies=("greedy", "greedy"), seed=0, workers=None):
+    """Играет n_games партий (политики по именам из POLICIES) и возвращает Records."""
+    tasks = []
+    for start in range(0, n_games, CHUNK_GAMES):
+        tasks.append((min(CHUNK_GAMES, n_games - start),
+                      random.Random(f"{seed}:{start}").getrandbits(64), tuple(policies)))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        parts = [_simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_simulate_chunk, tasks))
+    return Records.concatenate(parts)
+
+
+def faction_matrix(index=None):
+    """(карты, фракции) bool: принадлежность карт фракциям; столбцы - sorted(FACTIONS)."""
+    index = index or default_index()
+    faction_ids = sorted(FACTIONS)
+    return np.array([[(mask >> (fid - 1)) & 1 for fid in faction_ids]
+                     for mask in index.faction_masks], bool), faction_ids
+
+
+def analyze(records, index=None):
+    """
+    Сводка по картам, фракциям и стартовым рукам.
+
+    Очко игрока в партии: 1 за победу, 0 за поражение. Процент побед карты -
+    среднее очко игроков, у которых карта была в стартовой руке (opening)
+    или которые сыграли ее хотя бы раз (played); аналогично для фракций.
+
+    Returns:
+        dict: массивы NumPy по ключам cards, factions, openings
+    """
+    index = index or default_index()
+    size = len(index)
+    winner = records.winner
+    score = np.empty((len(records), 2), np.float32)
+    score[:, 0] = winner == 0
+    score[:, 1] = 1.0 - score[:, 0]
+
+    membership, faction_ids = faction_matrix(index)
+    membership_f = membership.astype(np.float32)
+    ranks = np.array(index.ranks, np.float32)
+    opening_games = np.zeros(size, np.int64)
+    opening_score = np.zeros(size)
+    played_games = np.zeros(size, np.int64)
+    played_score = np.zeros(size)
+    totals = np.zeros((4, size), np.int64)
+    faction_games = np.zeros(len(faction_ids), np.int64)
+    faction_score = np.zeros(len(faction_ids))
+    hand_rank = np.empty(2 * len(records), np.float32)
+    largest_group = np.empty(2 * len(records), np.int64)
+
+    # Обработка блоками: промежуточные float32-матрицы ограничены CHUNK_ROWS строками,
+    # а произведения считаются через BLAS (целочисленный matmul в NumPy намного медленнее)
+    for start in range(0, len(records), CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, len(records))
+        rows = slice(2 * start, 2 * stop)
+        weights = score[start:stop].reshape(-1)
+        opening = records.opening[start:stop].reshape(-1, size).astype(np.float32)
+        opening_games += opening.sum(axis=0, dtype=np.int64)
+        opening_score += weights @ opening
+        counts = records.counts[start:stop]
+        played = (counts[:, :, PLAYED, :] > 0).reshape(-1, size).astype(np.float32)
+        played_games += played.sum(axis=0, dtype=np.int64)
+        played_score += weights @ played
+        totals += counts.sum(axis=(0, 1), dtype=np.int64)
+        faction_opening = opening @ membership_f                      # (партии * 2, фракции)
+        holds = faction_opening > 0
+        faction_games += holds.sum(axis=0)
+        faction_score += weights @ holds.astype(np.float32)
+        hand_rank[rows] = opening @ ranks
+        largest_group[rows] = faction_opening.max(axis=1)
+
+    edges = np.quantile(hand_rank, np.linspace(0, 1, RANK_BUCKETS + 1)[1:-1])
+    bucket = np.digitize(hand_rank, edges)
+    score = score.reshape(-1)
+    first_score = score[2 * np.arange(len(records)) + records.first]
+
+    def rate(total, count):
+        return np.divide(total, count, out=np.full(len(count), np.nan), where=count > 0)
+
+    return {
+        "cards": {
+            "opening_games": opening_games,
+            "opening_win_rate": rate(opening_score, opening_games),
+            "played_games": played_games,
+            "played_win_rate": rate(played_score, played_games),
+            **{f"{name}_total": totals[kind] for kind, name in enumerate(COUNTER_NAMES)},
+        },
+        "factions": {
+            "ids": np.array(faction_ids),
+            "card_count": membership.sum(axis=0),
+            "opening_games": faction_games,
+            "opening_win_rate": rate(faction_score, faction_games),
+            **{f"{name}_total": totals[kind] @ membership.astype(np.int64)
+               for kind, name in enumerate(COUNTER_NAMES)},
+        },
+        "openings": {
+            "rank_edges": edges,
+            "rank_bucket_games": np.bincount(bucket, minlength=RANK_BUCKETS),
+            "rank_bucket_win_rate": rate(np.bincount(bucket, score, RANK_BUCKETS),
+                                         np.bincount(bucket, minlength=RANK_BUCKETS)),
+            "largest_group_games": np.bincount(largest_group, minlength=HAND_SIZE + 1),
+            "largest_group_win_rate": rate(np.bincount(largest_group, score, HAND_SIZE + 1),
+                                           np.bincount(largest_group, minlength=HAND_SIZE + 1)),
+            "first_attacker_win_rate": float(first_score.mean()),
+            "mean_turns": float(records.turns.mean()),
+        },
+    }
+
+
+def print_report(summary, index=None, top=10):
+    index = index or default_index()
+    cards = summary["cards"]
+    openings = summary["openings"]
+    print(f"First attacker wins {openings['first_attacker_win_rate']:.3f}, "
+          f"mean turns {openings['mean_turns']:.1f}")
+
+    order = np.argsort(-np.nan_to_num(cards["opening_win_rate"], nan=-1))
+    print(f"\n{'card':<28}{'rank':>5}{'open win':>10}{'play win':>10}"
+          + "".join(f"{name:>10}" for name in COUNTER_NAMES))
+    shown = list(order[:top]) + list(order[-top:]) if len(order) > 2 * top else list(order)
+    for i in shown:
+        card = index.cards[i]
+        print(f"{card.name[:27]:<28}{card.rank:>5}{cards['opening_win_rate'][i]:>10.3f}"
+              f"{cards['played_win_rate'][i]:>10.3f}"
+              + "".join(f"{cards[name + '_total'][i]:>10}" for name in COUNTER_NAMES))
+
+    factions = summary["factions"]
+    print(f"\n{'faction':<28}{'cards':>6}{'open win':>10}{'played':>10}")
+    for j in np.argsort(-np.nan_to_num(factions["opening_win_rate"], nan=-1)):
+        if factions["card_count"][j]:
+            print(f"{FACTIONS[int(factions['ids'][j])][:27]:<28}{factions['card_count'][j]:>6}"
+                  f"{factions['opening_win_rate'][j]:>10.3f}{factions['played_total'][j]:>10}")
+
+    print("\nOpening hand rank sum (deciles):")
+    edges = [-np.inf, *openings["rank_edges"], np.inf]
+    for b in range(RANK_BUCKETS):
+        print(f"  {edges[b]:>6.0f} .. {edges[b + 1]:<6.0f}{openings['rank_bucket_win_rate'][b]:>8.3f}")
+    print("Largest single-faction group in opening hand:")
+    for size, games in enumerate(openings["largest_group_games"]):
+        if games:
+            print(f"  {size}: {openings['largest_group_win_rate'][size]:.3f} ({games} hands)")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Card balance analytics from simulated games.")
+    parser.add_argument("games", nargs="?", type=int, default=10000)
+    parser.add_argument("--policies", nargs=2, default=["greedy", "greedy"], choices=sorted(POLICIES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--save", help="save columnar records to this .npz file")
+    parser.add_argument("--load", help="report on saved records instead of simulating")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.load:
+        records = Records.load(args.load)
+    else:
+        records = simulate(args.games, args.policies, args.seed, args.workers)
+        print(f"Simulated {len(records)} games in {time.perf_counter() - start:.1f}s")
+        if args.save:
+            records.save(args.save)
+    start = time.perf_counter()
+    summary = analyze(records)
+    print(f"Aggregated {len(records)} games in {time.perf_counter() - start:.3f}s\n")
+    print_report(summary)
+
+
+if __name__ == "__main__":
+    main()
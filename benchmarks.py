@@ -0,0 +1,383 @@
+# benchmarks.py
+
+import contextlib
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from deck import Deck, populate_deck
+from engine import greedy_policy, play_game
+from faction_manager import FactionManager
+from player import Player, deal_cards
+
+SEED = 0
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json")
+DEFAULT_THRESHOLD = 0.3   # Допустимое падение ops/sec и рост памяти на операцию (доля)
+MEMORY_SLACK = 256        # Байт на операцию, которые не считаются регрессией памяти
+GAMES_PER_BATCH = 5
+PROCESSES = 3             # Сколько процессов замеряют каждый бенчмарк (см. run)
+
+# Имя -> функция подготовки; она возвращает пакет: функцию без аргументов,
+# которая выполняет одинаковую работу при каждом вызове и возвращает число операций
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Регистрирует функцию подготовки бенчмарка под именем name."""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def _deck():
+    deck = Deck()
+    populate_deck(deck)
+    return deck
+
+
+@benchmark("populate_deck")
+def _populate_deck():
+    def batch():
+        populate_deck(Deck())
+        return 1
+    return batch
+
+
+@benchmark("deal_cards")
+def _deal_cards():
+    cards = _deck().cards
+    random.Random(SEED).shuffle(cards)
+    deck = Deck()
+
+    def batch():
+        deck.cards = cards[:]
+        deal_cards(deck, [Player("Player 1"), Player("Player 2")])
+        return 1
+    return batch
+
+
+@benchmark("faction_manager")
+def _faction_manager():
+    # Ходы: атака до 6 карт в свободные пары, защита, снятие части карт, очистка стола
+    rng = random.Random(SEED)
+    cards = _deck().cards
+    turns = []
+    for _ in range(50):
+        hand = rng.sample(cards, 12)
+        turns.append((hand[:6], hand[6:]))
+    manager = FactionManager()
+
+    def batch():
+        operations = 0
+        for attacks, defenses in turns:
+            for j, (attack, defense) in enumerate(zip(attacks, defenses)):
+                operations += 3
+                if manager.validate_multiple_cards([attack]):
+                    manager.add_card_factions(attack, j * 2)
+                manager.add_card_factions(defense, j * 2 + 1)
+            operations += 2
+            manager.validate_multiple_cards(attacks[:2])
+            manager.remove_card_factions(1)
+            manager.clear()
+        return operations
+    return batch
+
+
+class _Discard:
+    """Поток вывода, который ничего не хранит (print без буферов и файлов)."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+@benchmark("shared_factions")
+def _shared_factions():
+    from main import find_cards_with_shared_factions
+    deck = _deck()
+    names = [card.name for card in random.Random(SEED).sample(deck.cards, 10)]
+    sink = _Discard()
+
+    def batch():
+        with contextlib.redirect_stdout(sink):
+            for name in names:
+                find_cards_with_shared_factions(deck, name)
+        return len(names)
+    return batch
+
+
+@benchmark("simulated_game")
+def _simulated_game():
+    policies = (greedy_policy, greedy_policy)
+
+    def batch():
+        for seed in range(SEED, SEED + GAMES_PER_BATCH):
+            play_game(policies, random.Random(seed))
+        return GAMES_PER_BATCH
+    return batch
+
+
+@benchmark("draw_card")
+def _draw_card():
+    import game_interface
+    screen = game_interface.init_display(headless=True)
+    cards = _deck().cards
+    positions = [(50 + i % 6 * 110, 50 + i // 6 % 3 * 160) for i in range(len(cards))]
+    for card in cards:
+        game_interface.card_face(card)
+
+    def batch():
+        for card, (x, y) in zip(cards, positions):
+            game_interface.draw_card(screen, card, x, y)
+        return len(cards)
+    return batch
+
+
+@benchmark("import_game_interface")
+def _import_game_interface():
+    # Холодный импорт в новом интерпретаторе: pygame, engine и mcts не должны грузиться
+    command = [sys.executable, "-c", "import game_interface"]
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def batch():
+        subprocess.run(command, check=True, cwd=directory)
+        return 1
+    return batch
+
+
+@benchmark("hint_worker_startup")
+def _hint_worker_startup():
+    # Запуск процесса HintWorker и первая оценка позиции с минимальным бюджетом
+    from engine import Game
+    from game_interface import HintWorker
+    game = Game.new_game(random.Random(SEED))
+
+    def batch():
+        worker = HintWorker(time_budget=0.001, seed=SEED)
+        try:
+            while worker.request(game) is None:
+                time.sleep(0.001)
+        finally:
+            worker.close()
+        return 1
+    return batch
+
+
+def _calibration():
+    """
+    Эталонная нагрузка на чистом Python. Она замеряется рядом с каждым
+    повтором бенчмарка, и скорость сравнивается в единицах эталона, поэтому
+    baseline переживает смену машины и колебания частоты процессора.
+    """
+    values = list(range(1000))
+
+    def batch():
+        table = {}
+        for value in values:
+            table[value & 63] = table.get(value & 63, 0) + value * 3
+        return 1
+    return batch
+
+
+def faction_scaling(rounds=20000):
+    """
+    Стоимость карты FactionManager в зависимости от числа слотов и фракций
+    (стол и набор фракций настраиваются). Печатает таблицу; не входит в baseline.
+    """
+    from card import Card
+    rng = random.Random(SEED)
+    print(f"{'slots':>6}{'factions':>10}{'per card':>10}{'us/card':>10}")
+    for slot_count in (12, 48, 192):
+        for faction_count, per_card in ((24, 3), (256, 16), (1024, 64)):
+            cards = []
+            for i in range(200):
+                card_mask = 0
+                for faction in rng.sample(range(faction_count), per_card):
+                    card_mask |= 1 << faction
+                cards.append(Card.from_mask(f"Card {i}", 1, card_mask))
+            manager = FactionManager(slot_count)
+            # Ход: карта в каждый слот, треть слотов освобождается, стол очищается
+            played = 0
+            start = time.perf_counter()
+            for _ in range(max(rounds // slot_count, 1)):
+                for slot_index in range(slot_count):
+                    manager.add_card_factions(rng.choice(cards), slot_index)
+                for slot_index in range(0, slot_count, 3):
+                    manager.remove_card_factions(slot_index)
+                manager.validate_multiple_cards(rng.sample(cards, 2))
+                manager.clear()
+                played += slot_count
+            elapsed = time.perf_counter() - start
+            print(f"{slot_count:>6}{faction_count:>10}{per_card:>10}{elapsed / played * 1e6:>10.2f}")
+
+
+def _rate(batch, min_time):
+    operations = 0
+    start = time.perf_counter()
+    while True:
+        operations += batch()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return operations / elapsed
+
+
+def measure(batch, min_time=0.2, repeats=7, calibration=None):
+    """
+    Скорость и память пакета.
+
+    Returns:
+        dict: ops_per_sec - лучший из repeats замеров длительностью не меньше
+        min_time (сборщик мусора на время замеров выключен, как в timeit);
+        relative - отношение лучшей скорости к лучшей скорости эталона
+        (_calibration), замеренного перед каждым повтором; bytes_per_op - наименьший из
+        repeats пиков выделенной памяти (tracemalloc) за один пакет,
+        деленный на число его операций
+    """
+    calibration = calibration or _calibration()
+    batch()  # Прогрев кэшей
+    rates = []
+    references = []
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            references.append(_rate(calibration, min_time / 2))
+            rates.append(_rate(batch, min_time))
+    finally:
+        if collecting:
+            gc.enable()
+
+    memory = None
+    tracemalloc.start()
+    try:
+        for _ in range(repeats):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            operations = batch()
+            growth = max(tracemalloc.get_traced_memory()[1] - before, 0) / operations
+            memory = growth if memory is None else min(memory, growth)
+    finally:
+        tracemalloc.stop()
+    return {"ops_per_sec": max(rates), "relative": max(rates) / max(references), "bytes_per_op": memory}
+
+
+def run(names=None, min_time=0.2, repeats=7, processes=PROCESSES):
+    """
+    Запускает бенчмарки names (по умолчанию все); возвращает {имя: результат measure}.
+
+    Каждый бенчмарк замеряется в processes новых процессах: реестр карт,
+    индексы и ключи Zobrist, заполненные предыдущими бенчмарками, иначе
+    меняют и скорость, и пик памяти следующих. Скорость одного и того же
+    кода от процесса к процессу отличается до полутора раз (размещение
+    данных в памяти), поэтому берутся лучшие скорость и память из процессов.
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", name,
+                   "--min-time", str(min_time), "--repeats", str(repeats)]
+        best = None
+        for _ in range(processes):
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            # Результат - последняя строка: импортируемые модули могут печатать свое
+            result = json.loads(output.splitlines()[-1])
+            if best is None:
+                best = result
+            else:
+                best = {"ops_per_sec": max(best["ops_per_sec"], result["ops_per_sec"]),
+                        "relative": max(best["relative"], result["relative"]),
+                        "bytes_per_op": min(best["bytes_per_op"], result["bytes_per_op"])}
+        results[name] = best
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Сравнивает результаты с базовыми: скорость - по relative, память - по bytes_per_op.
+
+    Returns:
+        list: Строки с описанием регрессий (пустой, если регрессий нет)
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        change = result["relative"] / reference["relative"] - 1
+        if change < -threshold:
+            regressions.append(f"{name}: {change:+.1%} speed relative to the baseline")
+        if result["bytes_per_op"] > reference["bytes_per_op"] * (1 + threshold) + MEMORY_SLACK:
+            regressions.append(f"{name}: {result['bytes_per_op']:.0f} B/op, "
+                               f"baseline {reference['bytes_per_op']:.0f} B/op")
+    return regressions
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark core game operations against a stored baseline.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown / memory growth before failing")
+    parser.add_argument("--update", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--processes", type=int, default=PROCESSES, help="fresh processes per benchmark")
+    parser.add_argument("--faction-scaling", type=int, metavar="ROUNDS", nargs="?", const=20000,
+                        help="print FactionManager cost per card for large tables and faction sets, then exit")
+    parser.add_argument("--worker", choices=BENCHMARKS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.faction_scaling is not None:
+        faction_scaling(args.faction_scaling)
+        return
+    if args.worker:
+        # Процесс, запущенный run(): один бенчмарк, результат - JSON в stdout
+        print(json.dumps(measure(BENCHMARKS[args.worker](), args.min_time, args.repeats)))
+        return
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    # Baseline записывается с теми же повторами, что и проверка: лучший из
+    # большего числа замеров систематически быстрее
+    results = run(args.names, args.min_time, args.repeats, args.processes)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as source:
+            baseline = json.load(source)
+
+    print(f"{'benchmark':<20}{'ops/sec':>14}{'change':>9}{'B/op':>12}{'baseline B/op':>15}")
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference:
+            change = f"{result['relative'] / reference['relative'] - 1:+.1%}"
+            known = f"{reference['bytes_per_op']:.0f}"
+        else:
+            change, known = "", "-"
+        print(f"{name:<20}{result['ops_per_sec']:>14.1f}{change:>9}{result['bytes_per_op']:>12.0f}{known:>15}")
+
+    if args.update:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as output:
+            json.dump(baseline, output, indent=2, sort_keys=True)
+            output.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
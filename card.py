@@ -1,30 +1,67 @@
 # card.py
 
-from factions import FACTIONS
+from factions import FACTIONS, faction_mask, mask_to_ids
 
 class Card:
+    """
+    A card. Cards returned by ``register`` are shared flyweights: each name
+    exists once per process and the object is frozen, so zones hold plain
+    references and ``is`` comparison is reliable.
+    """
+    __slots__ = ('name', 'rank', 'faction_mask', '_faction_ids', '_frozen')
+
     def __init__(self, name, rank):
+        self._frozen = False
         self.name = name
         self.rank = rank
-        self.faction_ids = set()
+        self.faction_mask = 0  # Фракции карты в виде битовой маски
+        self._faction_ids = frozenset()
+
+    def __setattr__(self, attribute, value):
+        if attribute != '_frozen' and getattr(self, '_frozen', False):
+            raise AttributeError(f"Card '{self.name}' is registered and immutable")
+        object.__setattr__(self, attribute, value)
+
+    def __reduce__(self):
+        return _rebuild_card, (self.name, self.rank, self.faction_mask, self._frozen)
+
+    @classmethod
+    def from_mask(cls, name, rank, faction_mask):
+        """Create a card from an already validated faction bitmask (see catalog.py)."""
+        card = cls(name, rank)
+        card.faction_mask = faction_mask
+        card._faction_ids = frozenset(mask_to_ids(faction_mask))
+        return card
+
+    @property
+    def faction_ids(self):
+        """Set view of the card's factions, built from faction_mask."""
+        return self._faction_ids
+
+    @faction_ids.setter
+    def faction_ids(self, faction_ids):
+        self.faction_mask = faction_mask(faction_ids)
+        self._faction_ids = frozenset(faction_ids)
 
     def add_faction(self, faction_id):
         """Add faction to the card by its ID."""
         if faction_id in FACTIONS:
-            self.faction_ids.add(faction_id)
+            self.faction_mask |= 1 << (faction_id - 1)
+            self._faction_ids = frozenset(mask_to_ids(self.faction_mask))
         else:
             print(f"Faction with ID '{faction_id}' does not exist.")
 
     def remove_faction(self, faction_id):
         """Remove faction from the card by its ID."""
-        if faction_id in self.faction_ids:
-            self.faction_ids.remove(faction_id)
+        if faction_id in self._faction_ids:
+            self.faction_mask &= ~(1 << (faction_id - 1))
+            self._faction_ids = frozenset(mask_to_ids(self.faction_mask))
         else:
             print(f"Faction with ID '{faction_id}' not found in card '{self.name}'.")
 
     def has_faction(self, faction_id):
         """Check if the card belongs to the specified faction by its ID."""
-        return faction_id in self.faction_ids
+        return faction_id in self._faction_ids
 
     def __str__(self):
         factions_str = ', '.join(FACTIONS[fid] for fid in self.faction_ids) if self.faction_ids else 'none'
@@ -37,4 +74,37 @@ class Card:
     #     """Determine active factions based on the current active factions."""
     #     if not active_factions:
     #         return self.faction_ids
-    #     return self.faction_ids.intersection(active_factions)
\ No newline at end of file
+    #     return self.faction_ids.intersection(active_factions)
+
+
+# Реестр карт: одна общая неизменяемая карта на имя
+_registry = {}
+
+def register(card):
+    """
+    Return the shared card with card's name, registering and freezing card if it is new.
+
+    Raises ValueError if a card with the same name but another rank or factions
+    is already registered.
+    """
+    existing = _registry.get(card.name)
+    if existing is None:
+        card._frozen = True
+        _registry[card.name] = card
+        return card
+    if existing.rank != card.rank or existing.faction_mask != card.faction_mask:
+        raise ValueError(f"Card '{card.name}' is already registered with different rank or factions")
+    return existing
+
+def lookup(name):
+    """Return the registered card with this name or None."""
+    return _registry.get(name)
+
+def registered_cards():
+    """All registered cards in registration order."""
+    return tuple(_registry.values())
+
+def _rebuild_card(name, rank, faction_mask, frozen):
+    # При передаче в другой процесс зарегистрированная карта становится картой его реестра
+    card = Card.from_mask(name, rank, faction_mask)
+    return register(card) if frozen else card
@@ -0,0 +1,96 @@
+# cardset.py
+
+from deck import card_catalog
+
+WORD_BITS = 64
+
+
+def iter_bits(mask):
+    """Номера установленных битов маски по возрастанию."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def to_words(mask, words):
+    """Маска как список 64-битных слов (младшее слово первым)."""
+    return [(mask >> (WORD_BITS * i)) & ((1 << WORD_BITS) - 1) for i in range(words)]
+
+
+def from_words(words):
+    """Обратное преобразование к to_words."""
+    mask = 0
+    for i, word in enumerate(words):
+        mask |= word << (WORD_BITS * i)
+    return mask
+
+
+class CardIndex:
+    """
+    Нумерация набора карт для битбордов: карта с номером i - бит 1 << i.
+
+    Множество карт (рука, стол, сброс) хранится одним int. Для базового
+    набора из 60 карт это одно 64-битное слово; для больших наборов int
+    Python сам становится многословным, а to_words дает фиксированное
+    число слов (words) для хранения вне Python.
+    Карты сопоставляются по объекту, поэтому индекс строится из тех же
+    объектов Card, что лежат в руках.
+    """
+
+    def __init__(self, cards):
+        self.cards = tuple(cards)
+        self.bits = {card: 1 << i for i, card in enumerate(self.cards)}
+        if len(self.bits) != len(self.cards):
+            raise ValueError("CardIndex requires distinct card objects")
+        self.ranks = tuple(card.rank for card in self.cards)
+        self.faction_masks = tuple(card.faction_mask for card in self.cards)
+        self.all = (1 << len(self.cards)) - 1
+        self.words = max(1, -(-len(self.cards) // WORD_BITS))
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, card):
+        return card in self.bits
+
+    def bit(self, card):
+        return self.bits[card]
+
+    def mask(self, cards):
+        """Битборд из последовательности карт."""
+        bits = self.bits
+        mask = 0
+        for card in cards:
+            mask |= bits[card]
+        return mask
+
+    def cards_of(self, mask):
+        """Карты битборда в порядке номеров."""
+        cards = self.cards
+        return tuple(cards[i] for i in iter_bits(mask))
+
+
+_default_index = None
+
+
+def default_index():
+    """Индекс стандартного набора deck.card_catalog()."""
+    global _default_index
+    if _default_index is None:
+        _default_index = CardIndex(card_catalog())
+    return _default_index
+
+
+def index_for(cards):
+    """
+    Индекс, в котором есть все cards: стандартный, если подходит, иначе новый.
+
+    Новый индекс нужен для карт, созданных отдельно от deck.card_catalog()
+    (например, колода main.py).
+    """
+    index = default_index()
+    cards = list(cards)
+    if all(card in index for card in cards):
+        return index
+    return CardIndex(cards)
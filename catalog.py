@@ -0,0 +1,233 @@
+# catalog.py
+
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+
+import factions
+from card import Card, register
+from deck import Deck, card_catalog
+
+# Формат скомпилированного каталога (little-endian):
+#   заголовок:  magic (4 байта), версия (u16), слов маски на карту (u16),
+#               число фракций (u32), число карт (u32), смещения таблицы
+#               фракций, таблицы карт и таблицы строк (u32)
+#   фракция:    id (u32), смещение имени (u32), длина имени (u32)
+#   карта:      ранг (i32), смещение имени (u32), длина имени (u32), маска (u64 * слов маски)
+#   строки:     UTF-8 имена подряд
+MAGIC = b"OPCC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIIII")
+FACTION_RECORD = struct.Struct("<III")
+CARD_RECORD = struct.Struct("<iII")
+
+
+def load_source(path, factions_path=None):
+    """
+    Читает исходный каталог из JSON или CSV.
+
+    JSON: {"factions": {"1": "Roger's Pirates", ...},
+           "cards": [{"name": "Gol D Roger", "rank": 100, "factions": [1, 16]}, ...]}
+    CSV карт: столбцы name, rank, factions (ID через ';'). Фракции берутся из
+    factions_path (CSV со столбцами id, name) или из factions.FACTIONS.
+
+    Returns:
+        tuple: (словарь {ID фракции: имя}, список (имя, ранг, кортеж ID фракций))
+    """
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as source:
+            data = json.load(source)
+        faction_names = {int(fid): name for fid, name in data.get("factions", factions.FACTIONS).items()}
+        cards = [(item["name"], item["rank"], tuple(item["factions"])) for item in data["cards"]]
+        return faction_names, cards
+
+    if factions_path is not None:
+        with open(factions_path, encoding="utf-8", newline="") as source:
+            faction_names = {int(row["id"]): row["name"] for row in csv.DictReader(source)}
+    else:
+        faction_names = dict(factions.FACTIONS)
+    with open(path, encoding="utf-8", newline="") as source:
+        cards = [(row["name"], int(row["rank"]),
+                  tuple(int(fid) for fid in row["factions"].split(";") if fid.strip()))
+                 for row in csv.DictReader(source)]
+    return faction_names, cards
+
+
+def compile_catalog(faction_names, cards, output_path):
+    """
+    Проверяет каталог и записывает его в двоичном виде.
+
+    Все ID фракций проверяются здесь один раз, поэтому при загрузке карты
+    создаются из готовых масок без Card.add_faction.
+
+    Raises:
+        ValueError: Неизвестные или неположительные ID фракций, повторяющиеся имена карт
+    """
+    errors = []
+    for faction_id in faction_names:
+        if faction_id < 1:
+            errors.append(f"Faction ID must be positive: {faction_id}")
+    seen = set()
+    for name, rank, faction_ids in cards:
+        if name in seen:
+            errors.append(f"Duplicate card name: '{name}'")
+        seen.add(name)
+        if not isinstance(rank, int):
+            errors.append(f"Card '{name}' has non-integer rank {rank!r}")
+        for faction_id in faction_ids:
+            if faction_id not in faction_names:
+                errors.append(f"Card '{name}' references unknown faction ID '{faction_id}'")
+    if errors:
+        raise ValueError("Invalid card catalog:\n" + "\n".join(errors))
+
+    mask_words = max(1, (max(faction_names, default=0) + 63) // 64)
+    strings = bytearray()
+
+    def add_string(text):
+        encoded = text.encode("utf-8")
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    faction_table = bytearray()
+    for faction_id in sorted(faction_names):
+        faction_table += FACTION_RECORD.pack(faction_id, *add_string(faction_names[faction_id]))
+
+    card_table = bytearray()
+    for name, rank, faction_ids in cards:
+        mask = factions.faction_mask(faction_ids)
+        card_table += CARD_RECORD.pack(rank, *add_string(name))
+        card_table += mask.to_bytes(8 * mask_words, "little")
+
+    factions_offset = HEADER.size
+    cards_offset = factions_offset + len(faction_table)
+    strings_offset = cards_offset + len(card_table)
+    with open(output_path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, VERSION, mask_words, len(faction_names), len(cards),
+                                 factions_offset, cards_offset, strings_offset))
+        output.write(faction_table)
+        output.write(card_table)
+        output.write(strings)
+
+
+class Catalog:
+    """
+    Скомпилированный каталог, отображенный в память только для чтения.
+
+    Файл не читается целиком: страницы общие для всех процессов, которые
+    открыли тот же файл, а объекты Card создаются при первом обращении и
+    регистрируются в card.register (карта с тем же именем - тот же объект).
+    Перед первой картой фракции каталога добавляются в factions.FACTIONS
+    (install_factions), иначе str(card) не нашел бы имена новых фракций.
+    При передаче в другой процесс (pickle) передается только путь.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as source:
+            self._data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.mask_words, self.faction_count, self.card_count,
+         self._factions_offset, self._cards_offset, self._strings_offset) = HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            self._data.close()
+            raise ValueError(f"'{path}' is not a compiled card catalog (version {VERSION})")
+        self._card_size = CARD_RECORD.size + 8 * self.mask_words
+        self._cards = [None] * self.card_count
+        self._factions = None
+        self._installed = False
+
+    def __reduce__(self):
+        return Catalog, (self.path,)
+
+    def __len__(self):
+        return self.card_count
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return self._data[start:start + length].decode("utf-8")
+
+    def factions(self):
+        """Словарь {ID фракции: имя}."""
+        if self._factions is None:
+            self._factions = {}
+            for index in range(self.faction_count):
+                faction_id, offset, length = FACTION_RECORD.unpack_from(
+                    self._data, self._factions_offset + index * FACTION_RECORD.size)
+                self._factions[faction_id] = self._string(offset, length)
+        return self._factions
+
+    def card(self, index):
+        """Карта с номером index; создается один раз."""
+        card = self._cards[index]
+        if card is None:
+            if not self._installed:
+                self.install_factions()
+            position = self._cards_offset + index * self._card_size
+            rank, offset, length = CARD_RECORD.unpack_from(self._data, position)
+            mask_start = position + CARD_RECORD.size
+            mask = int.from_bytes(self._data[mask_start:mask_start + 8 * self.mask_words], "little")
+            card = register(Card.from_mask(self._string(offset, length), rank, mask))
+            self._cards[index] = card
+        return card
+
+    def cards(self):
+        """Все карты каталога в порядке файла."""
+        return tuple(self.card(index) for index in range(self.card_count))
+
+    def build_deck(self):
+        """Колода со всеми картами каталога."""
+        deck = Deck()
+        deck.cards = list(self.cards())
+        return deck
+
+    def install_factions(self):
+        """Добавляет фракции каталога в factions.FACTIONS, чтобы их имена были доступны картам."""
+        factions.register_factions(self.factions())
+        self._installed = True
+
+    def close(self):
+        self._data.close()
+
+
+def export_builtin(path):
+    """Сохраняет встроенный набор (deck.populate_deck и factions.FACTIONS) как исходный JSON."""
+    data = {
+        "factions": {str(fid): name for fid, name in factions.FACTIONS.items()},
+        "cards": [{"name": card.name, "rank": card.rank, "factions": sorted(card.faction_ids)}
+                  for card in card_catalog()],
+    }
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump(data, output, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Compile card catalogs for simulations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="compile a JSON/CSV catalog")
+    compile_parser.add_argument("source")
+    compile_parser.add_argument("output")
+    compile_parser.add_argument("--factions", help="CSV with id,name columns for a CSV card list")
+    export_parser = commands.add_parser("export", help="export the built-in set as JSON")
+    export_parser.add_argument("output")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_builtin(args.output)
+        print(f"Exported {len(card_catalog())} cards to {args.output}")
+        return
+    faction_names, cards = load_source(args.source, args.factions)
+    try:
+        compile_catalog(faction_names, cards, args.output)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Compiled {len(cards)} cards and {len(faction_names)} factions "
+          f"into {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
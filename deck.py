@@ -1,18 +1,83 @@
 # deck.py
 
-from card import Card
+import random
+
+from card import Card, register
+
+HAND_SIZE = 6      # Cards in a full hand; engine and player import it from here
+RECYCLE_LIMIT = 1  # How many times per game the discard pile goes back into the deck
 
 class Deck:
+    """
+    Draw pile and discard pile.
+
+    The top of the deck is the end of ``cards``, so drawing is a constant-time
+    ``list.pop()`` and refilling a hand takes one slice. The discard pile
+    is reshuffled into the deck at most RECYCLE_LIMIT times, after that
+    the deck simply runs out and the game goes on without refills.
+    """
+
     def __init__(self):
         self.cards = []
         self.discard_pile = []  # Стопка сброса
+        self.recycles = 0       # Сколько раз сброс уже замешан в колоду
+
+    def __len__(self):
+        return len(self.cards)
+
+    def shuffle(self, rng=random):
+        """Shuffle the draw pile."""
+        rng.shuffle(self.cards)
+
+    def draw(self, rng=random):
+        """Take the top card, reshuffling the discard pile if the deck is empty. None if both are empty."""
+        if not self.cards:
+            self.recycle_discard_pile(rng)
+            if not self.cards:
+                return None
+        return self.cards.pop()
+
+    def draw_many(self, count, rng=random):
+        """Take up to count cards from the top, reshuffling the discard pile when the deck runs out."""
+        drawn = self.cards[-count:] if count > 0 else []
+        del self.cards[len(self.cards) - len(drawn):]
+        if len(drawn) < count:
+            self.recycle_discard_pile(rng)
+            rest = count - len(drawn)
+            drawn.extend(self.cards[-rest:])
+            del self.cards[max(0, len(self.cards) - rest):]
+        return drawn
+
+    def refill(self, hand, size=HAND_SIZE, rng=random):
+        """Draw cards into hand (a list) until it holds size cards. Returns the number of cards drawn."""
+        drawn = self.draw_many(size - len(hand), rng)
+        hand.extend(drawn)
+        return len(drawn)
+
+    def recycle_discard_pile(self, rng=random):
+        """Shuffle the discard pile and put it under the remaining deck (at most RECYCLE_LIMIT times)."""
+        if self.discard_pile and self.recycles < RECYCLE_LIMIT:
+            self.recycles += 1
+            pile = self.discard_pile
+            self.discard_pile = []
+            rng.shuffle(pile)
+            pile.extend(self.cards)
+            self.cards = pile
 
     def add_card(self, card):
         """Add card to the deck."""
         self.cards.append(card)
 
     def remove_card(self, card):
-        """Remove card from the deck."""
+        """
+        Remove card from the deck.
+
+        This is a linear scan and is left that way on purpose: ``cards`` is the
+        draw order, so removing from the middle must shift the cards above it.
+        Swapping with the top would reorder the draws, and a set of removed
+        cards would have to be honored by every reader of ``cards``. Nothing
+        in the game or the simulations calls it; draws use the top of the deck.
+        """
         self.cards.remove(card)
 
     def add_to_discard_pile(self, card):
@@ -31,10 +96,11 @@ class Deck:
 
 # Function to create a card and add factions
 def create_card(name, rank, factions):
+    """Return the shared registered card (see card.register); repeated calls give the same object."""
     card = Card(name, rank)
     for faction in factions:
         card.add_faction(faction)
-    return card
+    return register(card)
 
 def populate_deck(deck):
     """Populate the deck with predefined cards."""
@@ -104,9 +170,21 @@ def populate_deck(deck):
     for name, rank, factions in cards_data:
         deck.add_card(create_card(name, rank, factions))
 
-# Create deck and populate it
-deck = Deck()
-populate_deck(deck)
+_catalog = None
+
+def card_catalog():
+    """Return the predefined cards as a tuple, created once on first request."""
+    global _catalog
+    if _catalog is None:
+        deck = Deck()
+        populate_deck(deck)
+        _catalog = tuple(deck.cards)
+    return _catalog
+
+if __name__ == "__main__":
+    # Create deck and populate it
+    deck = Deck()
+    populate_deck(deck)
 
-# Print all cards in the deck
-print(deck)
\ No newline at end of file
+    # Print all cards in the deck
+    print(deck)
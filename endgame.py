@@ -0,0 +1,290 @@
+# endgame.py
+
+import gc
+import time
+
+from cardset import iter_bits
+from deck import RECYCLE_LIMIT
+from engine import ATTACK, DEFENSE, OVER, Game, greedy_policy
+from movegen import attack_masks, cover_positions
+from state import TranspositionTable
+
+TRANSPOSITION_TABLE_SIZE = 1 << 16
+DEFAULT_TIME_LIMIT = 0.1   # Секунды на решение, когда решатель ходит как политика
+_KEY_MASK = (1 << 64) - 1
+
+
+class Solution:
+    """
+    Результат EndgameSolver.solve.
+
+    value - исход для игрока, который ходит: 1 - выигрыш, -1 - проигрыш,
+    0 - поиск не уложился в time_limit. Ничьих в engine нет, поэтому
+    найденное значение всегда точное.
+    """
+    __slots__ = ('value', 'action', 'nodes', 'seconds')
+
+    def __init__(self, value, action, nodes, seconds):
+        self.value = value
+        self.action = action
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def exact(self):
+        return self.value != 0
+
+    def __repr__(self):
+        return (f"Solution(value={self.value}, action={self.action}, "
+                f"nodes={self.nodes}, seconds={self.seconds:.4f})")
+
+
+def is_endgame(game):
+    """
+    Позиция эндшпиля: колода пуста и сброс больше не замешивается, поэтому
+    карты только переходят между руками, столом и сбросом.
+    """
+    return game.phase != OVER and not game.draw_pile and game.recycles >= RECYCLE_LIMIT
+
+
+def _add_factions(mask, active_union, inactive_union):
+    """
+    Объединения фракций FactionManager после карты с маской mask в новом
+    слоте: если активные фракции есть, остальные фракции становятся
+    неактивными и активной остается mask (как add_card_factions).
+    """
+    if active_union & ~inactive_union:
+        return mask, inactive_union | (active_union & ~mask)
+    return active_union | mask, inactive_union
+
+
+class EndgameSolver:
+    """
+    Точный поиск до конца партии для эндшпиля (см. is_endgame).
+
+    В эндшпиле руки обоих игроков следуют из каталога карт за вычетом сброса
+    и стола, добора нет - случайности не остается. Партия всегда
+    заканчивается и ничьих нет, поэтому поиск идет до конца без горизонта, а
+    значение узла - выиграет ли тот, кто ходит. Каждый ход передает решение
+    другому игроку, так что это негамакс с окном из двух значений: узел
+    отсекается на первом выигрывающем ходе, и найденное значение поддерева
+    сразу точное. Значения запоминаются в state.TranspositionTable на все
+    время жизни решателя, поэтому следующие ходы той же партии решаются
+    по таблице.
+
+    Поиск идет не по engine.Game, а по кортежу битбордов (фаза, рука
+    атакующего, рука защитника, карты атаки, непокрытые, карты защиты,
+    объединения фракций FactionManager) с теми же правилами; этот кортеж
+    хранится в таблице рядом со значением и сверяется при чтении. Позиции,
+    отличающиеся слотами карт или номером атакующего, совпадают, а узел
+    не требует копии Game. Ходы из корня делаются через engine.Game, так
+    что корнем может быть любая позиция эндшпиля. Объект можно
+    использовать как политику engine: в эндшпиле ходит по решению, иначе и
+    при нерешенной за time_limit позиции - как fallback.
+
+    DEFAULT_TIME_LIMIT (100 мс) хватает не всегда. Без ограничения времени
+    (python endgame.py 30 6 и 30 8, один процесс Python 3.11): при руках до
+    6 карт в срок решаются 29 позиций из 30, максимум около 120 мс; при
+    руках до 8 карт - 21 из 30, медиана 22 мс, максимум около 1,5 с.
+    Остальные позиции политика играет через fallback.
+    """
+
+    def __init__(self, time_limit=DEFAULT_TIME_LIMIT, fallback=greedy_policy,
+                 table_size=TRANSPOSITION_TABLE_SIZE):
+        self.time_limit = time_limit
+        self.fallback = fallback
+        self.table = TranspositionTable(table_size)
+        self.nodes = 0
+        self._deadline = None
+        self._cards = None
+        self._table_size = 0
+        self._orders = {}   # атаки movegen -> они же в порядке перебора (см. _ordered_attacks)
+
+    def solve(self, game):
+        """
+        Решает позицию эндшпиля game (не изменяется).
+
+        Returns:
+            Solution: исход для игрока, который ходит, и лучший ход
+        """
+        if not is_endgame(game):
+            raise ValueError("EndgameSolver needs an empty draw pile with recycling used up")
+        start = time.perf_counter()
+        self._deadline = None if self.time_limit is None else start + self.time_limit
+        self.nodes = 0
+        if game.cards is not self._cards or len(game.table) != self._table_size:
+            # Значения таблицы верны только для своего набора карт и размера стола
+            self.table.clear()
+            self._orders.clear()
+            self._cards = game.cards
+            self._table_size = len(game.table)
+        mover = game.to_move
+        value, best = -1, None
+        # Поиск не создает циклов ссылок, а проход сборщика мусора по большой
+        # таблице занимает больше, чем весь бюджет time_limit
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for action in game.legal_actions():
+                child = game.copy()
+                child.step(action, validate=False)
+                if child.phase == OVER:
+                    won = child.winner == mover
+                else:
+                    won = not self._search(self._state(child))
+                if won:
+                    value, best = 1, action
+                    break
+        except TimeoutError:
+            value = 0
+        finally:
+            if collecting:
+                gc.enable()
+        return Solution(value, best, self.nodes, time.perf_counter() - start)
+
+    @staticmethod
+    def _state(game):
+        bits = game.cards.bits
+        attacks = uncovered = defenses = 0
+        for attack, defense in game.table:
+            if attack is not None:
+                attacks |= bits[attack]
+                if defense is None:
+                    uncovered |= bits[attack]
+                else:
+                    defenses |= bits[defense]
+        fm = game.faction_manager
+        return (game.phase == DEFENSE, game.hands[game.attacker], game.hands[game.defender],
+                attacks, uncovered, defenses, fm.active_union, fm.inactive_union)
+
+    def _search(self, state):
+        """True, если игрок, который ходит в state, форсирует выигрыш."""
+        self.nodes += 1
+        # Проверка на каждом узле: с большой рукой один узел перебирает тысячи атак
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise TimeoutError
+        key = hash(state) & _KEY_MASK
+        # Хэш кортежа может совпасть у разных позиций, поэтому запись хранит
+        # и саму позицию, а значение берется только при полном совпадении
+        entry = self.table.get(key)
+        if entry is not None and entry[0] == state:
+            return entry[1]
+        nodes = self.nodes
+        won = self._expand(state)
+        # Глубина записи - размер поддерева: дорогие записи вытесняются последними
+        self.table.store(key, (state, won), self.nodes - nodes)
+        return won
+
+    def _expand(self, state):
+        defending, attacker_hand, defender_hand, attacks, uncovered, defenses, active, inactive = state
+        cards = self._cards
+        if defending:
+            # Атаки одного хода лежат в слотах по возрастанию номеров карт,
+            # в этом же порядке покрываются (как engine.Game._defend)
+            attack_ranks = tuple(cards.ranks[i] for i in iter_bits(uncovered))
+            cover = cover_positions(attack_ranks, defender_hand, cards)
+            if cover is not None:
+                placed = 0
+                for i in cover:
+                    placed |= 1 << i
+                    active, inactive = _add_factions(cards.faction_masks[i], active, inactive)
+                if not self._search((False, attacker_hand, defender_hand & ~placed,
+                                     attacks, 0, defenses | placed, active, inactive)):
+                    return True
+            # Забрать карты: атакующий без карт выигрывает, иначе атакует снова
+            if not attacker_hand:
+                return False
+            return not self._search((False, attacker_hand, defender_hand | attacks | defenses,
+                                     0, 0, 0, 0, 0))
+
+        if attacks and not attacker_hand:
+            return True    # Закончить ход с пустой рукой
+        free = self._table_size - attacks.bit_count()
+        for mask in self._ordered_attacks(attack_masks(attacker_hand, active & ~inactive, free, cards)):
+            if mask == attacker_hand:
+                return True    # Атака всей рукой: покроют или заберут - рука пуста
+            union, narrowed = active, inactive
+            for i in iter_bits(mask):
+                union, narrowed = _add_factions(cards.faction_masks[i], union, narrowed)
+            if not self._search((True, attacker_hand & ~mask, defender_hand,
+                                 attacks | mask, mask, defenses, union, narrowed)):
+                return True
+        if not attacks:
+            return False
+        # Закончить ход: защитник без карт выигрывает, иначе роли меняются
+        if not defender_hand:
+            return False
+        return not self._search((False, defender_hand, attacker_hand, 0, 0, 0, 0, 0))
+
+    def _ordered_attacks(self, masks):
+        """
+        Атаки по убыванию числа карт, при равенстве - по возрастанию суммы
+        рангов: сброс слабых карт быстрее ведет к пустой руке. Порядки
+        хранятся в словаре решателя: ключи из одних чисел не отслеживаются
+        сборщиком мусора, в отличие от записей lru_cache с CardIndex.
+        """
+        ordered = self._orders.get(masks)
+        if ordered is None:
+            ranks = self._cards.ranks
+            ordered = tuple(sorted(masks, key=lambda mask: (-mask.bit_count(),
+                                                            sum(ranks[i] for i in iter_bits(mask)))))
+            self._orders[masks] = ordered
+        return ordered
+
+    def __call__(self, game, rng=None):
+        if is_endgame(game):
+            solution = self.solve(game)
+            if solution.exact and solution.action is not None:
+                return solution.action
+        return self.fallback(game, rng)
+
+
+def solve_position(attacker_hand, defender_hand, table, faction_manager, phase, deck, time_limit=None):
+    """
+    Решает позицию эндшпиля из play_turn (атакующий - игрок 0, см. Game.from_table).
+
+    Args:
+        deck: Deck; его cards - колода, discard_pile - сброс
+
+    Returns:
+        Solution: исход для игрока, который ходит
+    """
+    game = Game.from_table(attacker_hand, defender_hand, table, faction_manager, phase,
+                           deck.cards, deck.discard_pile, deck.recycles)
+    return EndgameSolver(time_limit).solve(game)
+
+
+def main():
+    import random
+    import sys
+    from engine import random_policy
+
+    n_positions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    max_cards = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    rng = random.Random(0)
+    positions = []
+    while len(positions) < n_positions:
+        game = Game.new_game(rng)
+        while game.phase != OVER:
+            if is_endgame(game) and game.phase == ATTACK and not game.table_bits:
+                if all(hand.bit_count() <= max_cards for hand in game.hands):
+                    positions.append(game.copy())
+                break
+            policy = greedy_policy if rng.random() < 0.8 else random_policy
+            game.step(policy(game, rng))
+
+    times = []
+    wins = 0
+    for game in positions:
+        solution = EndgameSolver(time_limit=None).solve(game)
+        times.append(solution.seconds)
+        wins += solution.value == 1
+    times.sort()
+    fast = sum(seconds <= DEFAULT_TIME_LIMIT for seconds in times)
+    print(f"{len(positions)} endgames (empty draw pile, up to {max_cards} cards each) solved to the end: "
+          f"{wins} won by the attacker; {fast} within {DEFAULT_TIME_LIMIT * 1000:.0f} ms, "
+          f"median {times[len(times) // 2] * 1000:.1f} ms, max {times[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+# engine.py
+
+import random
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from cardset import default_index, index_for
+from deck import HAND_SIZE, RECYCLE_LIMIT
+from faction_manager import FactionManager
+from movegen import CACHE_SIZE, attack_masks, cover_positions
+from state import (DISCARD_PILE, HAND_LOCATIONS, RECYCLE_KEYS, TABLE_BASE, GameSnapshot,
+                   card_keys, draw_key, full_hash, meta_delta)
+
+# Фазы хода (совпадают с GameState.phase в game_interface)
+ATTACK = "ATTACK"
+DEFENSE = "DEFENSE"
+OVER = "OVER"
+
+# Виды действий
+ATTACK_MOVE = "attack"    # выложить одну или несколько карт в атаку
+FINISH = "finish"         # закончить ход, карты со стола уходят в сброс
+DEFEND = "defend"         # покрыть все непокрытые карты атаки
+TAKE = "take"             # пас: забрать все карты со стола
+
+TABLE_SIZE = 6
+
+Action = namedtuple('Action', 'kind cards')
+FINISH_ACTION = Action(FINISH, ())
+TAKE_ACTION = Action(TAKE, ())
+
+
+class Game:
+    """
+    Состояние партии без ввода/вывода: те же правила, что и в main.play_turn.
+
+    Руки и сброс - битборды (см. cardset.CardIndex): hands[0] и hands[1] -
+    int, где бит i означает карту cards.cards[i]; discard - сброс, table_bits -
+    все карты стола. Стол по слотам и колода (порядок важен) - списки карт.
+    attacker - индекс атакующего. Верх колоды draw_pile - конец списка.
+    После каждого хода руки добираются до HAND_SIZE (атакующий первым);
+    когда колода кончается, в нее замешивается сброс, но не больше
+    RECYCLE_LIMIT раз за партию (recycles - сколько раз уже замешан). Потом
+    руки больше не добираются, и партия всегда заканчивается: каждый ход
+    уменьшает карты в игре или руку атакующего. Перемешивание задается
+    хэшем позиции, поэтому партия полностью определяется начальной раскладкой
+    и действиями. hash - ключ Zobrist позиции (см. state.py), обновляется на
+    каждом ходу. Если задана transpositions (state.TranspositionTable),
+    legal_actions() берет готовые списки действий из нее. known[p] - битборд
+    карт руки p, которые видел соперник: забранные со стола (TAKE) и еще не
+    сыгранные. На правила и хэш known не влияет.
+    """
+    __slots__ = ('cards', 'hands', 'known', 'table', 'table_bits', 'draw_pile', 'discard',
+                 'faction_manager', 'attacker', 'phase', 'winner', 'turns', 'recycles', 'hash',
+                 'transpositions')
+
+    def __init__(self, hands, draw_pile=(), discard_pile=(), attacker=0, cards=None, recycles=0):
+        draw_pile = list(draw_pile)
+        if cards is None:
+            cards = index_for([*hands[0], *hands[1], *draw_pile, *discard_pile])
+        self.cards = cards
+        self.hands = [cards.mask(hands[0]), cards.mask(hands[1])]
+        self.known = [0, 0]
+        self.table = [(None, None)] * TABLE_SIZE
+        self.table_bits = 0
+        self.draw_pile = draw_pile
+        self.discard = cards.mask(discard_pile)
+        self.faction_manager = FactionManager()
+        self.attacker = attacker
+        self.phase = ATTACK
+        self.winner = None
+        self.turns = 0
+        self.recycles = recycles
+        self.transpositions = None
+        self.hash = full_hash(self)
+
+    @classmethod
+    def new_game(cls, rng=random, cards=None):
+        """Перемешивает колоду, раздает по 6 карт и выбирает первого атакующего."""
+        if cards is None:
+            cards = default_index().cards
+        index = index_for(cards)
+        draw_pile = list(cards)
+        rng.shuffle(draw_pile)
+
+        # Раздача как в player.deal_cards: по одной карте каждому игроку по очереди
+        hands = ([], [])
+        for _ in range(HAND_SIZE):
+            for hand in hands:
+                if draw_pile:
+                    hand.append(draw_pile.pop())
+
+        # Первым ходит игрок с картой наименьшего ранга (как find_player_with_lowest_rank)
+        attacker = 0
+        lowest_rank = float('inf')
+        for player, hand in enumerate(hands):
+            for card in hand:
+                if card.rank < lowest_rank:
+                    lowest_rank = card.rank
+                    attacker = player
+
+        return cls(hands, draw_pile, attacker=attacker, cards=index)
+
+    @classmethod
+    def from_table(cls, attacker_hand, defender_hand, table, faction_manager, phase,
+                   draw_pile=(), discard_pile=(), recycles=0):
+        """
+        Состояние посреди хода из объектов play_turn (атакующий - игрок 0).
+
+        recycles - сколько раз сброс уже замешивался в колоду (Deck.recycles).
+
+        Стол может быть любого размера; у faction_manager должно быть не
+        меньше двух слотов на пару стола.
+
+        Списки и менеджер фракций копируются, исходные объекты не изменяются.
+        """
+        if faction_manager.slot_count < 2 * len(table):
+            raise ValueError(f"FactionManager has {faction_manager.slot_count} slots "
+                             f"for a table of {len(table)} pairs")
+        table_cards = [card for pair in table for card in pair if card is not None]
+        cards = index_for([*attacker_hand, *defender_hand, *table_cards, *draw_pile, *discard_pile])
+        game = cls((attacker_hand, defender_hand), draw_pile, discard_pile, cards=cards,
+                   recycles=recycles)
+        game.table = list(table)
+        game.table_bits = cards.mask(table_cards)
+        game.faction_manager = faction_manager.copy()
+        game.phase = phase
+        game.hash = full_hash(game)
+        return game
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Восстанавливает изменяемое состояние из state.GameSnapshot."""
+        game = Game.__new__(Game)
+        game.cards = snapshot.cards
+        game.hands = list(snapshot.hands)
+        game.known = list(snapshot.known)
+        game.table = list(snapshot.table)
+        game.table_bits = snapshot.table_bits
+        game.draw_pile = list(snapshot.draw_pile)
+        game.discard = snapshot.discard
+        game.faction_manager = snapshot.faction_manager.copy()
+        game.attacker = snapshot.attacker
+        game.phase = snapshot.phase
+        game.winner = snapshot.winner
+        game.turns = snapshot.turns
+        game.recycles = snapshot.recycles
+        game.hash = snapshot.key
+        game.transpositions = None
+        return game
+
+    def snapshot(self):
+        """Неизменяемый хэшируемый снимок состояния."""
+        return GameSnapshot(self)
+
+    @property
+    def to_move(self):
+        """Индекс игрока, который сейчас принимает решение."""
+        return self.attacker if self.phase == ATTACK else 1 - self.attacker
+
+    @property
+    def defender(self):
+        return 1 - self.attacker
+
+    @property
+    def is_over(self):
+        return self.phase == OVER
+
+    def hand(self, player):
+        """Карты руки игрока (в порядке номеров индекса)."""
+        return self.cards.cards_of(self.hands[player])
+
+    @property
+    def discard_pile(self):
+        return self.cards.cards_of(self.discard)
+
+    def unseen(self, player):
+        """Битборд карт, которых player сейчас не видит: рука соперника и колода."""
+        return self.cards.all & ~(self.hands[player] | self.table_bits | self.discard)
+
+    def copy(self):
+        """Независимая копия состояния (карты общие, списки свои)."""
+        other = Game.__new__(Game)
+        other.cards = self.cards
+        other.hands = self.hands[:]
+        other.known = self.known[:]
+        other.table = self.table[:]
+        other.table_bits = self.table_bits
+        other.draw_pile = self.draw_pile[:]
+        other.discard = self.discard
+        other.faction_manager = self.faction_manager.copy()
+        other.attacker = self.attacker
+        other.phase = self.phase
+        other.winner = self.winner
+        other.turns = self.turns
+        other.recycles = self.recycles
+        other.hash = self.hash
+        other.transpositions = self.transpositions
+        return other
+
+    def uncovered_attacks(self):
+        """Индексы пар стола, где лежит карта атаки без карты защиты."""
+        return [i for i, (attack, defense) in enumerate(self.table)
+                if attack is not None and defense is None]
+
+    def free_slots(self):
+        return sum(1 for attack, _ in self.table if attack is None)
+
+    def legal_actions(self):
+        """
+        Список всех допустимых действий в текущей фазе.
+
+        Список может быть общим для одинаковых позиций - его нельзя изменять.
+        """
+        if self.transpositions is not None:
+            actions = self.transpositions.get(self.hash)
+            if actions is None:
+                actions = self._legal_actions()
+                self.transpositions.store(self.hash, actions)
+            return actions
+        return self._legal_actions()
+
+    def _legal_actions(self):
+        cards = self.cards
+        if self.phase == ATTACK:
+            actions = [_attack_action(cards, mask)
+                       for mask in attack_masks(self.hands[self.attacker],
+                                                self.faction_manager.active_mask,
+                                                self.free_slots(), cards)]
+            if self.table_bits:
+                actions.append(FINISH_ACTION)
+            return actions
+        if self.phase == DEFENSE:
+            attack_ranks = tuple(self.table[i][0].rank for i in self.uncovered_attacks())
+            cover = cover_positions(attack_ranks, self.hands[self.defender], cards)
+            if cover is not None:
+                return [TAKE_ACTION, _defend_action(cards, cover)]
+            return [TAKE_ACTION]
+        return []
+
+    def is_legal(self, action):
+        """Проверяет действие по тем же правилам, что и play_turn."""
+        kind, cards = action
+        if self.phase == ATTACK:
+            if kind == FINISH:
+                return self.table_bits != 0
+            if kind != ATTACK_MOVE or not cards or len(set(cards)) != len(cards):
+                return False
+            if not self._holds(self.attacker, cards):
+                return False
+            if len(cards) > self.free_slots():
+                return False
+            return self.faction_manager.validate_masks([card.faction_mask for card in cards])
+        if self.phase == DEFENSE:
+            if kind == TAKE:
+                return True
+            if kind != DEFEND or len(set(cards)) != len(cards):
+                return False
+            if not self._holds(self.defender, cards):
+                return False
+            uncovered = self.uncovered_attacks()
+            if len(cards) != len(uncovered):
+                return False
+            return all(defense.rank > self.table[i][0].rank
+                       for i, defense in zip(uncovered, cards))
+        return False
+
+    def _holds(self, player, cards):
+        bits = self.cards.bits
+        hand = self.hands[player]
+        return all(card in bits and bits[card] & hand for card in cards)
+
+    def step(self, action, validate=True):
+        """
+        Применяет действие. Недопустимое действие вызывает ValueError.
+
+        validate=False пропускает проверку - для действий из legal_actions().
+        """
+        if validate and not self.is_legal(action):
+            raise ValueError(f"Illegal action in phase {self.phase}: {action}")
+        faction_manager = self.faction_manager
+        before = (self.phase, self.attacker,
+                  faction_manager.active_union, faction_manager.inactive_union)
+        kind, cards = action
+        if kind == ATTACK_MOVE:
+            self._attack(cards)
+        elif kind == FINISH:
+            self._finish()
+        elif kind == DEFEND:
+            self._defend(cards)
+        else:
+            self._take()
+        faction_manager = self.faction_manager
+        self.hash ^= meta_delta(before, (self.phase, self.attacker,
+                                         faction_manager.active_union, faction_manager.inactive_union))
+
+    def _attack(self, cards):
+        hand_location = HAND_LOCATIONS[self.attacker]
+        bits = self.cards.bits
+        table = self.table
+        key = self.hash
+        moved = 0
+        j = 0
+        for card in cards:
+            while table[j][0] is not None:
+                j += 1
+            table[j] = (card, None)
+            self.faction_manager.add_card_factions(card, j * 2)
+            moved |= bits[card]
+            keys = card_keys(card)
+            key ^= keys[hand_location] ^ keys[TABLE_BASE + j * 2]
+        self.hands[self.attacker] &= ~moved
+        self.known[self.attacker] &= ~moved
+        self.table_bits |= moved
+        self.hash = key
+        self.phase = DEFENSE
+
+    def _defend(self, cards):
+        hand_location = HAND_LOCATIONS[self.defender]
+        bits = self.cards.bits
+        key = self.hash
+        moved = 0
+        for j, card in zip(self.uncovered_attacks(), cards):
+            self.table[j] = (self.table[j][0], card)
+            self.faction_manager.add_card_factions(card, j * 2 + 1)
+            moved |= bits[card]
+            keys = card_keys(card)
+            key ^= keys[hand_location] ^ keys[TABLE_BASE + j * 2 + 1]
+        self.hands[self.defender] &= ~moved
+        self.known[self.defender] &= ~moved
+        self.table_bits |= moved
+        self.hash = key
+        self.phase = ATTACK
+
+    def _clear_table(self, location):
+        """Убирает карты со стола (в руку или сброс - location); возвращает битборд стола."""
+        key = self.hash
+        for slot, card in enumerate(card for pair in self.table for card in pair):
+            if card:
+                keys = card_keys(card)
+                key ^= keys[TABLE_BASE + slot] ^ keys[location]
+        self.hash = key
+        moved = self.table_bits
+        self.table = [(None, None)] * len(self.table)
+        self.table_bits = 0
+        self.faction_manager.clear()
+        self.turns += 1
+        return moved
+
+    def _take(self):
+        taken = self._clear_table(HAND_LOCATIONS[self.defender])
+        self.hands[self.defender] |= taken
+        self.known[self.defender] |= taken
+        if not self.hands[self.attacker]:
+            self._end(self.attacker)
+        else:
+            # Роли не меняются, атакующий ходит снова
+            self._refill()
+            self.phase = ATTACK
+
+    def _finish(self):
+        self.discard |= self._clear_table(DISCARD_PILE)
+        if not self.hands[self.attacker]:
+            self._end(self.attacker)
+        elif not self.hands[self.defender]:
+            self._end(self.defender)
+        else:
+            self._refill()
+            self.attacker = self.defender
+            self.phase = ATTACK
+
+    def _refill(self):
+        """Добор до HAND_SIZE после хода."""
+        key = self.hash
+        bits = self.cards.bits
+        for player in (self.attacker, self.defender):
+            missing = HAND_SIZE - self.hands[player].bit_count()
+            if missing <= 0:
+                continue
+            if missing > len(self.draw_pile) and self.discard and self.recycles < RECYCLE_LIMIT:
+                key = self._recycle_discard_pile(key)
+            draw_pile = self.draw_pile
+            drawn = draw_pile[-missing:]
+            bottom = len(draw_pile) - len(drawn)
+            del draw_pile[bottom:]
+            hand_location = HAND_LOCATIONS[player]
+            hand = self.hands[player]
+            for position, card in enumerate(drawn, bottom):
+                hand |= bits[card]
+                key ^= draw_key(card, position) ^ card_keys(card)[hand_location]
+            self.hands[player] = hand
+        self.hash = key
+
+    def _recycle_discard_pile(self, key):
+        """Кладет перемешанный сброс под колоду; возвращает обновленный хэш."""
+        pile = list(self.cards.cards_of(self.discard))
+        self.discard = 0
+        random.Random(key).shuffle(pile)
+        for position, card in enumerate(pile):
+            key ^= card_keys(card)[DISCARD_PILE] ^ draw_key(card, position)
+        # Карты колоды сдвигаются вверх на длину замешанного сброса
+        for position, card in enumerate(self.draw_pile):
+            key ^= draw_key(card, position) ^ draw_key(card, position + len(pile))
+        pile.extend(self.draw_pile)
+        self.draw_pile = pile
+        key ^= RECYCLE_KEYS[self.recycles] ^ RECYCLE_KEYS[self.recycles + 1]
+        self.recycles += 1
+        return key
+
+    def _end(self, winner):
+        self.winner = winner
+        self.phase = OVER
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _attack_action(cards, mask):
+    """Action атаки для битборда; одинаковые атаки - один и тот же объект."""
+    return Action(ATTACK_MOVE, cards.cards_of(mask))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _defend_action(cards, positions):
+    return Action(DEFEND, tuple(cards.cards[i] for i in positions))
+
+
+# Политики: функция (game, rng) -> Action
+
+def random_policy(game, rng=random):
+    """Случайное допустимое действие."""
+    return rng.choice(game.legal_actions())
+
+
+def greedy_policy(game, rng=random):
+    """
+    Атакует самой большой комбинацией с наименьшей суммой рангов,
+    защищается, если может, иначе забирает карты.
+    """
+    actions = game.legal_actions()
+    if game.phase == ATTACK:
+        attacks = [action for action in actions if action.kind == ATTACK_MOVE]
+        if not attacks:
+            return FINISH_ACTION
+        return min(attacks, key=lambda action: (-len(action.cards),
+                                                sum(card.rank for card in action.cards)))
+    for action in actions:
+        if action.kind == DEFEND:
+            return action
+    return TAKE_ACTION
+
+
+class ScriptedPolicy:
+    """Политика, которая воспроизводит заранее заданную последовательность действий."""
+
+    def __init__(self, actions):
+        self.actions = list(actions)
+        self.position = 0
+
+    def __call__(self, game, rng=random):
+        action = self.actions[self.position]
+        self.position += 1
+        return action
+
+
+def play_game(policies, rng=random, game=None, log=None):
+    """
+    Играет партию до конца без ввода/вывода.
+
+    policies - пара политик для игроков 0 и 1. Возвращает завершенное состояние.
+    log - gamelog.GameLogWriter, в который записываются все события партии.
+    """
+    if game is None:
+        game = Game.new_game(rng)
+    if log is None:
+        while game.phase != OVER:
+            game.step(policies[game.to_move](game, rng))
+        return game
+    log.start(game)
+    while game.phase != OVER:
+        log.step(game, policies[game.to_move](game, rng))
+    return game
+
+
+def simulate(n_games, policies, seed=0):
+    """Играет n_games партий и возвращает число побед каждого игрока."""
+    rng = random.Random(seed)
+    wins = [0, 0]
+    for _ in range(n_games):
+        winner = play_game(policies, rng).winner
+        if winner is not None:
+            wins[winner] += 1
+    return wins
+
+
+def main():
+    import sys
+    n_games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    start = time.perf_counter()
+    wins = simulate(n_games, (greedy_policy, random_policy))
+    elapsed = time.perf_counter() - start
+    print(f"greedy vs random: {wins[0]} - {wins[1]}")
+    print(f"{n_games} games in {elapsed:.2f}s ({n_games / elapsed:.0f} games/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,89 @@
 # faction_manager.py
 
+from factions import mask_to_ids
+
+SLOT_COUNT = 12
+MAX_HISTORY = 64
+
+
 class FactionManager:
-    def __init__(self):
-        # Создаем 12 слотов (6 пар карт, каждая карта имеет свой слот)
-        self.faction_slots = [{'active': set(), 'inactive': set()} for _ in range(12)]
-        self.active_factions = set()  # Общий набор активных фракций
+    """
+    Учет активных фракций на столе.
+
+    Вместо того чтобы пересобирать объединения всех слотов на каждую карту,
+    менеджер хранит для каждой фракции число слотов, где она активна и где
+    неактивна. Счетчики битово-срезовые: k-я маска списка - k-й бит
+    счетчиков всех фракций сразу, поэтому изменение счетчиков стоит
+    O(log slot_count) операций с масками независимо от числа фракций карты
+    и размера набора фракций. Сужение активных фракций новой картой не
+    обходит слоты: маска карты записывается в историю, а фактическое
+    состояние слота вычисляется по истории только при его удалении или чтении.
+    """
+
+    def __init__(self, slot_count=SLOT_COUNT):
+        # По умолчанию 12 слотов (6 пар карт, каждая карта имеет свой слот).
+        # Фракции слотов хранятся битовыми масками (см. factions.faction_mask)
+        self.slot_count = slot_count
+        self.clear()
+
+    def clear(self):
+        """Очищает все слоты и активные фракции."""
+        slot_count = self.slot_count
+        bits = slot_count.bit_length()
+        self._base_active = [0] * slot_count    # Маска карты на момент добавления
+        self._base_inactive = [0] * slot_count
+        self._epoch = [0] * slot_count          # Позиция в истории сужений при добавлении
+        self._history = []                      # Маски карт, сужавших активные фракции
+        self._active_count = [0] * bits         # Число слотов, где фракция активна
+        self._inactive_count = [0] * bits       # Число слотов, где фракция неактивна
+        self._both_count = [0] * bits           # Число слотов, где фракция и активна, и неактивна
+        self._active_union = 0
+        self._inactive_union = 0
+        self.active_mask = 0  # Общая маска активных фракций
+
+    def _slot_state(self, slot_index):
+        """Фактические маски (active, inactive) слота с учетом всех последующих сужений."""
+        base_active = self._base_active[slot_index]
+        if not base_active:
+            return 0, self._base_inactive[slot_index]
+        narrowing = -1
+        for mask in self._history[self._epoch[slot_index]:]:
+            narrowing &= mask
+        return base_active & narrowing, self._base_inactive[slot_index] | (base_active & ~narrowing)
+
+    @property
+    def slot_active(self):
+        """Маски активных фракций по слотам."""
+        return [self._slot_state(i)[0] for i in range(self.slot_count)]
+
+    @property
+    def slot_inactive(self):
+        """Маски неактивных фракций по слотам."""
+        return [self._slot_state(i)[1] for i in range(self.slot_count)]
+
+    @property
+    def faction_slots(self):
+        """Слоты в виде множеств ID фракций (только для чтения)."""
+        slots = []
+        for i in range(self.slot_count):
+            active, inactive = self._slot_state(i)
+            slots.append({'active': mask_to_ids(active), 'inactive': mask_to_ids(inactive)})
+        return slots
+
+    @property
+    def active_union(self):
+        """Маска фракций, активных хотя бы в одном слоте."""
+        return self._active_union
+
+    @property
+    def inactive_union(self):
+        """Маска фракций, неактивных хотя бы в одном слоте."""
+        return self._inactive_union
+
+    @property
+    def active_factions(self):
+        """Общий набор активных фракций в виде множества ID."""
+        return mask_to_ids(self.active_mask)
 
     def add_card_factions(self, card, slot_index):
         """
@@ -12,64 +91,160 @@ class FactionManager:
         
         Args:
             card: Объект карты
-            slot_index: Индекс слота (0-11)
+            slot_index: Индекс слота (0 .. slot_count - 1)
         """
-        if 0 <= slot_index < 12:
-            # Получаем все текущие активные фракции до добавления новой карты
-            current_active = self.get_active_factions()
-            
+        if 0 <= slot_index < self.slot_count:
+            card_mask = card.faction_mask
+            # Все текущие активные фракции до добавления новой карты
+            current_active = self.active_mask
+
+            # Если слот занят, его активные фракции заменяются, неактивные остаются
+            active, inactive = self._slot_state(slot_index)
+            if active:
+                self._active_union &= ~self._release(active, self._active_count)
+                if active & inactive:
+                    self._release(active & inactive, self._both_count)
+            self._base_inactive[slot_index] = inactive
+
             # Добавляем фракции новой карты
-            self.faction_slots[slot_index]['active'] = set(card.faction_ids)
-            
-            # Если уже есть активные фракции, обновляем статусы
+            self._base_active[slot_index] = card_mask
+            active_count = self._active_count
+            self._count(card_mask, active_count)
+            self._active_union |= card_mask
+            if card_mask & inactive:
+                self._count(card_mask & inactive, self._both_count)
+
+            # Если уже есть активные фракции, фракции, которые не пересекаются
+            # с новой картой, переходят в неактивные во всех слотах
             if current_active:
-                for slot in self.faction_slots:
-                    if slot['active']:
-                        # Фракции, которые не пересекаются с новой картой, переходят в неактивные
-                        non_matching = slot['active'] - card.faction_ids
-                        slot['inactive'].update(non_matching)
-                        slot['active'] = slot['active'] & card.faction_ids
+                narrowed = self._active_union & ~card_mask
+                if narrowed:
+                    # Слоты, где фракция уже была неактивной, второй раз не считаются
+                    self._add(self._inactive_count,
+                              self._subtract(active_count, self._both_count, narrowed))
+                    keep = ~narrowed
+                    self._active_count = [plane & keep for plane in active_count]
+                    self._both_count = [plane & keep for plane in self._both_count]
+                    self._active_union &= card_mask
+                    self._inactive_union |= narrowed
+                    self._history.append(card_mask)
+            self._epoch[slot_index] = len(self._history)
 
             self.update_active_factions()
+            if len(self._history) > MAX_HISTORY:
+                self._compact()
 
     def remove_card_factions(self, slot_index):
         """Удаляет фракции из определенного слота."""
-        if 0 <= slot_index < 12:
-            self.faction_slots[slot_index]['active'].clear()
-            self.faction_slots[slot_index]['inactive'].clear()
+        if 0 <= slot_index < self.slot_count:
+            active, inactive = self._slot_state(slot_index)
+            if active & inactive:
+                self._release(active & inactive, self._both_count)
+            self._active_union &= ~self._release(active, self._active_count)
+            self._inactive_union &= ~self._release(inactive, self._inactive_count)
+            self._base_active[slot_index] = 0
+            self._base_inactive[slot_index] = 0
             self.update_active_factions()
 
+    @staticmethod
+    def _count(mask, counts):
+        """Увеличивает на 1 счетчики фракций маски."""
+        carry = mask
+        for k, plane in enumerate(counts):
+            counts[k] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+
+    @staticmethod
+    def _release(mask, counts):
+        """Уменьшает на 1 счетчики фракций маски; возвращает маску фракций, счетчик которых обнулился."""
+        borrow = mask
+        for k, plane in enumerate(counts):
+            counts[k] = plane ^ borrow
+            borrow &= ~plane
+            if not borrow:
+                break
+        remaining = 0
+        for plane in counts:
+            remaining |= plane
+        return mask & ~remaining
+
+    @staticmethod
+    def _subtract(counts, other, mask):
+        """Счетчики counts - other для фракций маски (counts не меньше other)."""
+        result = []
+        borrow = 0
+        for plane, subtrahend in zip(counts, other):
+            plane &= mask
+            subtrahend &= mask
+            difference = plane ^ subtrahend
+            result.append(difference ^ borrow)
+            borrow = (~plane & subtrahend) | (~difference & borrow)
+        return result
+
+    @staticmethod
+    def _add(counts, other):
+        """Прибавляет к counts счетчики other (сумма не больше slot_count)."""
+        carry = 0
+        for k, (plane, addend) in enumerate(zip(counts, other)):
+            half = plane ^ addend
+            counts[k] = half ^ carry
+            carry = (plane & addend) | (half & carry)
+
+    def _compact(self):
+        """Записывает фактическое состояние слотов и очищает историю сужений."""
+        states = [self._slot_state(i) for i in range(self.slot_count)]
+        self._base_active = [active for active, _ in states]
+        self._base_inactive = [inactive for _, inactive in states]
+        self._epoch = [0] * self.slot_count
+        self._history = []
+
     def update_active_factions(self):
-        """Обновляет общий набор активных фракций, исключая неактивные."""
-        active_sets = []
-        inactive_sets = []
-        
-        for slot in self.faction_slots:
-            if slot['active']:
-                active_sets.append(slot['active'])
-            if slot['inactive']:
-                inactive_sets.append(slot['inactive'])
-
-        if active_sets:
-            # Объединяем все активные фракции
-            all_active = set.union(*active_sets)
-            # Если есть неактивные фракции, исключаем их
-            if inactive_sets:
-                all_inactive = set.union(*inactive_sets)
-                self.active_factions = all_active - all_inactive
-            else:
-                self.active_factions = all_active
-        else:
-            self.active_factions.clear()
+        """Обновляет общую маску активных фракций, исключая неактивные."""
+        self.active_mask = self._active_union & ~self._inactive_union
 
     def get_active_factions(self):
         """Возвращает текущий набор активных фракций."""
         return self.active_factions
 
-    def clear(self):
-        """Очищает все слоты и активные фракции."""
-        self.faction_slots = [{'active': set(), 'inactive': set()} for _ in range(12)]
-        self.active_factions.clear()
+    def copy(self):
+        """Возвращает независимую копию менеджера (для симуляций)."""
+        other = FactionManager.__new__(FactionManager)
+        other.slot_count = self.slot_count
+        other._base_active = self._base_active[:]
+        other._base_inactive = self._base_inactive[:]
+        other._epoch = self._epoch[:]
+        other._history = self._history[:]
+        other._active_count = self._active_count[:]
+        other._inactive_count = self._inactive_count[:]
+        other._both_count = self._both_count[:]
+        other._active_union = self._active_union
+        other._inactive_union = self._inactive_union
+        other.active_mask = self.active_mask
+        return other
+
+    @classmethod
+    def from_slots(cls, slot_active, slot_inactive):
+        """
+        Менеджер с заданными масками слотов (как slot_active / slot_inactive).
+        Число слотов равно длине slot_active.
+
+        Args:
+            slot_active: Маски активных фракций по слотам
+            slot_inactive: Маски неактивных фракций по слотам
+        """
+        manager = cls(len(slot_active))
+        manager._base_active = list(slot_active)
+        manager._base_inactive = list(slot_inactive)
+        for active, inactive in zip(slot_active, slot_inactive):
+            cls._count(active, manager._active_count)
+            cls._count(inactive, manager._inactive_count)
+            cls._count(active & inactive, manager._both_count)
+            manager._active_union |= active
+            manager._inactive_union |= inactive
+        manager.update_active_factions()
+        return manager
 
     def validate_card_factions(self, card):
         """
@@ -81,9 +256,7 @@ class FactionManager:
         Returns:
             bool: True если карта может быть сыграна, False в противном случае
         """
-        if not self.active_factions:
-            return True
-        return bool(card.faction_ids & self.active_factions)
+        return not self.active_mask or bool(card.faction_mask & self.active_mask)
 
     def validate_multiple_cards(self, cards):
         """
@@ -95,17 +268,32 @@ class FactionManager:
         Returns:
             bool: True если карты могут быть сыграны вместе, False в противном случае
         """
-        if not cards:
+        return self.validate_masks([card.faction_mask for card in cards])
+
+    def validate_masks(self, masks):
+        """
+        То же, что validate_multiple_cards, но для масок фракций карт.
+
+        Args:
+            masks: Последовательность масок фракций (card.faction_mask)
+
+        Returns:
+            bool: True если карты могут быть сыграны вместе, False в противном случае
+        """
+        if not masks:
             return False
-        if len(cards) == 1:
-            return self.validate_card_factions(cards[0])
-            
+        if len(masks) == 1:
+            return not self.active_mask or bool(masks[0] & self.active_mask)
+
         # Находим общие фракции между всеми картами
-        common_factions = set.intersection(*(card.faction_ids for card in cards))
-        
+        common_mask = masks[0]
+        for mask in masks[1:]:
+            common_mask &= mask
+
         # Если нет активных фракций, достаточно иметь общие фракции между картами
-        if not self.active_factions:
-            return bool(common_factions)
-            
+        if not self.active_mask:
+            return bool(common_mask)
+
         # Иначе должно быть пересечение с активными фракциями
-        return bool(common_factions & self.active_factions) 
\ No newline at end of file
+        return bool(common_mask & self.active_mask)
+
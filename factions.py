@@ -26,4 +26,45 @@ FACTIONS = {
     22: "Arlong's Pirates",
     23: "Baratie Arc",
     24: "Blackbeard's Pirates"
-}
\ No newline at end of file
+}
+
+
+# Битовые маски фракций: фракция с ID n занимает бит n - 1
+FACTION_BITS = {faction_id: 1 << (faction_id - 1) for faction_id in FACTIONS}
+ALL_FACTIONS_MASK = sum(FACTION_BITS.values())
+
+
+def register_factions(faction_names):
+    """
+    Add factions to the faction universe (FACTIONS, FACTION_BITS, ALL_FACTIONS_MASK).
+
+    Masks are plain integers, so custom sets may define hundreds of factions.
+
+    Args:
+        faction_names: Mapping {faction ID (>= 1): name}
+    """
+    global ALL_FACTIONS_MASK
+    for faction_id, name in faction_names.items():
+        if faction_id < 1:
+            raise ValueError(f"Faction ID must be positive: {faction_id}")
+        FACTIONS[faction_id] = name
+        FACTION_BITS[faction_id] = 1 << (faction_id - 1)
+        ALL_FACTIONS_MASK |= FACTION_BITS[faction_id]
+
+
+def faction_mask(faction_ids):
+    """Convert an iterable of faction IDs into an integer bitmask."""
+    mask = 0
+    for faction_id in faction_ids:
+        mask |= 1 << (faction_id - 1)
+    return mask
+
+
+def mask_to_ids(mask):
+    """Convert a faction bitmask back into a set of faction IDs."""
+    ids = set()
+    while mask:
+        low_bit = mask & -mask
+        ids.add(low_bit.bit_length())
+        mask ^= low_bit
+    return ids
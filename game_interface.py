@@ -1,12 +1,17 @@
-import pygame
+import os
 import random
+import sys
+from collections import OrderedDict
+
 from deck import Deck, populate_deck
 from player import Player, deal_cards
 from card import Card
 from factions import FACTIONS
+from faction_manager import FactionManager
 
-# Инициализация Pygame
-pygame.init()
+# pygame, engine, mcts и metrics импортируются там, где нужны: импорт pygame
+# загружает SDL и печатает приветствие, а поиск хода нужен только с --ai и --hints
+pygame = None
 
 # Константы
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
@@ -14,28 +19,78 @@ CARD_WIDTH, CARD_HEIGHT = 100, 150
 BACKGROUND_COLOR = (34, 139, 34)  # Темно-зеленый цвет
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
-TABLE_AREA = pygame.Rect(50, SCREEN_HEIGHT//2 - CARD_HEIGHT//2, SCREEN_WIDTH-100, CARD_HEIGHT)
+TABLE_RECT = (50, SCREEN_HEIGHT//2 - CARD_HEIGHT//2, SCREEN_WIDTH-100, CARD_HEIGHT)
+AI_TIME_BUDGET = 0.5  # Секунд на ход компьютерного игрока (Player 2)
+HINT_TIME_BUDGET = 0.3  # Секунд на оценку позиции для подсказки
+HINT_CACHE_SIZE = 256  # Оцененных позиций в кэше HintWorker
+HINT_COLOR = (255, 215, 0)
+FPS_LIMIT = 30  # Максимальная частота кадров
+HIT_CELL = 50  # Размер ячейки индекса карт под курсором (пикселей)
+HIT_COLUMNS = SCREEN_WIDTH // HIT_CELL + 1
+
+# Окно, шрифт и область стола создаются в init_display(), а не при импорте модуля
+screen = None
+font = None
+table_area = None
+
+def init_display(headless=False):
+    """
+    Инициализирует Pygame, создает окно и загружает шрифт.
+
+    headless=True использует драйвер SDL "dummy": окно не открывается,
+    поэтому интерфейс можно запускать в CI и процессах симуляции.
+    """
+    global screen, font, table_area, pygame
+    if screen is not None:
+        return screen
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    # Инициализация Pygame
+    if pygame is None:
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import pygame
+    pygame.init()
+    table_area = pygame.Rect(TABLE_RECT)
 
-# Создание окна
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Card Game")
+    # Создание окна
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Card Game")
+
+    # Шрифты
+    try:
+        font = pygame.font.Font(None, 24)
+    except Exception as e:
+        print(f"Error loading font: {e}")
+        pygame.quit()
+        exit()
+    return screen
 
-# Шрифты
-try:
-    font = pygame.font.Font(None, 24)
-except Exception as e:
-    print(f"Error loading font: {e}")
+def close_display():
+    """Закрывает окно и сбрасывает кэши поверхностей."""
+    global screen, font
     pygame.quit()
-    exit()
+    screen = None
+    font = None
+    _card_faces.clear()
+    _text_surfaces.clear()
 
 class GameState:
-    def __init__(self):
+    def __init__(self, table_size=None):
+        if table_size is None:
+            from engine import TABLE_SIZE
+            table_size = TABLE_SIZE
         self.active_factions = set()
         self.current_attacker = None
         self.current_defender = None
-        self.table = [(None, None) for _ in range(6)]
+        self.table_size = table_size  # Число пар (атака, защита) на столе
+        self.table = [(None, None) for _ in range(table_size)]
         self.phase = "ATTACK"  # "ATTACK" или "DEFENSE"
 
+    def clear_table(self):
+        self.table = [(None, None) for _ in range(self.table_size)]
+
     def switch_players(self):
         self.current_attacker, self.current_defender = self.current_defender, self.current_attacker
         self.phase = "ATTACK"
@@ -59,7 +114,7 @@ class DraggableCard:
                     return True
         elif event.type == pygame.MOUSEBUTTONUP and self.dragging:
             self.dragging = False
-            if TABLE_AREA.colliderect(self.rect):
+            if table_area.colliderect(self.rect):
                 # Проверяем правила размещения карты
                 if self.can_place_card(game_state):
                     return True
@@ -83,42 +138,387 @@ class DraggableCard:
                         return True
             return False
 
+class CardLayer:
+    """
+    Индекс перетаскиваемых карт для поиска карты под курсором.
+
+    Экран разбит на ячейки HIT_CELL x HIT_CELL; в каждой ячейке хранится
+    список карт, которые ее задевают, в порядке отрисовки (z-порядке).
+    Событие получает только карта под курсором или перетаскиваемая карта,
+    поэтому стоимость обработки не зависит от числа карт в руках.
+    """
+
+    def __init__(self, cards=()):
+        self.dragging = None
+        self.rebuild(cards)
+
+    def rebuild(self, cards):
+        """Строит индекс заново; порядок cards - порядок отрисовки."""
+        self._cells = {}
+        self._cells_of = {}
+        self._z = {}
+        self._next_z = 0
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        """Добавляет карту поверх остальных."""
+        self._z[card] = self._next_z
+        self._next_z += 1
+        self._index(card)
+
+    def remove(self, card):
+        """Убирает карту из индекса (например, после выкладывания на стол)."""
+        self._unindex(card)
+        del self._z[card]
+        if self.dragging is card:
+            self.dragging = None
+
+    def _index(self, card):
+        rect = card.rect
+        # Точки правее экрана попадают в последний столбец, левее/выше - не ищутся
+        last_column = HIT_COLUMNS - 1
+        keys = [row * HIT_COLUMNS + column
+                for row in range(max(rect.top, 0) // HIT_CELL, max(rect.bottom - 1, 0) // HIT_CELL + 1)
+                for column in range(min(max(rect.left, 0) // HIT_CELL, last_column),
+                                    min(max(rect.right - 1, 0) // HIT_CELL, last_column) + 1)]
+        z = self._z[card]
+        for key in keys:
+            bucket = self._cells.setdefault(key, [])
+            # Сохраняем z-порядок внутри ячейки
+            position = len(bucket)
+            while position and self._z[bucket[position - 1]] > z:
+                position -= 1
+            bucket.insert(position, card)
+        self._cells_of[card] = keys
+
+    def _unindex(self, card):
+        for key in self._cells_of.pop(card, ()):
+            self._cells[key].remove(card)
+
+    def card_at(self, pos):
+        """Верхняя карта под точкой pos или None."""
+        x, y = pos
+        if x < 0 or y < 0:
+            return None
+        bucket = self._cells.get(y // HIT_CELL * HIT_COLUMNS + min(x // HIT_CELL, HIT_COLUMNS - 1))
+        if bucket:
+            for index in range(len(bucket) - 1, -1, -1):
+                card = bucket[index]
+                if card.rect.collidepoint(pos):
+                    return card
+        return None
+
+    def dispatch(self, event, game_state):
+        """
+        Передает событие мыши нужной карте.
+
+        Returns:
+            DraggableCard или None: карта, для которой handle_event вернул True
+        """
+        if event.type == pygame.MOUSEMOTION:
+            if self.dragging is not None:
+                self.dragging.handle_event(event, game_state)
+            return None
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            card = self.card_at(event.pos)
+            if card is None:
+                return None
+            result = card.handle_event(event, game_state)
+            if card.dragging:
+                self.dragging = card
+            return card if result else None
+        if event.type == pygame.MOUSEBUTTONUP and self.dragging is not None:
+            card = self.dragging
+            self.dragging = None
+            result = card.handle_event(event, game_state)
+            # Карта вернулась на место или легла на стол - обновляем ее ячейки
+            self._unindex(card)
+            self._index(card)
+            return card if result else None
+        return None
+
+# Кэш отрисованных лиц карт и строк текста: font.render вызывается один раз на карту/строку
+_card_faces = {}
+_text_surfaces = {}
+
+def card_face(card):
+    """Возвращает поверхность с лицом карты, отрисованную один раз."""
+    face = _card_faces.get(card)
+    if face is None:
+        face = pygame.Surface((CARD_WIDTH, CARD_HEIGHT))
+        face.fill(WHITE)
+
+        # Отображение имени карты
+        face.blit(font.render(f"{card.name}", True, BLACK), (5, 5))
+
+        # Отображение ранга
+        face.blit(font.render(f"Rank: {card.rank}", True, BLACK), (5, 25))
+
+        # Отображение номеров фракций
+        factions_text = ', '.join(str(fid) for fid in card.faction_ids)
+        face.blit(font.render(f"Factions: {factions_text}", True, BLACK), (5, 45))
+        _card_faces[card] = face
+    return face
+
+def render_text(text):
+    """Возвращает поверхность со строкой текста из кэша."""
+    surface = _text_surfaces.get(text)
+    if surface is None:
+        surface = font.render(text, True, BLACK)
+        _text_surfaces[text] = surface
+    return surface
+
 def draw_card(screen, card, x, y):
     """Рисует карту на экране."""
-    pygame.draw.rect(screen, WHITE, (x, y, CARD_WIDTH, CARD_HEIGHT))
-    
-    # Отображение имени карты
-    text_surface = font.render(f"{card.name}", True, BLACK)
-    screen.blit(text_surface, (x + 5, y + 5))
-    
-    # Отображение ранга
-    text_surface = font.render(f"Rank: {card.rank}", True, BLACK)
-    screen.blit(text_surface, (x + 5, y + 25))
-    
-    # Отображение номеров фракций
-    factions_text = ', '.join(str(fid) for fid in card.faction_ids)
-    text_surface = font.render(f"Factions: {factions_text}", True, BLACK)
-    screen.blit(text_surface, (x + 5, y + 45))
+    return screen.blit(card_face(card), (x, y))
+
+def build_engine_game(game_state, attacker_cards, defender_cards, deck):
+    """Собирает engine.Game из состояния интерфейса для поиска хода компьютера."""
+    from engine import Game
+    faction_manager = FactionManager(2 * game_state.table_size)
+    for i, (attack, defense) in enumerate(game_state.table):
+        if attack:
+            faction_manager.add_card_factions(attack, i * 2)
+        if defense:
+            faction_manager.add_card_factions(defense, i * 2 + 1)
+    return Game.from_table([card.card for card in attacker_cards],
+                           [card.card for card in defender_cards],
+                           game_state.table, faction_manager, game_state.phase, deck.cards,
+                           recycles=deck.recycles)
+
+def play_ai_turn(ai_player, game_state, cards_by_player, hand_rows, deck):
+    """
+    Делает ход компьютера и применяет его так же, как перетаскивание карт и кнопка End Turn.
+
+    cards_by_player - {Player: список DraggableCard}, hand_rows - {Player: y ряда карт руки}.
+    Блокирует до конца поиска; основной цикл вместо этого использует HintWorker.
+    """
+    attacker_cards = cards_by_player[game_state.current_attacker]
+    defender_cards = cards_by_player[game_state.current_defender]
+    action = ai_player.choose(build_engine_game(game_state, attacker_cards, defender_cards, deck))
+    apply_action(action, game_state, cards_by_player, hand_rows, deck)
+
+def apply_action(action, game_state, cards_by_player, hand_rows, deck):
+    """Применяет действие engine к состоянию интерфейса от имени игрока, который ходит."""
+    from engine import ATTACK_MOVE, DEFEND, TAKE
+    attacker_cards = cards_by_player[game_state.current_attacker]
+    defender_cards = cards_by_player[game_state.current_defender]
+    own_cards = attacker_cards if game_state.phase == "ATTACK" else defender_cards
+    draggable = {id(card.card): card for card in own_cards}
+    table = game_state.table
+
+    if action.kind == ATTACK_MOVE:
+        for card in action.cards:
+            for i, (attack, defense) in enumerate(table):
+                if not attack:
+                    table[i] = (card, None)
+                    game_state.active_factions.update(card.faction_ids)
+                    own_cards.remove(draggable[id(card)])
+                    break
+        game_state.phase = "DEFENSE"
+    elif action.kind == DEFEND:
+        uncovered = [i for i, (attack, defense) in enumerate(table) if attack and not defense]
+        for i, card in zip(uncovered, action.cards):
+            table[i] = (table[i][0], card)
+            own_cards.remove(draggable[id(card)])
+        game_state.switch_players()
+    elif action.kind == TAKE:
+        # Защищающийся забирает все карты со стола, атакующий ходит снова
+        defender = game_state.current_defender
+        for pair in table:
+            for card in pair:
+                if card:
+                    own_cards.append(DraggableCard(card, 50 + len(own_cards) * (CARD_WIDTH + 10),
+                                                   hand_rows[defender], defender))
+        game_state.clear_table()
+        game_state.phase = "ATTACK"
+        game_state.active_factions.clear()
+    else:  # FINISH: карты со стола уходят в сброс, роли меняются
+        for pair in table:
+            for card in pair:
+                if card:
+                    deck.add_to_discard_pile(card)
+        game_state.clear_table()
+        game_state.switch_players()
 
 def draw_game_state(screen, font, game_state):
     # Отображение текущей фазы и активных фракций
     phase_text = f"Phase: {game_state.phase}"
-    text_surface = font.render(phase_text, True, BLACK)
-    screen.blit(text_surface, (10, 10))
+    screen.blit(render_text(phase_text), (10, 10))
 
     active_factions_text = f"Active Factions: {', '.join(map(str, game_state.active_factions))}"
-    text_surface = font.render(active_factions_text, True, BLACK)
-    screen.blit(text_surface, (10, 30))
+    screen.blit(render_text(active_factions_text), (10, 30))
 
     # Отображение текущих игроков
     attacker_text = f"Attacker: {game_state.current_attacker.name}"
     defender_text = f"Defender: {game_state.current_defender.name}"
-    text_surface = font.render(attacker_text, True, BLACK)
-    screen.blit(text_surface, (10, 50))
-    text_surface = font.render(defender_text, True, BLACK)
-    screen.blit(text_surface, (10, 70))
+    screen.blit(render_text(attacker_text), (10, 50))
+    screen.blit(render_text(defender_text), (10, 70))
+
+def hint_text(action):
+    """Строка подсказки для действия engine."""
+    from engine import ATTACK_MOVE, DEFEND, TAKE
+    names = ', '.join(card.name for card in action.cards)
+    if action.kind == ATTACK_MOVE:
+        return f"Hint: attack with {names}"
+    if action.kind == DEFEND:
+        return f"Hint: defend with {names}"
+    if action.kind == TAKE:
+        return "Hint: take the cards"
+    return "Hint: end turn"
 
-def main():
+def draw_scene(screen, game_state, end_turn_button, hands, hint=None):
+    """
+    Рисует всю сцену; при установленном screen.set_clip меняются только пиксели внутри области.
+
+    hint - действие engine, предложенное HintWorker: его карты в руке обводятся,
+    а текст подсказки выводится под состоянием игры.
+    """
+    screen.fill(BACKGROUND_COLOR)
+
+    # Отрисовка игрового состояния
+    draw_game_state(screen, font, game_state)
+
+    # Отрисовка кнопки завершения хода
+    pygame.draw.rect(screen, WHITE, end_turn_button)
+    screen.blit(render_text("End Turn"), (end_turn_button.x + 10, end_turn_button.y + 15))
+
+    # Отрисовка стола
+    pygame.draw.rect(screen, (24, 129, 24), table_area, 2)
+
+    # Отрисовка карт на столе; если пары не помещаются, карты перекрываются
+    step = min(CARD_WIDTH + 10, (table_area.width - CARD_WIDTH) // max(game_state.table_size - 1, 1))
+    for i, (attack, defense) in enumerate(game_state.table):
+        if attack:
+            draw_card(screen, attack,
+                    table_area.x + i * step,
+                    table_area.y)
+        if defense:
+            draw_card(screen, defense,
+                    table_area.x + i * step,
+                    table_area.y + CARD_HEIGHT//2)
+
+    # Отрисовка карт игроков
+    hinted = {id(card) for card in hint.cards} if hint is not None else ()
+    for hand in hands:
+        for card in hand:
+            draw_card(screen, card.card, card.rect.x, card.rect.y)
+            if id(card.card) in hinted:
+                pygame.draw.rect(screen, HINT_COLOR, card.rect, 3)
+
+    if hint is not None:
+        from engine import FINISH, TAKE
+        screen.blit(render_text(hint_text(hint)), (10, 90))
+        if hint.kind in (FINISH, TAKE):
+            pygame.draw.rect(screen, HINT_COLOR, end_turn_button, 3)
+
+class DirtyRenderer:
+    """
+    Перерисовывает только измененные области экрана.
+
+    Области копятся через invalidate(); render() рисует сцену с обрезкой по
+    их объединению и передает его в pygame.display.update. Если ничего не
+    менялось, кадр не рисуется вовсе.
+    """
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.dirty = [screen.get_rect()]
+
+    def invalidate(self, rect=None):
+        """Помечает область (по умолчанию весь экран) как требующую перерисовки."""
+        self.dirty.append(pygame.Rect(rect) if rect is not None else self.screen.get_rect())
+
+    def render(self, draw):
+        if not self.dirty:
+            return
+        area = self.dirty[0].unionall(self.dirty[1:]).clip(self.screen.get_rect())
+        self.dirty = []
+        self.screen.set_clip(area)
+        draw(self.screen)
+        self.screen.set_clip(None)
+        pygame.display.update([area])
+
+class HintWorker:
+    """
+    Фоновая оценка позиций поиском mcts.search в отдельном процессе.
+
+    request() никогда не блокирует: возвращает лучшее действие из кэша или
+    None, отправив позицию на оценку. Результаты кэшируются по хэшу позиции
+    (engine.Game.hash, LRU на cache_size позиций). Если позиция изменилась,
+    еще не начатые оценки прежних позиций отменяются, а уже идущие
+    дорабатывают и попадают в кэш. Основной цикл вызывает poll() каждый
+    кадр, чтобы узнать о новых результатах.
+    """
+
+    def __init__(self, time_budget=HINT_TIME_BUDGET, cache_size=HINT_CACHE_SIZE, seed=None):
+        from concurrent.futures import ProcessPoolExecutor
+        self.time_budget = time_budget
+        self.cache_size = cache_size
+        self.rng = random.Random(seed)
+        self._cache = OrderedDict()    # хэш позиции -> {ключ действия: число посещений}
+        self._futures = {}             # хэш позиции -> Future с результатом search
+        self._executor = ProcessPoolExecutor(max_workers=1)
+
+    def request(self, game, time_budget=None):
+        """
+        Лучшее действие для игрока, который ходит в game, или None, если оценка еще идет.
+
+        Args:
+            game: engine.Game (не изменяется; в процесс уходит его копия)
+            time_budget: Секунд на оценку (по умолчанию self.time_budget)
+        """
+        from mcts import action_key, search
+        actions = game.legal_actions()
+        if len(actions) == 1:
+            return actions[0]
+        key = game.hash
+        self.poll()
+        visits = self._cache.get(key)
+        if visits is not None:
+            self._cache.move_to_end(key)
+            return max(actions, key=lambda action: visits.get(action_key(action), 0))
+
+        # Позиция изменилась: еще не начатые оценки других позиций не нужны
+        for other, future in list(self._futures.items()):
+            if other != key and future.cancel():
+                del self._futures[other]
+        if key not in self._futures:
+            self._futures[key] = self._executor.submit(
+                search, game, game.to_move, time_budget or self.time_budget,
+                None, self.rng.getrandbits(32))
+        return None
+
+    def poll(self):
+        """
+        Переносит готовые оценки в кэш.
+
+        Returns:
+            bool: True, если появился хотя бы один новый результат
+        """
+        done = [key for key, future in self._futures.items() if future.done()]
+        for key in done:
+            future = self._futures.pop(key)
+            if future.cancelled() or future.exception() is not None:
+                continue
+            self._cache[key] = future.result()[0]
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return bool(done)
+
+    def close(self):
+        """Отменяет ожидающие оценки и останавливает процесс."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._futures.clear()
+
+def main(vs_computer=False, fps_limit=FPS_LIMIT, headless=False, show_hints=False,
+         collect_metrics=False):
+    import metrics
+    if collect_metrics:
+        metrics.enable()
+    init_display(headless)
+    worker = None
     try:
         # Инициализация игры
         deck = Deck()
@@ -145,19 +545,37 @@ def main():
         # Кнопка для завершения хода
         end_turn_button = pygame.Rect(SCREEN_WIDTH - 110, SCREEN_HEIGHT//2 - 25, 100, 50)
 
+        # Компьютер играет за Player 2, поиск хода и подсказок идет в фоновом процессе
+        if vs_computer or show_hints:
+            worker = HintWorker()
+        cards_by_player = {player1: player1_cards, player2: player2_cards}
+        layer = CardLayer(player1_cards + player2_cards)
+        hand_rows = {player1: 50, player2: SCREEN_HEIGHT - CARD_HEIGHT - 50}
+
+        renderer = DirtyRenderer(screen)
+        clock = pygame.time.Clock()
+        hands = (player1_cards, player2_cards)
+
+        engine_game = None  # engine.Game текущего состояния; None - пересобрать
+        hint = None
+
+        def draw(surface):
+            draw_scene(surface, game_state, end_turn_button, hands, hint)
+
         running = True
         while running:
-            screen.fill(BACKGROUND_COLOR)
-            
-            # Отрисовка игрового состояния
-            draw_game_state(screen, font, game_state)
-            
-            # Отрисовка кнопки завершения хода
-            pygame.draw.rect(screen, WHITE, end_turn_button)
-            text_surface = font.render("End Turn", True, BLACK)
-            screen.blit(text_surface, (end_turn_button.x + 10, end_turn_button.y + 15))
-
+            metrics.begin("frame")
+            metrics.phase("events")
             for event in pygame.event.get():
+                # Перетаскивание меняет только область под картой (старое и новое
+                # положение), клики и отпускание могут изменить состояние игры
+                dragged = layer.dragging if event.type == pygame.MOUSEMOTION else None
+                if dragged is not None:
+                    renderer.invalidate(dragged.rect)
+                elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+                    renderer.invalidate()
+                    engine_game = None
+
                 if event.type == pygame.QUIT:
                     running = False
                 
@@ -169,51 +587,59 @@ def main():
                         else:
                             game_state.switch_players()
                 
-                # Обработка перетаскивания карт
-                for card in player1_cards + player2_cards:
-                    if card.handle_event(event, game_state):
-                        # Обработка размещения карты на столе
-                        if game_state.phase == "ATTACK":
-                            # Добавление карты на стол и обновление активных фракций
-                            for i, (attack, defense) in enumerate(game_state.table):
-                                if not attack:
-                                    game_state.table[i] = (card.card, None)
-                                    game_state.active_factions.update(card.card.faction_ids)
-                                    if card in player1_cards:
-                                        player1_cards.remove(card)
-                                    else:
-                                        player2_cards.remove(card)
-                                    break
-                        else:  # DEFENSE
-                            # Добавление карты защиты
-                            for i, (attack, defense) in enumerate(game_state.table):
-                                if attack and not defense and card.card.rank > attack.rank:
-                                    game_state.table[i] = (attack, card.card)
-                                    if card in player1_cards:
-                                        player1_cards.remove(card)
-                                    else:
-                                        player2_cards.remove(card)
-                                    break
-
-            # Отрисовка стола
-            pygame.draw.rect(screen, (24, 129, 24), TABLE_AREA, 2)
-            
-            # Отрисовка карт на столе
-            for i, (attack, defense) in enumerate(game_state.table):
-                if attack:
-                    draw_card(screen, attack, 
-                            TABLE_AREA.x + i * (CARD_WIDTH + 10), 
-                            TABLE_AREA.y)
-                if defense:
-                    draw_card(screen, defense, 
-                            TABLE_AREA.x + i * (CARD_WIDTH + 10), 
-                            TABLE_AREA.y + CARD_HEIGHT//2)
-
-            # Отрисовка карт игроков
-            for card in player1_cards:
-                draw_card(screen, card.card, card.rect.x, card.rect.y)
-            for card in player2_cards:
-                draw_card(screen, card.card, card.rect.x, card.rect.y)
+                # Обработка перетаскивания карт: событие получает только карта под курсором
+                card = layer.dispatch(event, game_state)
+                if card is not None:
+                    # Обработка размещения карты на столе
+                    if game_state.phase == "ATTACK":
+                        # Добавление карты на стол и обновление активных фракций
+                        for i, (attack, defense) in enumerate(game_state.table):
+                            if not attack:
+                                game_state.table[i] = (card.card, None)
+                                game_state.active_factions.update(card.card.faction_ids)
+                                cards_by_player[card.owner].remove(card)
+                                layer.remove(card)
+                                break
+                    else:  # DEFENSE
+                        # Добавление карты защиты
+                        for i, (attack, defense) in enumerate(game_state.table):
+                            if attack and not defense and card.card.rank > attack.rank:
+                                game_state.table[i] = (attack, card.card)
+                                cards_by_player[card.owner].remove(card)
+                                layer.remove(card)
+                                break
+
+                if dragged is not None:
+                    renderer.invalidate(dragged.rect)
+
+            # Ход компьютера и подсказки: результаты поиска забираются без ожидания
+            metrics.phase("search")
+            acting_player = game_state.current_attacker if game_state.phase == "ATTACK" \
+                else game_state.current_defender
+            computer_turn = vs_computer and acting_player is player2
+            if worker and (computer_turn or show_hints) and player1_cards and player2_cards:
+                if engine_game is None:
+                    engine_game = build_engine_game(game_state,
+                                                    cards_by_player[game_state.current_attacker],
+                                                    cards_by_player[game_state.current_defender], deck)
+                    if hint is not None:
+                        hint = None
+                        renderer.invalidate()
+                if computer_turn:
+                    action = worker.request(engine_game, AI_TIME_BUDGET)
+                    if action is not None:
+                        apply_action(action, game_state, cards_by_player, hand_rows, deck)
+                        layer.rebuild(player1_cards + player2_cards)
+                        engine_game = None
+                        renderer.invalidate()
+                elif hint is None:
+                    hint = worker.request(engine_game)
+                    if hint is not None:
+                        renderer.invalidate()
+
+            metrics.phase("draw")
+            renderer.render(draw)
+            metrics.end()
 
             # Проверка победных условий
             if not player1_cards:
@@ -223,12 +649,21 @@ def main():
                 print("Player 2 wins!")
                 running = False
 
-            pygame.display.flip()
+            # Кадр, занявший больше полутора интервалов FPS_LIMIT, считается пропущенным
+            if clock.tick(fps_limit) > 1500 / fps_limit:
+                metrics.count("frame.dropped")
+            metrics.count("frames")
 
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
-        pygame.quit()
+        if worker:
+            worker.close()
+        close_display()
+        if collect_metrics:
+            metrics.disable()
+            metrics.export()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(vs_computer="--ai" in sys.argv, headless="--headless" in sys.argv,
+         show_hints="--hints" in sys.argv, collect_metrics="--metrics" in sys.argv)
\ No newline at end of file
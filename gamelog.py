@@ -0,0 +1,363 @@
+# gamelog.py
+
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from card import lookup
+from cardset import CardIndex, default_index
+from engine import ATTACK, ATTACK_MOVE, DEFEND, FINISH_ACTION, OVER, TAKE, TAKE_ACTION, Action, Game
+from faction_manager import FactionManager
+from state import full_hash
+
+# Формат журнала (little-endian).
+# Файл журнала:  заголовок (magic, версия, число карт, имена карт) и партии подряд.
+# Партия:        записи; каждая запись - (вид, игрок, число) и полезная нагрузка.
+#   DEAL, ATTACK, DEFEND, TAKE, DISCARD, DRAW: номера карт (u8 * число, u16 для
+#                  наборов больше 256 карт)
+#   RECYCLE:       без нагрузки, число - сколько карт сброса ушло в колоду
+#   WIN:           без нагрузки, игрок - победитель (NO_WINNER - ничья)
+#   CHECKPOINT:    состояние в начале хода: ход (u32), число пар стола и слотов
+#                  FactionManager (u16, u16), руки, открытые карты рук и сброс
+#                  (маски), колода
+#                  (номера карт); игрок - атакующий
+# Файл индекса (путь журнала + ".idx"): на каждую партию смещение и длина (u64, u32).
+MAGIC = b"OPGL"
+VERSION = 3
+FILE_HEADER = struct.Struct("<4sHI")
+NAME_LENGTH = struct.Struct("<H")
+RECORD = struct.Struct("<BBH")
+CHECKPOINT_HEADER = struct.Struct("<IHH")
+INDEX_ENTRY = struct.Struct("<QI")
+
+DEAL, ATTACK_EVENT, DEFEND_EVENT, TAKE_EVENT, DISCARD, DRAW, RECYCLE, WIN, CHECKPOINT = range(1, 10)
+EVENT_NAMES = {DEAL: "deal", ATTACK_EVENT: "attack", DEFEND_EVENT: "defend", TAKE_EVENT: "take",
+               DISCARD: "discard", DRAW: "draw", RECYCLE: "recycle", WIN: "win",
+               CHECKPOINT: "checkpoint"}
+NO_WINNER = 255
+
+CHECKPOINT_INTERVAL = 16   # Снимок состояния каждые столько ходов
+BUFFER_SIZE = 1 << 16
+
+Event = namedtuple('Event', 'kind player cards')
+
+
+def _positions(index, cards):
+    bits = index.bits
+    return [bits[card].bit_length() - 1 for card in cards]
+
+
+def _position_format(index):
+    """Формат struct для одного номера карты: байт, если карт не больше 256."""
+    return "B" if len(index) <= 256 else "H"
+
+
+class GameLogWriter:
+    """
+    Потоковая запись партий engine.Game в журнал.
+
+    Записи копятся в буфере и сбрасываются в файл блоками по buffer_size
+    байт; файл и индекс только дописываются. Использование:
+    start(game) перед первым ходом, step(game, action) вместо game.step(action).
+    engine.play_game(..., log=writer) делает это сам.
+    """
+
+    def __init__(self, path, cards=None, checkpoint_interval=CHECKPOINT_INTERVAL,
+                 buffer_size=BUFFER_SIZE):
+        self.path = path
+        self.cards = cards or default_index()
+        self.checkpoint_interval = checkpoint_interval
+        self.buffer_size = buffer_size
+        self._mask_size = 8 * self.cards.words
+        self._position = _position_format(self.cards)
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            names = _read_names(path)
+            if names != tuple(card.name for card in self.cards.cards):
+                raise ValueError(f"'{path}' was written for a different card set")
+        self._file = open(path, "ab")
+        self._index = open(path + ".idx", "ab")
+        self._offset = self._file.tell()
+        self._buffer = bytearray()
+        self._index_buffer = bytearray()
+        if not exists:
+            self._buffer += FILE_HEADER.pack(MAGIC, VERSION, len(self.cards))
+            for card in self.cards.cards:
+                name = card.name.encode("utf-8")
+                self._buffer += NAME_LENGTH.pack(len(name)) + name
+        self._game_start = None
+
+    def _record(self, kind, player, positions=()):
+        self._buffer += RECORD.pack(kind, player, len(positions))
+        self._buffer += struct.pack(f"<{len(positions)}{self._position}", *positions)
+
+    def _checkpoint(self, game):
+        draw = _positions(self.cards, game.draw_pile)
+        buffer = self._buffer
+        buffer += RECORD.pack(CHECKPOINT, game.attacker, len(draw))
+        buffer += CHECKPOINT_HEADER.pack(game.turns, len(game.table), game.faction_manager.slot_count)
+        for mask in (*game.hands, *game.known, game.discard):
+            buffer += mask.to_bytes(self._mask_size, "little")
+        buffer += struct.pack(f"<{len(draw)}{self._position}", *draw)
+
+    def start(self, game):
+        """Начинает партию: раздача и снимок начального состояния (стол должен быть пуст)."""
+        if game.cards is not self.cards:
+            raise ValueError("Game uses a different card index than the log")
+        if game.phase != ATTACK or game.table_bits:
+            raise ValueError("A game can only be logged from the start of a turn")
+        self._game_start = self._offset + len(self._buffer)
+        for player in (0, 1):
+            self._record(DEAL, player, _positions(self.cards, game.hand(player)))
+        self._checkpoint(game)
+
+    def step(self, game, action):
+        """Применяет action к game и записывает событие и его последствия (добор, сброс, победа)."""
+        index = self.cards
+        kind, cards = action
+        attacker, defender = game.attacker, game.defender
+        hands = game.hands[:]
+        table = game.table_bits
+        discard = game.discard
+        table_cards = [card for pair in game.table for card in pair if card is not None]
+        game.step(action)
+
+        if kind == ATTACK_MOVE:
+            self._record(ATTACK_EVENT, attacker, _positions(index, cards))
+        elif kind == DEFEND:
+            self._record(DEFEND_EVENT, defender, _positions(index, cards))
+        else:
+            if kind == TAKE:
+                self._record(TAKE_EVENT, defender, _positions(index, table_cards))
+                hands[defender] |= table
+            else:
+                self._record(DISCARD, attacker, _positions(index, table_cards))
+                discard |= table
+            recycled = discard & ~game.discard
+            if recycled:
+                self._buffer += RECORD.pack(RECYCLE, 0, recycled.bit_count())
+            for player in (attacker, defender):
+                drawn = game.hands[player] & ~hands[player]
+                if drawn:
+                    self._record(DRAW, player, _positions(index, index.cards_of(drawn)))
+            if game.phase == OVER:
+                self._record(WIN, NO_WINNER if game.winner is None else game.winner)
+                self._end()
+            elif game.turns % self.checkpoint_interval == 0:
+                self._checkpoint(game)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def _end(self):
+        length = self._offset + len(self._buffer) - self._game_start
+        self._index_buffer += INDEX_ENTRY.pack(self._game_start, length)
+        self._game_start = None
+
+    def flush(self):
+        """Дописывает буфер в журнал и индекс."""
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._offset += len(self._buffer)
+            self._buffer = bytearray()
+        # Индекс пишется после данных, поэтому он никогда не ссылается на незаписанную партию
+        self._file.flush()
+        if self._index_buffer:
+            self._index.write(self._index_buffer)
+            self._index_buffer = bytearray()
+            self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_names(path):
+    with open(path, "rb") as source:
+        magic, version, count = FILE_HEADER.unpack(source.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a game log (version {VERSION})")
+        names = []
+        for _ in range(count):
+            length, = NAME_LENGTH.unpack(source.read(NAME_LENGTH.size))
+            names.append(source.read(length).decode("utf-8"))
+    return tuple(names)
+
+
+class GameLog:
+    """
+    Чтение журнала: партия по номеру за O(1) через индекс, ход - от ближайшего снимка.
+
+    Карты берутся из реестра карт (card.lookup) по именам из заголовка,
+    поэтому набор карт журнала должен быть загружен (deck или catalog).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        index = default_index()   # регистрирует стандартный набор
+        names = _read_names(path)
+        cards = [lookup(name) for name in names]
+        missing = [name for name, card in zip(names, cards) if card is None]
+        if missing:
+            raise ValueError(f"Cards are not registered: {', '.join(missing[:5])}")
+        self.cards = index if index.cards == tuple(cards) else CardIndex(cards)
+        self._mask_size = 8 * self.cards.words
+        self._position = _position_format(self.cards)
+        self._width = struct.calcsize(self._position)
+        with open(path, "rb") as source:
+            self._data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(path + ".idx", "rb") as source:
+            self._index = source.read()
+
+    def __len__(self):
+        return len(self._index) // INDEX_ENTRY.size
+
+    def _records(self, number):
+        """Записи партии: (вид, игрок, номера карт или снимок)."""
+        offset, length = INDEX_ENTRY.unpack_from(self._index, number * INDEX_ENTRY.size)
+        data = self._data
+        position, end = offset, offset + length
+        records = []
+        while position < end:
+            kind, player, count = RECORD.unpack_from(data, position)
+            position += RECORD.size
+            if kind == CHECKPOINT:
+                turns, pairs, slot_count = CHECKPOINT_HEADER.unpack_from(data, position)
+                position += CHECKPOINT_HEADER.size
+                masks = []
+                for _ in range(5):
+                    masks.append(int.from_bytes(data[position:position + self._mask_size], "little"))
+                    position += self._mask_size
+                draw = struct.unpack_from(f"<{count}{self._position}", data, position)
+                position += self._width * count
+                records.append((kind, player, (turns, pairs, slot_count, masks, draw)))
+            elif kind == RECYCLE:
+                records.append((kind, player, count))
+            else:
+                records.append((kind, player, struct.unpack_from(f"<{count}{self._position}", data, position)))
+                position += self._width * count
+        return records
+
+    def events(self, number):
+        """События партии; у RECYCLE в cards - число карт, у CHECKPOINT - номер хода."""
+        cards = self.cards.cards
+        events = []
+        for kind, player, payload in self._records(number):
+            if kind == CHECKPOINT:
+                events.append(Event(EVENT_NAMES[kind], player, payload[0]))
+            elif kind == RECYCLE:
+                events.append(Event(EVENT_NAMES[kind], None, payload))
+            elif kind == WIN:
+                events.append(Event(EVENT_NAMES[kind], None if player == NO_WINNER else player, ()))
+            else:
+                events.append(Event(EVENT_NAMES[kind], player, tuple(cards[i] for i in payload)))
+        return events
+
+    def _restore(self, attacker, payload, recycles):
+        turns, pairs, slot_count, masks, draw = payload
+        index = self.cards
+        game = Game.__new__(Game)
+        game.cards = index
+        game.hands = [masks[0], masks[1]]
+        game.known = [masks[2], masks[3]]
+        game.table = [(None, None)] * pairs
+        game.table_bits = 0
+        game.draw_pile = [index.cards[i] for i in draw]
+        game.discard = masks[4]
+        game.faction_manager = FactionManager(slot_count)
+        game.attacker = attacker
+        game.phase = ATTACK
+        game.winner = None
+        game.turns = turns
+        game.recycles = recycles
+        game.transpositions = None
+        game.hash = full_hash(game)
+        return game
+
+    def seek(self, number, turn=None):
+        """
+        Состояние партии number в начале хода turn (None - конец партии).
+
+        Восстанавливается ближайший снимок не позже turn, дальше доигрываются
+        только записанные действия этого отрезка.
+        """
+        records = self._records(number)
+        start = 0
+        recycles = 0
+        seen = 0   # Замешиваний сброса до текущей записи
+        for position, (kind, player, payload) in enumerate(records):
+            if kind == RECYCLE:
+                seen += 1
+            elif kind == CHECKPOINT and (turn is None or payload[0] <= turn):
+                start, recycles = position, seen
+        _, attacker, payload = records[start]
+        game = self._restore(attacker, payload, recycles)
+        cards = self.cards.cards
+        for kind, player, payload in records[start + 1:]:
+            if turn is not None and game.turns >= turn:
+                break
+            if kind == ATTACK_EVENT:
+                game.step(Action(ATTACK_MOVE, tuple(cards[i] for i in payload)), validate=False)
+            elif kind == DEFEND_EVENT:
+                game.step(Action(DEFEND, tuple(cards[i] for i in payload)), validate=False)
+            elif kind == TAKE_EVENT:
+                game.step(TAKE_ACTION, validate=False)
+            elif kind == DISCARD:
+                game.step(FINISH_ACTION, validate=False)
+        return game
+
+    def close(self):
+        self._data.close()
+
+
+def main():
+    import random
+    import sys
+    import time
+    from engine import greedy_policy, play_game, random_policy
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ("record", "show"):
+        print("Usage: python gamelog.py record LOG [GAMES] | show LOG GAME [TURN]")
+        return
+    path = sys.argv[2]
+    if sys.argv[1] == "record":
+        n_games = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        rng = random.Random(0)
+        start = time.perf_counter()
+        with GameLogWriter(path) as writer:
+            for _ in range(n_games):
+                play_game((greedy_policy, random_policy), rng, log=writer)
+        elapsed = time.perf_counter() - start
+        print(f"{n_games} games logged in {elapsed:.2f}s, {os.path.getsize(path)} bytes")
+        return
+
+    log = GameLog(path)
+    number = int(sys.argv[3])
+    if len(sys.argv) > 4:
+        start = time.perf_counter()
+        game = log.seek(number, int(sys.argv[4]))
+        elapsed = time.perf_counter() - start
+        print(f"Turn {game.turns}, attacker Player {game.attacker + 1} (seek {elapsed * 1000:.2f} ms)")
+        for player in (0, 1):
+            print(f"Player {player + 1}: {', '.join(card.name for card in game.hand(player))}")
+        return
+    for event in log.events(number):
+        if event.kind == "checkpoint":
+            print(f"-- turn {event.cards}")
+        elif event.kind == "recycle":
+            print(f"recycle {event.cards} cards")
+        elif event.kind == "win":
+            print("draw" if event.player is None else f"Player {event.player + 1} wins")
+        else:
+            print(f"Player {event.player + 1} {event.kind}: {', '.join(card.name for card in event.cards)}")
+
+
+if __name__ == "__main__":
+    main()
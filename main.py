@@ -1,7 +1,14 @@
 import random
-from deck import Deck, populate_deck, Card
-from player import Player, deal_cards
+import sys
+import metrics
+from deck import Deck, populate_deck
+from player import Player, deal_cards, refill_hands
 from faction_manager import FactionManager
+from movegen import find_cover
+from engine import Game, ATTACK, DEFENSE, FINISH, TAKE, TABLE_SIZE
+from mcts import MCTSPlayer
+
+AI_TIME_BUDGET = 1.0  # Секунд на ход компьютерного игрока
 
 
 def find_cards_with_shared_factions(deck, card_name):
@@ -55,14 +62,17 @@ def find_player_with_lowest_rank(players):
     return player_with_lowest_rank
 
 
-def initialize_table():
+def initialize_table(pairs=TABLE_SIZE):
     """
     Инициализирует стол с пустыми парами (атакующая карта, защитная карта).
 
+    Аргументы:
+    pairs (int): Число пар на столе (по умолчанию 6).
+
     Возвращает:
-    table (tuple): Кортеж из 6 пар карт (или None) для стола.
+    table (list): Список из pairs пар карт (или None) для стола.
     """
-    return [(None, None) for _ in range(6)]
+    return [(None, None) for _ in range(pairs)]
 
 
 def display_table(table, faction_manager):
@@ -82,26 +92,60 @@ def display_table(table, faction_manager):
     print("Active factions:", active_factions_str)
 
 
-def play_turn(attacker, defender, table, deck):
+def ai_move(ai_player, attacker, defender, table, deck, faction_manager, phase):
+    """
+    Запрашивает ход у компьютерного игрока и возвращает его в виде строки ввода.
+
+    Аргументы:
+    ai_player (MCTSPlayer): Компьютерный игрок.
+    phase (str): ATTACK или DEFENSE - за кого из игроков ходит компьютер.
+
+    Возвращает:
+    str: 'f', 'p' или номера карт через пробел, как при вводе с клавиатуры.
+    """
+    game = Game.from_table(attacker.hand, defender.hand, table, faction_manager, phase,
+                           deck.cards, deck.discard_pile, deck.recycles)
+    action = ai_player.choose(game)
+    player = attacker if phase == ATTACK else defender
+    if action.kind == FINISH:
+        print(f"{player.name} finishes the attack.")
+        return 'f'
+    if action.kind == TAKE:
+        print(f"{player.name} takes the cards.")
+        return 'p'
+    print(f"{player.name} plays: {', '.join(card.name for card in action.cards)}")
+    return ' '.join(str(player.hand.index(card) + 1) for card in action.cards)
+
+
+@metrics.timed("play_turn")
+def play_turn(attacker, defender, table, deck, ai=None):
     """
     Реализует один ход, когда атакующий и защищающийся игроки играют свои карты.
 
     Аргументы:
     attacker (Player): Игрок, который атакует.
     defender (Player): Игрок, который защищается.
-    table (list): Стол, представляющий текущие сыгранные карты.
+    table (list): Стол, представляющий текущие сыгранные карты (см. initialize_table).
+    ai (dict): Компьютерные игроки {Player: MCTSPlayer}, остальные ходят через input().
     """
-    faction_manager = FactionManager()
+    ai = ai or {}
+    # Каждая карта пары занимает свой слот менеджера фракций
+    faction_manager = FactionManager(2 * len(table))
     print(f"\n{attacker.name}'s turn to attack.")
 
     while True:
-        # Показываем карты в руке атакующего игрока
-        print(f"{attacker.name}'s hand:")
-        for i, card in enumerate(attacker.hand):
-            print(f"{i + 1}: {card}")
+        metrics.phase("attack")
+        if attacker in ai:
+            attack_input = ai_move(ai[attacker], attacker, defender, table, deck, faction_manager, ATTACK)
+        else:
+            # Показываем карты в руке атакующего игрока
+            print(f"{attacker.name}'s hand:")
+            for i, card in enumerate(attacker.hand):
+                print(f"{i + 1}: {card}")
 
-        # Выбор карт для атаки
-        attack_indices = input("Select the card numbers to attack (separated by space) or 'f' to finish: ").split()
+            # Выбор карт для атаки
+            attack_input = input("Select the card numbers to attack (separated by space) or 'f' to finish: ")
+        attack_indices = attack_input.split()
         
         if 'f' in attack_indices:
             if any(pair[0] is not None for pair in table):
@@ -139,25 +183,23 @@ def play_turn(attacker, defender, table, deck):
         display_table(table, faction_manager)
 
         # Защита
+        metrics.phase("defense")
         while True:
-            print(f"\n{defender.name}'s hand:")
-            for i, card in enumerate(defender.hand):
-                print(f"{i + 1}: {card}")
-            print("Enter 'p' to pass or select the card numbers to defend (separated by space):")
+            if defender in ai:
+                defense_input = ai_move(ai[defender], attacker, defender, table, deck, faction_manager, DEFENSE)
+            else:
+                print(f"\n{defender.name}'s hand:")
+                for i, card in enumerate(defender.hand):
+                    print(f"{i + 1}: {card}")
+                print("Enter 'p' to pass or select the card numbers to defend (separated by space):")
 
-            defense_input = input("Select the card numbers or 'p': ")
+                defense_input = input("Select the card numbers or 'p': ")
             if defense_input.lower() == 'p':
-                # Логика пропуска хода
-                cards_to_take = []
-                for pair in table:
-                    for card in pair:
-                        if card:
-                            new_card = Card(card.name, card.rank)
-                            new_card.faction_ids = set(card.faction_ids)
-                            cards_to_take.append(new_card)
+                # Логика пропуска хода: карты общие (см. card.register), поэтому не копируются
+                cards_to_take = [card for pair in table for card in pair if card]
                 
                 defender.hand.extend(cards_to_take)
-                table[:] = initialize_table()
+                table[:] = initialize_table(len(table))
                 faction_manager.clear()
                 print(f"{defender.name} passes and takes all cards from the table.")
                 
@@ -185,19 +227,14 @@ def play_turn(attacker, defender, table, deck):
                     print("You must cover all attack cards or take the cards from the table.")
                     continue
 
-                # Проверка рангов и фракций
-                valid_defense = True
-                for attack_card, defense_card in zip(attack_cards_on_table, defense_cards):
-                    if defense_card.rank <= attack_card.rank:
-                        print(f"Card {defense_card.name} (rank {defense_card.rank}) cannot cover {attack_card.name} (rank {attack_card.rank})")
-                        valid_defense = False
-                        break
-
-                if not valid_defense:
+                # Проверка рангов: карты защиты подбираются к картам атаки независимо от порядка ввода
+                cover = find_cover(attack_cards_on_table, defense_cards)
+                if cover is None:
+                    print("Selected cards cannot cover the attack cards - each defense card must have a higher rank.")
                     continue
 
                 # Размещение карт защиты на столе и добавление их фракций
-                for i, defense_card in enumerate(defense_cards):
+                for defense_card in cover:
                     for j in range(len(table)):
                         if table[j][0] is not None and table[j][1] is None:
                             table[j] = (table[j][0], defense_card)
@@ -209,12 +246,13 @@ def play_turn(attacker, defender, table, deck):
                 break  # Выход из цикла защиты после успешного хода
 
     # Перемещение карт со стола в стопку сброса
+    metrics.phase("discard")
     for attack_card, defense_card in table:
         if attack_card:
             deck.add_to_discard_pile(attack_card)
         if defense_card:
             deck.add_to_discard_pile(defense_card)
-    table[:] = initialize_table()
+    table[:] = initialize_table(len(table))
     faction_manager.clear()
 
     # Проверка на победу после успешной защиты
@@ -228,7 +266,9 @@ def play_turn(attacker, defender, table, deck):
     return True  # Возвращаем True, чтобы роли игроков поменялись
 
 
-def main():
+def main(collect_metrics=False):
+    if collect_metrics:
+        metrics.enable()
     # Создаем колоду и менеджер фракций
     deck = Deck()
     faction_manager = FactionManager()
@@ -258,25 +298,41 @@ def main():
     if first_player:
         print(f"\nПервым ходит {first_player.name}")
 
+    # Игра против компьютера: Player 2 ходит через MCTS
+    ai = {}
+    if input("Play against the computer? (y/n): ").strip().lower() == 'y':
+        ai[player2] = MCTSPlayer(time_budget=AI_TIME_BUDGET)
+        print(f"AI workers started in {ai[player2].warm_up():.3f}s")
+
     # Инициализация стола
     table = initialize_table()
 
     # Игровой цикл
-    while True:
-        turn_result = play_turn(first_player, second_player, table, deck)
-        
-        # Проверка на победу после каждого хода
-        if not first_player.hand:
-            print(f"{first_player.name} wins!")
-            break
-        if not second_player.hand:
-            print(f"{second_player.name} wins!")
-            break
-
-        if turn_result:
-            # Смена ролей атакующего и защищающегося
-            first_player, second_player = second_player, first_player
+    try:
+        while True:
+            turn_result = play_turn(first_player, second_player, table, deck, ai)
+
+            # Проверка на победу после каждого хода
+            if not first_player.hand:
+                print(f"{first_player.name} wins!")
+                break
+            if not second_player.hand:
+                print(f"{second_player.name} wins!")
+                break
+
+            # Добор карт до 6: сначала атакующий, затем защищающийся
+            refill_hands(deck, [first_player, second_player])
+
+            if turn_result:
+                # Смена ролей атакующего и защищающегося
+                first_player, second_player = second_player, first_player
+    finally:
+        for ai_player in ai.values():
+            ai_player.close()
+        if collect_metrics:
+            metrics.disable()
+            metrics.export()
 
 
 if __name__ == "__main__":
-    main()
+    main(collect_metrics="--metrics" in sys.argv)
@@ -0,0 +1,219 @@
+# mcts.py
+
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import OVER, greedy_policy
+from state import TranspositionTable, full_hash
+
+TRANSPOSITION_TABLE_SIZE = 1 << 16
+DETERMINIZATIONS = 32
+
+# Таблица транспозиций процесса (списки действий legal_actions): общая для
+# всех поисков в этом процессе
+_transpositions = None
+
+
+def action_key(action):
+    """Ключ действия, одинаковый во всех процессах (карты сравниваются по имени)."""
+    return action.kind, tuple(card.name for card in action.cards)
+
+
+def determinize(game, player, rng):
+    """
+    Копия game, в которой скрытые от player карты случайно перераспределены.
+
+    Скрыты рука соперника и нерозданная часть колоды; стол, сброс и
+    собственная рука известны. Карты, которые соперник забрал со стола
+    (game.known) и еще не сыграл, остаются у него в руке.
+    """
+    state = game.copy()
+    opponent = 1 - player
+    known = state.known[opponent]
+    hidden = list(state.cards.cards_of(state.hands[opponent] & ~known)) + state.draw_pile
+    rng.shuffle(hidden)
+    free = state.hands[opponent].bit_count() - known.bit_count()
+    state.hands[opponent] = known | state.cards.mask(hidden[:free])
+    state.draw_pile = hidden[free:]
+    state.hash = full_hash(state)
+    return state
+
+
+class _Node:
+    __slots__ = ('parent', 'player', 'children', 'visits', 'wins', 'available')
+
+    def __init__(self, parent, player):
+        self.parent = parent
+        self.player = player   # Игрок, сделавший ход, который ведет в этот узел
+        self.children = {}
+        self.visits = 0
+        self.wins = 0
+        self.available = 1
+
+
+def search(game, player, time_budget=None, max_rollouts=None, seed=None,
+           exploration=0.7, rollout_policy=greedy_policy, determinizations=DETERMINIZATIONS):
+    """
+    Информационное MCTS (ISMCTS) для одного процесса.
+
+    Каждая итерация берет одну из determinizations заранее выбранных
+    раскладок скрытых карт, спускается по общему дереву только по действиям,
+    допустимым в этой раскладке, и доигрывает партию политикой rollout_policy.
+    Раскладок немного, поэтому позиции повторяются: списки действий
+    берутся из таблицы транспозиций процесса. Результаты доигрываний не
+    кэшируются: исход зависит от скрытых карт и от rng политики, а не
+    только от видимой позиции.
+
+    Returns:
+        tuple: (словарь {ключ действия: число посещений}, число доигрываний)
+    """
+    global _transpositions
+    if _transpositions is None:
+        _transpositions = TranspositionTable(TRANSPOSITION_TABLE_SIZE)
+    _transpositions.new_generation()
+
+    rng = random.Random(seed)
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    pool = []
+    for _ in range(determinizations):
+        state = determinize(game, player, rng)
+        state.transpositions = _transpositions
+        pool.append(state)
+    root = _Node(None, None)
+    rollouts = 0
+    while max_rollouts is None or rollouts < max_rollouts:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        state = rng.choice(pool).copy()
+        node = root
+
+        # Выбор и расширение
+        while state.phase != OVER:
+            mover = state.to_move
+            untried = []
+            best = None
+            best_score = -1.0
+            for action in state.legal_actions():
+                key = action_key(action)
+                child = node.children.get(key)
+                if child is None:
+                    untried.append((key, action))
+                    continue
+                child.available += 1
+                score = (child.wins / child.visits
+                         + exploration * math.sqrt(math.log(child.available) / child.visits))
+                if score > best_score:
+                    best_score = score
+                    best = (child, action)
+            if untried:
+                key, action = rng.choice(untried)
+                child = _Node(node, mover)
+                node.children[key] = child
+                state.step(action, validate=False)
+                node = child
+                break
+            child, action = best
+            state.step(action, validate=False)
+            node = child
+
+        # Доигрывание
+        while state.phase != OVER:
+            state.step(rollout_policy(state, rng), validate=False)
+        winner = state.winner
+
+        # Обратное распространение
+        while node is not None:
+            node.visits += 1
+            if node.player == winner:
+                node.wins += 1
+            node = node.parent
+        rollouts += 1
+
+    return {key: child.visits for key, child in root.children.items()}, rollouts
+
+
+def _ping():
+    """Пустая задача для прогрева процессов пула."""
+    return os.getpid()
+
+
+class MCTSPlayer:
+    """
+    Компьютерный соперник на основе детерминизированного MCTS.
+
+    Поиск запускается независимо в workers процессах (параллелизм по корню),
+    счетчики посещений корневых действий суммируются. Бюджет хода задается
+    временем (time_budget, секунды) и/или общим числом доигрываний (max_rollouts).
+    Объект можно использовать как политику engine: player(game, rng) -> Action.
+    """
+
+    def __init__(self, time_budget=1.0, max_rollouts=None, workers=None,
+                 exploration=0.7, seed=None):
+        if time_budget is None and max_rollouts is None:
+            raise ValueError("Either time_budget or max_rollouts must be set")
+        self.time_budget = time_budget
+        self.max_rollouts = max_rollouts
+        self.workers = workers or os.cpu_count() or 1
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.last_rollouts = 0
+        self._executor = None
+
+    def choose(self, game):
+        """Выбирает действие для игрока, который ходит в game."""
+        actions = game.legal_actions()
+        if len(actions) == 1:
+            return actions[0]
+
+        player = game.to_move
+        if self.max_rollouts is not None:
+            rollouts = -(-self.max_rollouts // self.workers)
+        else:
+            rollouts = None
+        seeds = [self.rng.getrandbits(32) for _ in range(self.workers)]
+
+        if self.workers == 1:
+            results = [search(game, player, self.time_budget, rollouts, seeds[0], self.exploration)]
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [self._executor.submit(search, game, player, self.time_budget,
+                                             rollouts, seed, self.exploration)
+                       for seed in seeds]
+            results = [future.result() for future in futures]
+
+        visits = {}
+        self.last_rollouts = 0
+        for counts, done in results:
+            self.last_rollouts += done
+            for key, count in counts.items():
+                visits[key] = visits.get(key, 0) + count
+        return max(actions, key=lambda action: visits.get(action_key(action), 0))
+
+    def warm_up(self):
+        """
+        Запускает процессы пула заранее, чтобы первый ход не ждал их старта.
+
+        Returns:
+            float: Время запуска всех процессов в секундах
+        """
+        start = time.perf_counter()
+        if self.workers > 1:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+        return time.perf_counter() - start
+
+    def __call__(self, game, rng=None):
+        return self.choose(game)
+
+    def close(self):
+        """Останавливает пул процессов."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
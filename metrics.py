@@ -0,0 +1,292 @@
+# metrics.py
+
+import functools
+import importlib
+import json
+import time
+
+SUMMARY_PATH = "metrics.json"
+TRACE_PATH = "metrics.folded"
+BUCKETS = 256  # Корзины гистограммы: 4 на каждую степень двойки наносекунд
+
+# Методы, которые enable() оборачивает замером времени: (модуль, класс, методы).
+# Обертки ставятся только на время сбора, выключенный слой ничего не стоит
+INSTRUMENTED = (
+    ("faction_manager", "FactionManager", ("add_card_factions", "remove_card_factions",
+                                           "update_active_factions", "validate_multiple_cards",
+                                           "validate_masks")),
+    ("engine", "Game", ("step", "legal_actions")),
+)
+
+enabled = False
+_counters = {}
+_histograms = {}
+_folded = {}      # путь вложенных замеров "a;b;c" -> собственное время, нс
+_stack = []       # открытые замеры: [имя, путь, начало, время вложенных, это фаза]
+_originals = []   # (класс, метод, исходная функция) для disable()
+
+
+class Histogram:
+    """
+    Гистограмма длительностей (в наносекундах) с логарифмическими корзинами.
+
+    Каждая степень двойки делится на 4 корзины по старшим битам, поэтому
+    процентили точны до 25%. Запись - несколько битовых операций и
+    инкремент, гистограмма годится для горячих путей.
+    """
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def add(self, nanoseconds):
+        self.buckets[_bucket(nanoseconds)] += 1
+        self.count += 1
+        self.total += nanoseconds
+        if self.min is None or nanoseconds < self.min:
+            self.min = nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+
+    def percentile(self, fraction):
+        """Верхняя граница корзины, в которую попадает процентиль fraction (нс)."""
+        if not self.count:
+            return 0
+        rank = fraction * self.count
+        seen = 0
+        for k, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_limit(k), self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "total_ms": self.total / 1e6,
+                "mean_us": self.total / self.count / 1e3 if self.count else 0.0,
+                "min_us": (self.min or 0) / 1e3, "p50_us": self.percentile(0.5) / 1e3,
+                "p99_us": self.percentile(0.99) / 1e3, "max_us": self.max / 1e3}
+
+
+def _bucket(nanoseconds):
+    length = nanoseconds.bit_length()
+    if length < 3:
+        return nanoseconds
+    return (length - 2) * 4 + (nanoseconds >> (length - 3)) - 4
+
+
+def _bucket_limit(k):
+    """Наибольшая длительность корзины k."""
+    if k < 4:
+        return k
+    length = k // 4 + 2
+    return ((k % 4 + 5) << (length - 3)) - 1
+
+
+def enable():
+    """Включает сбор метрик с чистого листа и оборачивает методы INSTRUMENTED."""
+    global enabled
+    reset()
+    if enabled:
+        return
+    for module_name, class_name, methods in INSTRUMENTED:
+        cls = getattr(importlib.import_module(module_name), class_name)
+        for method in methods:
+            original = cls.__dict__[method]
+            _originals.append((cls, method, original))
+            setattr(cls, method, _wrap(original, method))
+    enabled = True
+
+
+def disable():
+    """Выключает сбор и возвращает исходные методы; собранные данные сохраняются."""
+    global enabled
+    for cls, method, original in reversed(_originals):
+        setattr(cls, method, original)
+    _originals.clear()
+    _stack.clear()
+    enabled = False
+
+
+def reset():
+    _counters.clear()
+    _histograms.clear()
+    _folded.clear()
+    _stack.clear()
+
+
+def count(name, n=1):
+    """Увеличивает счетчик name."""
+    if enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name, nanoseconds):
+    """Добавляет длительность в гистограмму name."""
+    if enabled:
+        _observe(name, nanoseconds)
+
+
+def _observe(name, nanoseconds):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = Histogram()
+    histogram.add(nanoseconds)
+
+
+def begin(name):
+    """Открывает замер name внутри текущего; закрывается end()."""
+    if enabled:
+        _begin(name, False)
+
+
+def _begin(name, phase):
+    if _stack:
+        parent = _stack[-1]
+        path = f"{parent[1]};{name}"
+        if phase:
+            name = f"{parent[0]}.{name}"
+    else:
+        path = name
+    _stack.append([name, path, time.perf_counter_ns(), 0, phase])
+
+
+def end():
+    """Закрывает последний открытый замер вместе с его фазой."""
+    if enabled:
+        if _stack and _stack[-1][4]:
+            _end()
+        if _stack:
+            _end()
+
+
+def _end():
+    name, path, start, children, _ = _stack.pop()
+    elapsed = time.perf_counter_ns() - start
+    _observe(name, elapsed)
+    _folded[path] = _folded.get(path, 0) + elapsed - children
+    if _stack:
+        _stack[-1][3] += elapsed
+
+
+def phase(name):
+    """
+    Начинает фазу name текущего замера, закрывая предыдущую фазу.
+
+    Гистограмма фазы называется "<замер>.<name>"; последняя фаза
+    закрывается вместе с замером (end() или выход из timed).
+    """
+    if enabled:
+        if _stack and _stack[-1][4]:
+            _end()
+        _begin(name, True)
+
+
+def timed(name):
+    """Декоратор: замеряет вызовы функции как name, закрывая ее незакрытые фазы."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            depth = len(_stack)
+            _begin(name, False)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                while len(_stack) > depth:
+                    _end()
+        return wrapper
+    return decorator
+
+
+def _wrap(function, name):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        _begin(name, False)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _end()
+    return wrapper
+
+
+def summary():
+    """Счетчики и сводки гистограмм: {"counters": {...}, "timings": {имя: {...}}}."""
+    return {"counters": dict(_counters),
+            "timings": {name: histogram.summary() for name, histogram in sorted(_histograms.items())}}
+
+
+def report():
+    """Таблица сводки для печати."""
+    lines = [f"{'timing':<40}{'count':>10}{'total ms':>11}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+    for name, item in summary()["timings"].items():
+        lines.append(f"{name:<40}{item['count']:>10}{item['total_ms']:>11.1f}{item['mean_us']:>10.2f}"
+                     f"{item['p50_us']:>10.2f}{item['p99_us']:>10.2f}{item['max_us']:>10.1f}")
+    for name, value in sorted(_counters.items()):
+        lines.append(f"{name:<40}{value:>10}")
+    return "\n".join(lines)
+
+
+def write_trace(path=TRACE_PATH):
+    """
+    Записывает собственное время замеров в формате свернутых стеков
+    ("a;b;c <микросекунды>" на строку) - тот же формат, что у py-spy
+    --format raw; его читают flamegraph.pl, inferno и speedscope.
+    """
+    with open(path, "w", encoding="utf-8") as output:
+        for stack, nanoseconds in sorted(_folded.items()):
+            microseconds = nanoseconds // 1000
+            if microseconds:
+                output.write(f"{stack} {microseconds}\n")
+
+
+def export(summary_path=SUMMARY_PATH, trace_path=TRACE_PATH):
+    """Печатает отчет, сохраняет сводку в JSON и трассу (см. write_trace)."""
+    print(report())
+    with open(summary_path, "w", encoding="utf-8") as output:
+        json.dump(summary(), output, indent=2)
+    write_trace(trace_path)
+    print(f"Metrics summary in {summary_path}, trace in {trace_path}")
+
+
+def main():
+    import argparse
+    import random
+    from engine import Game, OVER, greedy_policy, random_policy
+
+    parser = argparse.ArgumentParser(description="Profile simulated games with the metrics layer.")
+    parser.add_argument("games", nargs="?", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--summary", default=SUMMARY_PATH)
+    parser.add_argument("--trace", default=TRACE_PATH)
+    args = parser.parse_args()
+
+    @timed("game")
+    def play(rng):
+        game = Game.new_game(rng)
+        while game.phase != OVER:
+            policy = greedy_policy if rng.random() < 0.8 else random_policy
+            game.step(policy(game, rng))
+
+    def run():
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        for _ in range(args.games):
+            play(rng)
+        return time.perf_counter() - start
+
+    run()  # Прогрев: ключи Zobrist и кэши карт создаются при первом обращении
+    baseline = run()
+    enable()
+    instrumented = run()
+    disable()
+    print(f"{args.games} games: {baseline:.2f}s without metrics, {instrumented:.2f}s with metrics")
+    export(args.summary, args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# movegen.py
+
+from functools import lru_cache
+from itertools import combinations
+
+from cardset import iter_bits
+
+CACHE_SIZE = 1 << 16
+
+
+def legal_attacks(hand, active_mask, free_slots=6):
+    """
+    Все комбинации карт руки, которыми можно атаковать.
+
+    Правила те же, что у FactionManager.validate_multiple_cards: одна карта
+    должна пересекаться с активными фракциями (если они есть), несколько
+    карт - иметь общую фракцию, которая к тому же активна.
+
+    Args:
+        hand: Список карт руки
+        active_mask: Маска активных фракций (FactionManager.active_mask)
+        free_slots: Сколько карт еще помещается на стол
+
+    Returns:
+        list: Кортежи карт в порядке руки
+    """
+    indices = _attack_indices(tuple(card.faction_mask for card in hand),
+                              active_mask, min(free_slots, len(hand)))
+    return [tuple(hand[i] for i in combo) for combo in indices]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _attack_indices(masks, active_mask, max_size):
+    """Кортежи индексов допустимых атак; кэшируется по маскам руки и активным фракциям."""
+    if max_size <= 0:
+        return ()
+    options = [(i,) for i, mask in enumerate(masks) if not active_mask or mask & active_mask]
+    if max_size < 2:
+        return tuple(options)
+
+    if active_mask:
+        allowed = active_mask
+    else:
+        allowed = 0
+        for mask in masks:
+            allowed |= mask
+
+    # Комбинация из нескольких карт допустима, если все карты разделяют хотя бы
+    # одну разрешенную фракцию, поэтому перебираем подмножества каждой такой фракции
+    seen = set()
+    multi = []
+    while allowed:
+        bit = allowed & -allowed
+        allowed ^= bit
+        group = [i for i, mask in enumerate(masks) if mask & bit]
+        for size in range(2, min(len(group), max_size) + 1):
+            for combo in combinations(group, size):
+                key = 0
+                for i in combo:
+                    key |= 1 << i
+                if key not in seen:
+                    seen.add(key)
+                    multi.append(combo)
+    multi.sort(key=lambda combo: (len(combo), combo))
+    return tuple(options + multi)
+
+
+def attack_masks(hand, active_mask, max_size, index):
+    """
+    То же, что legal_attacks, для руки-битборда (см. cardset.CardIndex).
+
+    Returns:
+        tuple: Битборды допустимых атак в том же порядке, что и legal_attacks
+    """
+    return _attack_masks(hand, active_mask, min(max_size, hand.bit_count()), index)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _attack_masks(hand, active_mask, max_size, index):
+    """Тот же перебор, что в _attack_indices, но сразу над битами руки."""
+    if max_size <= 0:
+        return ()
+    faction_masks = index.faction_masks
+    positions = list(iter_bits(hand))
+    options = [1 << i for i in positions if not active_mask or faction_masks[i] & active_mask]
+    if max_size < 2:
+        return tuple(options)
+
+    if active_mask:
+        allowed = active_mask
+    else:
+        allowed = 0
+        for i in positions:
+            allowed |= faction_masks[i]
+
+    seen = set()
+    multi = []
+    while allowed:
+        bit = allowed & -allowed
+        allowed ^= bit
+        group = [i for i in positions if faction_masks[i] & bit]
+        for size in range(2, min(len(group), max_size) + 1):
+            for combo in combinations(group, size):
+                mask = 0
+                for i in combo:
+                    mask |= 1 << i
+                if mask not in seen:
+                    seen.add(mask)
+                    multi.append((size, combo, mask))
+    multi.sort()
+    return tuple(options + [mask for _, _, mask in multi])
+
+
+def find_cover(attacks, hand):
+    """
+    Подбирает защиту для всех карт атаки, независимо от порядка карт.
+
+    Каждая карта атаки, начиная с самой слабой, получает самую слабую карту
+    руки со строго большим рангом. Такое жадное паросочетание по рангу
+    находит покрытие всегда, когда оно существует.
+
+    Args:
+        attacks: Непокрытые карты атаки
+        hand: Карты, которыми можно защищаться
+
+    Returns:
+        tuple: Карты защиты в порядке attacks или None, если покрыть нельзя
+    """
+    indices = _cover_indices(tuple(card.rank for card in attacks),
+                             tuple(card.rank for card in hand))
+    if indices is None:
+        return None
+    return tuple(hand[i] for i in indices)
+
+
+def can_defend(attacks, hand):
+    """Проверяет, можно ли покрыть все карты атаки картами руки."""
+    return _cover_indices(tuple(card.rank for card in attacks),
+                          tuple(card.rank for card in hand)) is not None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cover_positions(attack_ranks, hand, index):
+    """
+    find_cover для руки-битборда: номера карт (в index) защиты в порядке attack_ranks или None.
+    """
+    positions = list(iter_bits(hand))
+    indices = _cover_indices(attack_ranks, tuple(index.ranks[i] for i in positions))
+    if indices is None:
+        return None
+    return tuple(positions[i] for i in indices)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cover_indices(attack_ranks, hand_ranks):
+    """Индексы карт руки для покрытия; кэшируется по рангам."""
+    if len(attack_ranks) > len(hand_ranks):
+        return None
+    available = sorted(range(len(hand_ranks)), key=hand_ranks.__getitem__)
+    cover = [None] * len(attack_ranks)
+    start = 0
+    for index in sorted(range(len(attack_ranks)), key=attack_ranks.__getitem__):
+        rank = attack_ranks[index]
+        # Атаки идут по возрастанию ранга, поэтому слабые карты, не подошедшие
+        # предыдущей атаке, не подойдут и следующей
+        while start < len(available) and hand_ranks[available[start]] <= rank:
+            start += 1
+        if start == len(available):
+            return None
+        cover[index] = available[start]
+        start += 1
+    return tuple(cover)
+
+
+def clear_cache():
+    """Сбрасывает кэши генератора ходов."""
+    _attack_indices.cache_clear()
+    _attack_masks.cache_clear()
+    _cover_indices.cache_clear()
+    cover_positions.cache_clear()
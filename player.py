@@ -1,5 +1,7 @@
 # player.py
 
+from deck import HAND_SIZE
+
 class Player:
     def __init__(self, name):
         self.name = name
@@ -7,22 +9,35 @@ class Player:
 
     def receive_card(self, card):
         """Получить карту в руку игрока."""
-        if len(self.hand) < 6:
+        if len(self.hand) < HAND_SIZE:
             self.hand.append(card)
         else:
-            print(f"{self.name} already has 6 cards.")
+            print(f"{self.name} already has {HAND_SIZE} cards.")
 
     def __str__(self):
         hand_str = ', '.join(str(card.name) for card in self.hand) if self.hand else 'No cards'
         return f"Player: {self.name}\n  Hand: [{hand_str}]"
 
 def deal_cards(deck, players):
-    """Раздаем 6 карт каждому игроку из колоды."""
-    for _ in range(6):
+    """Раздаем HAND_SIZE карт каждому игроку из колоды."""
+    for _ in range(HAND_SIZE):
         for player in players:
             if deck.cards:
-                card = deck.cards.pop(0)
+                card = deck.cards.pop()
                 player.receive_card(card)
             else:
                 print("Not enough cards in the deck to deal.")
                 return
+
+def refill_hands(deck, players):
+    """
+    Добираем карты до HAND_SIZE после хода: сначала атакующий, затем защищающийся.
+
+    Когда колода заканчивается, в нее замешивается стопка сброса.
+
+    Аргументы:
+    deck (Deck): Колода.
+    players (list): Игроки в порядке добора.
+    """
+    for player in players:
+        deck.refill(player.hand)
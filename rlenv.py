@@ -0,0 +1,223 @@
+# rlenv.py
+
+import random
+
+import numpy as np
+
+from cardset import default_index, iter_bits
+from engine import (ATTACK, ATTACK_MOVE, DEFEND, DEFENSE, FINISH_ACTION, OVER, TAKE_ACTION,
+                    Action, Game, greedy_policy)
+
+OBSERVATION_PARTS = ("hand", "attacks", "uncovered", "defenses", "discard", "selected", "factions", "scalars")
+_PLANES = 6   # Плоскости карт в начале наблюдения (hand .. selected)
+
+
+class CardGameEnv:
+    """
+    Среда в стиле Gym (reset / step / legal_action_mask) для одного игрока
+    против политики engine (opponent), по правилам engine.Game (= main.play_turn).
+
+    Действия - целые числа 0..n_cards:
+      карта c в фазе атаки - добавить c к выбранным картам атаки; карта
+        допустима, если выбранные карты вместе с ней - допустимая атака;
+      карта c в фазе защиты - c кроет самую младшую непокрытую атаку,
+        остальные атаки кроются жадно, как в movegen.find_cover;
+      PASS (= n_cards) - в атаке сыграть выбранные карты одной атакой, а
+        если ничего не выбрано - закончить ход; в защите - забрать карты.
+    Атака из k карт - k выборов и PASS; выбор карты не передает ход
+    сопернику и дает награду 0. Любое подмножество допустимой атаки тоже
+    допустимо, поэтому так выражается каждая атака engine.Game.
+
+    Наблюдение - float32 вектор фиксированной длины, записанный в заранее
+    выделенный буфер: своя рука без выбранных карт, карты атаки на столе,
+    непокрытые атаки, карты защиты, сброс, выбранные карты атаки (по
+    n_cards значений 0/1), активные фракции FactionManager (n_factions),
+    затем фаза (1 - защита), число карт у соперника и в колоде. reset и
+    step возвращают сам буфер, а legal_action_mask - свой буфер, без
+    копирования: следующий шаг их перезаписывает, поэтому сохранять нужно копию.
+    Награда в конце партии: 1 - победа, -1 - поражение. Ничьих нет, партия
+    всегда заканчивается (см. engine.Game), поэтому truncated всегда False.
+    """
+
+    def __init__(self, opponent=greedy_policy, seat=None, cards=None, seed=None):
+        self.cards = cards or default_index()
+        self.opponent = opponent
+        self.fixed_seat = seat
+        self.rng = random.Random(seed)
+        n_cards = len(self.cards)
+        self.n_cards = n_cards
+        self.n_factions = max(mask.bit_length() for mask in self.cards.faction_masks)
+        self.n_actions = n_cards + 1
+        self.PASS = n_cards
+        self._planes_bytes = (_PLANES * n_cards + 7) // 8
+        self._faction_bytes = (self.n_factions + 7) // 8
+
+        self.observation = np.zeros(_PLANES * n_cards + self.n_factions + 3, np.float32)
+        # Именованные представления частей наблюдения (тот же буфер)
+        self.views = dict(zip(OBSERVATION_PARTS, np.split(
+            self.observation, np.cumsum([n_cards] * _PLANES + [self.n_factions]))))
+        self._planes = self.observation[:_PLANES * n_cards]
+        self._factions = self.views["factions"]
+        self._scalars = self.views["scalars"]
+        self._mask = np.zeros(self.n_actions, bool)
+        self._covers = {}
+        self._selected = 0          # Выбранные карты атаки (битборд)
+        self._selected_common = 0   # Общие фракции выбранных карт
+        self.game = None
+        self.seat = 0
+
+    def reset(self, seed=None):
+        """Новая партия; если соперник ходит первым, его ходы уже сыграны."""
+        if seed is not None:
+            self.rng.seed(seed)
+        self.seat = self.rng.randrange(2) if self.fixed_seat is None else self.fixed_seat
+        self.game = Game.new_game(self.rng, self.cards.cards)
+        self._selected = self._selected_common = 0
+        self._play_opponent()
+        self._observe()
+        return self.observation, {}
+
+    def step(self, action):
+        """
+        Returns:
+            tuple: (наблюдение, награда, terminated, truncated, info)
+        """
+        if not self._mask[action]:
+            raise ValueError(f"Illegal action {action} in phase {self.game.phase}")
+        if self.game.phase == ATTACK and action != self.PASS:
+            mask = self.cards.faction_masks[action]
+            self._selected_common = self._selected_common & mask if self._selected else mask
+            self._selected |= 1 << int(action)
+            self._observe()
+            return self.observation, 0.0, False, False, {}
+        self.game.step(self._to_action(action), validate=False)
+        self._selected = self._selected_common = 0
+        self._play_opponent()
+        self._observe()
+        game = self.game
+        if game.phase != OVER:
+            return self.observation, 0.0, False, False, {}
+        return self.observation, 1.0 if game.winner == self.seat else -1.0, True, False, {}
+
+    def legal_action_mask(self):
+        return self._mask
+
+    def _play_opponent(self):
+        game = self.game
+        while game.phase != OVER and game.to_move != self.seat:
+            game.step(self.opponent(game, self.rng))
+
+    def _to_action(self, action):
+        game = self.game
+        cards = self.cards.cards
+        if action == self.PASS:
+            if game.phase == DEFENSE:
+                return TAKE_ACTION
+            if not self._selected:
+                return FINISH_ACTION
+            return Action(ATTACK_MOVE, tuple(cards[i] for i in iter_bits(self._selected)))
+        # Защита перечисляется в порядке непокрытых слотов, как ждет Game.step
+        order, rest = self._covers[action]
+        cover = dict(zip(order, (action, *rest)))
+        return Action(DEFEND, tuple(cards[cover[slot]] for slot in sorted(cover)))
+
+    def _unpack(self, mask, out, size):
+        out[:] = np.unpackbits(np.frombuffer(mask.to_bytes(size, 'little'), np.uint8),
+                               count=len(out), bitorder='little')
+
+    def _observe(self):
+        game = self.game
+        index = self.cards
+        bits = index.bits
+        hand = game.hands[self.seat]
+        attacks = uncovered = defenses = 0
+        for attack, defense in game.table:
+            if attack is not None:
+                attacks |= bits[attack]
+                if defense is None:
+                    uncovered |= bits[attack]
+                else:
+                    defenses |= bits[defense]
+        active = game.faction_manager.active_mask
+        # Плоскости карт идут подряд - одна распаковка на все
+        n = self.n_cards
+        selected = self._selected
+        planes = (hand & ~selected | attacks << n | uncovered << 2 * n | defenses << 3 * n
+                  | game.discard << 4 * n | selected << 5 * n)
+        self._unpack(planes, self._planes, self._planes_bytes)
+        self._unpack(active, self._factions, self._faction_bytes)
+        self._scalars[0] = game.phase == DEFENSE
+        self._scalars[1] = game.hands[1 - self.seat].bit_count()
+        self._scalars[2] = len(game.draw_pile)
+
+        # Маска действий по тем же правилам, что engine.Game.is_legal
+        mask = self._mask
+        mask[:] = False
+        self._covers = {}
+        if game.phase == ATTACK:
+            if game.free_slots() > selected.bit_count():
+                faction_masks = index.faction_masks
+                if not selected:
+                    for i in iter_bits(hand):
+                        mask[i] = not active or bool(faction_masks[i] & active)
+                else:
+                    # Как FactionManager.validate_masks для выбранных карт вместе с i
+                    allowed = self._selected_common & (active or -1)
+                    for i in iter_bits(hand & ~selected):
+                        mask[i] = bool(faction_masks[i] & allowed)
+            mask[self.PASS] = game.table_bits != 0 or selected != 0
+        elif game.phase == DEFENSE:
+            ranks = index.ranks
+            order = sorted(game.uncovered_attacks(), key=lambda slot: game.table[slot][0].rank)
+            attack_ranks = [game.table[slot][0].rank for slot in order]
+            positions = sorted(iter_bits(hand), key=ranks.__getitem__)
+            for i in positions:
+                if ranks[i] > attack_ranks[0]:
+                    rest = _cover_rest(attack_ranks, positions, ranks, i)
+                    if rest is not None:
+                        mask[i] = True
+                        self._covers[i] = (order, rest)
+            mask[self.PASS] = True
+
+
+def _cover_rest(attack_ranks, positions, ranks, used):
+    """
+    Жадное покрытие attack_ranks[1:] (по возрастанию) картами positions
+    (по возрастанию ранга) без карты used - как movegen.find_cover.
+    """
+    rest = []
+    k = 0
+    for rank in attack_ranks[1:]:
+        while k < len(positions) and (positions[k] == used or ranks[positions[k]] <= rank):
+            k += 1
+        if k == len(positions):
+            return None
+        rest.append(positions[k])
+        k += 1
+    return rest
+
+
+def main():
+    import sys
+    import time
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    env = CardGameEnv(seed=0)
+    rng = np.random.default_rng(0)
+    env.reset()
+    games = wins = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        legal = np.flatnonzero(env.legal_action_mask())
+        _, reward, terminated, truncated, _ = env.step(rng.choice(legal))
+        if terminated or truncated:
+            games += 1
+            wins += reward > 0
+            env.reset()
+    elapsed = time.perf_counter() - start
+    print(f"{steps} steps in {elapsed:.2f}s ({steps / elapsed:,.0f} steps/s, "
+          f"{steps / elapsed * 3600 / 1e6:.1f}M steps/hour)")
+    print(f"random agent vs greedy: {wins} wins in {games} games")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+# server.py
+
+import asyncio
+import gc
+import itertools
+import random
+import time
+
+from cardset import default_index, iter_bits
+from engine import (ATTACK, ATTACK_MOVE, DEFEND, DEFENSE, FINISH_ACTION, OVER, TAKE_ACTION,
+                    Action, Game, greedy_policy)
+from movegen import find_cover
+from sessions import SessionStore
+
+# Строчный протокол (ASCII, одна команда на строку, карты - номера в cardset.default_index()).
+#
+# Клиент -> сервер:
+#   Q                 встать в очередь на матч
+#   A 3,17            атака картами
+#   D 5,8             защита; карты в порядке непокрытых атак на столе
+#   F                 закончить ход
+#   T                 забрать карты
+#
+# Сервер -> клиент:
+#   M <матч> <место>
+#   S <фаза A|D> <атакующий> <ход> <активные фракции hex> <колода> <карт у соперника> <рука> <стол>
+#     рука - номера через запятую ('-' если пусто), стол - 2 * engine.TABLE_SIZE слотов
+#     (атака, защита) через запятую ('.' - пусто)
+#   E <победитель 0|1|->
+#   X <сообщение>     ошибка; состояние не изменилось
+PHASES = {ATTACK: "A", DEFENSE: "D"}
+TURN_TIMEOUT = 30.0       # Секунд на ход; по истечении за игрока ходит greedy_policy
+LINE_LIMIT = 256          # Максимальная длина строки от клиента
+WRITE_LIMIT = 16 * 1024   # Клиент, не читающий ответы, отключается при таком буфере
+MAX_MATCHES = 100000
+MAX_LIVE_GAMES = 10000      # Объектов Game в памяти; остальные партии - снимки SessionStore
+GC_FREEZE_INTERVAL = 10.0   # Секунд между gc.freeze()
+GC_FULL_EVERY = 60          # Полная сборка после стольких заморозок
+
+
+class Match:
+    """Партия на сервере: два соединения и таймер хода; состояние - в SessionStore по id."""
+    __slots__ = ('id', 'writers', 'timer', 'deadline')
+
+    def __init__(self, match_id, writers):
+        self.id = match_id
+        self.writers = writers
+        self.timer = None
+        self.deadline = 0.0
+
+
+class GameServer:
+    """
+    Асинхронный сервер, на котором одновременно идут тысячи партий.
+
+    Каждая партия - конечный автомат engine.Game: ход клиента проверяется
+    Game.is_legal и применяется Game.step прямо в обработчике строки, без
+    потоков и блокировок. Таймер хода ленивый: ход только сдвигает deadline
+    партии, а сработавший раньше срока таймер asyncio переставляется на
+    новый срок - без отмены и создания таймера на каждом ходу.
+
+    Сборщик циклов Python обходит все долгоживущие объекты: с тысячами
+    партий полная сборка занимает сотни миллисекунд и дает хвост задержки.
+    Партии циклов почти не создают (объекты engine освобождаются подсчетом
+    ссылок), поэтому с freeze_gc=True сервер периодически замораживает
+    выжившие объекты (gc.freeze), а полную сборку делает раз в GC_FULL_EVERY
+    интервалов. Заморозка действует на весь процесс, поэтому она включается
+    явно - так делает main(), а не встроенный в чужую программу сервер.
+    Память ограничена: MAX_MATCHES партий, строки не длиннее LINE_LIMIT,
+    буфер записи клиента не больше WRITE_LIMIT. Состояния партий лежат в
+    sessions.SessionStore: давно не ходившие партии хранятся снимками.
+    """
+
+    def __init__(self, turn_timeout=TURN_TIMEOUT, max_matches=MAX_MATCHES, seed=None, sessions=None,
+                 freeze_gc=False):
+        self.cards = default_index()
+        self.sessions = SessionStore(MAX_LIVE_GAMES) if sessions is None else sessions
+        self.turn_timeout = turn_timeout
+        self.max_matches = max_matches
+        self.freeze_gc = freeze_gc
+        self.rng = random.Random(seed)
+        self.matches = {}
+        self.waiting = None
+        self.finished = 0
+        self.peak_matches = 0
+        self._ids = itertools.count()
+        self._seats = {}      # writer -> (Match, место)
+        self._server = None
+        self._maintenance = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._handle, host, port, limit=LINE_LIMIT)
+        if self.freeze_gc:
+            self._maintenance = asyncio.get_running_loop().create_task(self._collect_garbage())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def _collect_garbage(self):
+        for n in itertools.count(1):
+            await asyncio.sleep(GC_FREEZE_INTERVAL)
+            if n % GC_FULL_EVERY == 0:
+                gc.unfreeze()
+                gc.collect()
+            gc.freeze()
+
+    async def close(self):
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            self._maintenance = None
+            gc.unfreeze()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=WRITE_LIMIT)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._command(writer, line.decode("ascii", "replace").split())
+        except (ConnectionError, ValueError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self._disconnect(writer)
+            writer.close()
+
+    def _send(self, writer, line):
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > WRITE_LIMIT:
+            writer.close()
+            return
+        writer.write(line.encode("ascii") + b"\n")
+
+    def _command(self, writer, words):
+        if not words:
+            return
+        if words[0] == "Q":
+            self._queue(writer)
+            return
+        seat = self._seats.get(writer)
+        if seat is None:
+            self._send(writer, "X not in a match")
+            return
+        match, player = seat
+        game = self.sessions.get(match.id)
+        if game.to_move != player:
+            self._send(writer, "X not your turn")
+            return
+        action = self._parse(words, game)
+        if action is None or not game.is_legal(action):
+            self._send(writer, "X illegal move")
+            return
+        self._play(match, game, action)
+
+    def _parse(self, words, game):
+        kind = words[0]
+        if kind == "F":
+            return FINISH_ACTION
+        if kind == "T":
+            return TAKE_ACTION
+        if kind not in ("A", "D") or len(words) != 2:
+            return None
+        try:
+            positions = [int(word) for word in words[1].split(",")]
+        except ValueError:
+            return None
+        cards = self.cards.cards
+        if not all(0 <= i < len(cards) for i in positions):
+            return None
+        return Action(ATTACK_MOVE if kind == "A" else DEFEND, tuple(cards[i] for i in positions))
+
+    def _queue(self, writer):
+        if writer in self._seats or self.waiting is writer:
+            self._send(writer, "X already queued")
+            return
+        if self.waiting is None or self.waiting.is_closing():
+            self.waiting = writer
+            return
+        if len(self.matches) >= self.max_matches:
+            self._send(writer, "X server full")
+            return
+        writers = (self.waiting, writer)
+        self.waiting = None
+        match = Match(next(self._ids), writers)
+        game = Game.new_game(self.rng, self.cards.cards)
+        self.sessions.put(match.id, game)
+        self.matches[match.id] = match
+        self.peak_matches = max(self.peak_matches, len(self.matches))
+        for player, seat_writer in enumerate(writers):
+            self._seats[seat_writer] = (match, player)
+            self._send(seat_writer, f"M {match.id} {player}")
+        self._update(match, game)
+
+    def _play(self, match, game, action):
+        game.step(action, validate=False)
+        self._update(match, game)
+
+    def _timeout(self, match):
+        """Игрок не успел: за него ходит greedy_policy."""
+        loop = asyncio.get_running_loop()
+        if loop.time() < match.deadline:
+            match.timer = loop.call_at(match.deadline, self._timeout, match)
+            return
+        match.timer = None
+        game = self.sessions.get(match.id)
+        self._play(match, game, greedy_policy(game, self.rng))
+
+    def _update(self, match, game):
+        """Рассылает состояние и продлевает срок хода."""
+        if game.phase == OVER:
+            self._end(match, "-" if game.winner is None else str(game.winner))
+            return
+        for player, writer in enumerate(match.writers):
+            self._send(writer, self._state_line(game, player))
+        loop = asyncio.get_running_loop()
+        match.deadline = loop.time() + self.turn_timeout
+        if match.timer is None:
+            match.timer = loop.call_at(match.deadline, self._timeout, match)
+
+    def _state_line(self, game, player):
+        fm = game.faction_manager
+        hand = ",".join(map(str, iter_bits(game.hands[player]))) or "-"
+        bits = self.cards.bits
+        table = ",".join("." if card is None else str(bits[card].bit_length() - 1)
+                         for pair in game.table for card in pair)
+        return (f"S {PHASES[game.phase]} {game.attacker} {game.turns} {fm.active_mask:x} "
+                f"{len(game.draw_pile)} {game.hands[1 - player].bit_count()} {hand} {table}")
+
+    def _end(self, match, result):
+        if match.timer is not None:
+            match.timer.cancel()
+            match.timer = None
+        for writer in match.writers:
+            self._seats.pop(writer, None)
+            self._send(writer, f"E {result}")
+        del self.matches[match.id]
+        self.sessions.discard(match.id)
+        self.finished += 1
+
+    def _disconnect(self, writer):
+        """Ушедший игрок проигрывает партию."""
+        if self.waiting is writer:
+            self.waiting = None
+        seat = self._seats.get(writer)
+        if seat is not None:
+            match, player = seat
+            self._end(match, str(1 - player))
+
+
+class BotClient:
+    """
+    Клиент нагрузочного теста: встает в очередь и играет простыми ходами
+    (младшая подходящая карта, жадная защита), делая паузу think перед ходом.
+    Записывает задержку от хода до ответа сервера. Отключается после games
+    партий или в момент deadline (time.perf_counter).
+
+    На отклоненную атаку или защиту бот один раз пасует (F или T); отказ на
+    пас или ошибку не в ответ на свой ход он пропускает и ждет следующего S,
+    иначе пара X/пас крутилась бы без конца.
+    """
+
+    def __init__(self, host, port, games, think, latencies, rng, deadline=float("inf")):
+        self.host = host
+        self.port = port
+        self.games = games
+        self.think = think
+        self.latencies = latencies
+        self.rng = rng
+        self.deadline = deadline
+        self.cards = default_index()
+        self.sent_at = None
+        self.sent = None      # Ход, отправленный в свою очередь и еще без ответа
+        self.phase = None
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        seat = None
+        played = 0
+        writer.write(b"Q\n")
+        while played < self.games and time.perf_counter() < self.deadline:
+            line = await reader.readline()
+            if not line:
+                break
+            if self.sent_at is not None:
+                self.latencies.append(time.perf_counter() - self.sent_at)
+                self.sent_at = None
+            words = line.decode("ascii").split()
+            if words[0] == "M":
+                seat = int(words[2])
+            elif words[0] == "E":
+                played += 1
+                if played < self.games:
+                    writer.write(b"Q\n")
+            elif words[0] == "X":
+                # Отклонены атака или защита - пасуем
+                sent, self.sent = self.sent, None
+                if sent is not None and sent[0] in "AD":
+                    await self._move(writer, "F" if self.phase == "A" else "T")
+            elif words[0] == "S":
+                self.phase = words[1]
+                self.sent = None
+                attacker = int(words[2])
+                to_move = attacker if words[1] == "A" else 1 - attacker
+                if to_move == seat:
+                    await self._move(writer, self._choose(words))
+        writer.close()
+        return played
+
+    async def _move(self, writer, command):
+        if self.think:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think))
+        self.sent_at = time.perf_counter()
+        self.sent = command
+        writer.write(command.encode("ascii") + b"\n")
+
+    def _choose(self, words):
+        cards = self.cards.cards
+        active = int(words[4], 16)
+        hand = [] if words[7] == "-" else [cards[int(i)] for i in words[7].split(",")]
+        table = [None if word == "." else cards[int(word)] for word in words[8].split(",")]
+        if words[1] == "A":
+            if any(table[0::2]) and self.rng.random() < 0.5:
+                return "F"
+            playable = [card for card in hand if not active or card.faction_mask & active]
+            if not playable or all(table[0::2]):
+                return "F"
+            card = min(playable, key=lambda card: card.rank)
+            return f"A {self.cards.bits[card].bit_length() - 1}"
+        uncovered = [table[i] for i in range(0, len(table), 2) if table[i] and not table[i + 1]]
+        cover = find_cover(uncovered, hand)
+        if cover is None:
+            return "T"
+        return "D " + ",".join(str(self.cards.bits[card].bit_length() - 1) for card in cover)
+
+
+async def load_test(matches, games, think, host=None, port=None, seed=0, duration=None, freeze_gc=False):
+    """
+    Запускает 2 * matches ботов против сервера (если port не задан - локального,
+    freeze_gc передается ему).
+
+    Returns:
+        dict: сыграно партий, время, задержки (p50, p99, max), пик одновременных
+        партий (только для локального сервера), пик памяти процесса
+    """
+    import resource
+    server = None
+    if port is None:
+        server = GameServer(seed=seed, freeze_gc=freeze_gc)
+        port = await server.start()
+        host = "127.0.0.1"
+    rng = random.Random(seed)
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + duration if duration else float("inf")
+    bots = [BotClient(host, port, games, think, latencies, random.Random(rng.random()), deadline)
+            for _ in range(2 * matches)]
+    played = await asyncio.gather(*(bot.run() for bot in bots))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        await server.close()
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+    return {
+        "games": sum(played) // 2,
+        "seconds": elapsed,
+        "moves": len(latencies),
+        "peak_matches": server.peak_matches if server is not None else None,
+        "p50": percentile(0.5),
+        "p99": percentile(0.99),
+        "max": latencies[-1] if latencies else 0.0,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Multiplayer game server and load-test client.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=7777)
+    serve.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT)
+    serve.add_argument("--max-live", type=int, default=MAX_LIVE_GAMES, help="games kept as objects")
+    serve.add_argument("--spill-dir", default=None, help="directory for spilled session snapshots")
+    load = commands.add_parser("load", help="play bot matches against a server")
+    load.add_argument("--matches", type=int, default=1000, help="simultaneous matches")
+    load.add_argument("--games", type=int, default=1, help="games per bot")
+    load.add_argument("--think", type=float, default=0.05, help="mean seconds before each move")
+    load.add_argument("--duration", type=float, default=None, help="stop the bots after this many seconds")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=None, help="server port (default: in-process server)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        async def serve_forever():
+            sessions = SessionStore(args.max_live, directory=args.spill_dir)
+            server = GameServer(turn_timeout=args.turn_timeout, sessions=sessions, freeze_gc=True)
+            port = await server.start(args.host, args.port)
+            print(f"Serving on {args.host}:{port}")
+            await server.serve_forever()
+        asyncio.run(serve_forever())
+    else:
+        stats = asyncio.run(load_test(args.matches, args.games, args.think, args.host, args.port,
+                                     duration=args.duration, freeze_gc=True))
+        peak = "" if stats["peak_matches"] is None else f", peak {stats['peak_matches']} matches"
+        print(f"{stats['games']} games, {stats['moves']} moves in {stats['seconds']:.1f}s{peak}; "
+              f"latency p50 {stats['p50'] * 1000:.2f} ms, p99 {stats['p99'] * 1000:.2f} ms, "
+              f"max {stats['max'] * 1000:.2f} ms; peak RSS {stats['max_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
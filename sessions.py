@@ -0,0 +1,256 @@
+# sessions.py
+
+import os
+import struct
+from collections import OrderedDict
+
+from cardset import default_index, from_words, to_words
+from engine import ATTACK, DEFENSE, OVER, Game
+from faction_manager import FactionManager
+from state import reserve_table_slots
+
+SNAPSHOT_VERSION = 5
+PHASE_CODES = {ATTACK: 0, DEFENSE: 1, OVER: 2}
+PHASES = {code: phase for phase, code in PHASE_CODES.items()}
+# Заголовок снимка: версия, фаза, атакующий, победитель (-1 - нет), число замешиваний
+# сброса, число пар стола (u16), число слотов FactionManager (u16), ход, хэш, размер колоды (u32)
+HEADER = struct.Struct('<BBBbBHHIQI')
+NO_CARD = 0xFFFF
+
+
+class SnapshotCodec:
+    """
+    Компактный двоичный снимок engine.Game для набора карт index.
+
+    Руки, открытые карты рук (Game.known) и сброс - битборды по 64-битным словам, стол - номера карт
+    по слотам, колода - номера карт по порядку, FactionManager - маски
+    активных и неактивных фракций его слотов. Размер стола записывается
+    в заголовок, поэтому подходят партии с любым числом пар. Для базового
+    набора снимок партии со столом из 6 пар занимает около 200 байт.
+    """
+
+    def __init__(self, cards=None):
+        self.cards = cards or default_index()
+        self.position = {card: i for i, card in enumerate(self.cards.cards)}
+        self.card_format = 'B' if len(self.cards) < 0xFF else 'H'
+        self.empty = 0xFF if self.card_format == 'B' else NO_CARD
+        words = self.cards.words
+        self.masks = struct.Struct(f'<{5 * words}Q')
+        factions = max(mask.bit_length() for mask in self.cards.faction_masks)
+        self.faction_bytes = (factions + 7) // 8 or 1
+
+    def dump(self, game):
+        if game.cards is not self.cards:
+            raise ValueError("Game uses a different card index")
+        position = self.position
+        words = self.cards.words
+        empty = self.empty
+        winner = -1 if game.winner is None else game.winner
+        fm = game.faction_manager
+        parts = [
+            HEADER.pack(SNAPSHOT_VERSION, PHASE_CODES[game.phase], game.attacker, winner,
+                        game.recycles, len(game.table), fm.slot_count, game.turns, game.hash,
+                        len(game.draw_pile)),
+            self.masks.pack(*to_words(game.hands[0], words), *to_words(game.hands[1], words),
+                            *to_words(game.known[0], words), *to_words(game.known[1], words),
+                            *to_words(game.discard, words)),
+            struct.pack(f'<{2 * len(game.table)}{self.card_format}',
+                        *(empty if card is None else position[card]
+                          for pair in game.table for card in pair)),
+            struct.pack(f'<{len(game.draw_pile)}{self.card_format}',
+                        *(position[card] for card in game.draw_pile)),
+        ]
+        size = self.faction_bytes
+        parts.extend(mask.to_bytes(size, 'little') for mask in fm.slot_active)
+        parts.extend(mask.to_bytes(size, 'little') for mask in fm.slot_inactive)
+        return b''.join(parts)
+
+    def load(self, data):
+        version, phase, attacker, winner, recycles, pairs, slot_count, turns, key, draw_count = \
+            HEADER.unpack_from(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported session snapshot version {version}")
+        cards = self.cards.cards
+        words = self.cards.words
+        offset = HEADER.size
+        masks = self.masks.unpack_from(data, offset)
+        offset += self.masks.size
+        slots = struct.unpack_from(f'<{2 * pairs}{self.card_format}', data, offset)
+        offset += 2 * pairs * struct.calcsize(self.card_format)
+        draw_pile = struct.unpack_from(f'<{draw_count}{self.card_format}', data, offset)
+        offset += draw_count * struct.calcsize(self.card_format)
+        size = self.faction_bytes
+        factions = [int.from_bytes(data[offset + i * size:offset + (i + 1) * size], 'little')
+                    for i in range(2 * slot_count)]
+
+        game = Game.__new__(Game)
+        game.cards = self.cards
+        game.hands = [from_words(masks[:words]), from_words(masks[words:2 * words])]
+        game.known = [from_words(masks[2 * words:3 * words]), from_words(masks[3 * words:4 * words])]
+        game.discard = from_words(masks[4 * words:])
+        placed = [None if i == self.empty else cards[i] for i in slots]
+        game.table = list(zip(placed[0::2], placed[1::2]))
+        game.table_bits = self.cards.mask(card for card in placed if card is not None)
+        game.draw_pile = [cards[i] for i in draw_pile]
+        game.faction_manager = FactionManager.from_slots(factions[:slot_count], factions[slot_count:])
+        game.attacker = attacker
+        game.phase = PHASES[phase]
+        game.winner = None if winner < 0 else winner
+        game.turns = turns
+        game.recycles = recycles
+        game.hash = key
+        game.transpositions = None
+        # Хэш взят из снимка: ключи стола этого размера могли еще не понадобиться в процессе
+        reserve_table_slots(2 * pairs)
+        return game
+
+
+class SessionStore:
+    """
+    Хранилище живых партий (engine.Game) по ключу с вытеснением по LRU.
+
+    Три уровня: до max_live партий - объекты Game в памяти; вытесненные
+    хранятся как снимки SnapshotCodec, пока их общий размер не больше
+    max_bytes; самые давние снимки сверх этого уходят в файлы directory
+    (без directory остаются в памяти). get() прозрачно восстанавливает
+    партию с любого уровня и делает ее самой свежей.
+
+    Самая свежая партия всегда остается объектом в памяти, даже при
+    max_live=0: вызывающий код изменяет полученный Game, и снимок,
+    снятый до этих изменений, их бы потерял.
+    """
+
+    def __init__(self, max_live=1000, max_bytes=64 << 20, directory=None, cards=None):
+        self.max_live = max_live
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.codec = SnapshotCodec(cards)
+        self._live = OrderedDict()
+        self._snapshots = OrderedDict()
+        self._snapshot_bytes = 0
+        self._spilled = set()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._live) + len(self._snapshots) + len(self._spilled)
+
+    def __contains__(self, key):
+        return key in self._live or key in self._snapshots or key in self._spilled
+
+    @property
+    def stats(self):
+        return {"live": len(self._live), "snapshots": len(self._snapshots),
+                "snapshot_bytes": self._snapshot_bytes, "spilled": len(self._spilled)}
+
+    def put(self, key, game):
+        """Добавляет или заменяет партию; она становится самой свежей."""
+        self.discard(key)
+        self._make_room()
+        self._live[key] = game
+
+    def get(self, key):
+        """Партия по ключу (KeyError, если ее нет)."""
+        game = self._live.get(key)
+        if game is not None:
+            self._live.move_to_end(key)
+            return game
+        if key in self._snapshots:
+            data = self._snapshots.pop(key)
+            self._snapshot_bytes -= len(data)
+        elif key in self._spilled:
+            path = self._path(key)
+            with open(path, 'rb') as source:
+                data = source.read()
+            os.remove(path)
+            self._spilled.discard(key)
+        else:
+            raise KeyError(key)
+        game = self.codec.load(data)
+        self._make_room()
+        self._live[key] = game
+        return game
+
+    def pop(self, key):
+        game = self.get(key)
+        del self._live[key]
+        return game
+
+    def discard(self, key):
+        """Удаляет партию, если она есть."""
+        if self._live.pop(key, None) is not None:
+            return
+        data = self._snapshots.pop(key, None)
+        if data is not None:
+            self._snapshot_bytes -= len(data)
+        elif key in self._spilled:
+            os.remove(self._path(key))
+            self._spilled.discard(key)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.session")
+
+    def _make_room(self):
+        """Вытесняет партии до добавления новой, чтобы не вытеснить ее саму."""
+        while self._live and len(self._live) >= self.max_live:
+            key, game = self._live.popitem(last=False)
+            data = self.codec.dump(game)
+            self._snapshots[key] = data
+            self._snapshot_bytes += len(data)
+        if self.directory is None:
+            return
+        while self._snapshot_bytes > self.max_bytes:
+            key, data = self._snapshots.popitem(last=False)
+            self._snapshot_bytes -= len(data)
+            with open(self._path(key), 'wb') as target:
+                target.write(data)
+            self._spilled.add(key)
+
+
+def main():
+    import random
+    import sys
+    import tempfile
+    import time
+    from engine import greedy_policy, random_policy
+
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(max_live=n_sessions // 10, max_bytes=n_sessions * 40,
+                             directory=directory)
+        for key in range(n_sessions):
+            game = Game.new_game(rng)
+            for _ in range(rng.randrange(40)):
+                if game.phase == OVER:
+                    break
+                game.step((greedy_policy, random_policy)[game.to_move](game, rng))
+            store.put(key, game)
+        print(f"{n_sessions} sessions: {store.stats}")
+
+        codec = store.codec
+        game = store.get(0)
+        data = codec.dump(game)
+        repeats = 10000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            codec.dump(game)
+        dump_time = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            codec.load(data)
+        load_time = (time.perf_counter() - start) / repeats
+        print(f"snapshot {len(data)} bytes: dump {dump_time * 1e6:.1f} us, load {load_time * 1e6:.1f} us")
+
+        keys = [rng.randrange(n_sessions) for _ in range(repeats)]
+        start = time.perf_counter()
+        for key in keys:
+            game = store.get(key)
+            if game.phase != OVER:
+                game.step(greedy_policy(game, rng))
+        elapsed = (time.perf_counter() - start) / repeats
+        print(f"random access with a move: {elapsed * 1e6:.1f} us per action; {store.stats}")
+
+
+if __name__ == "__main__":
+    main()
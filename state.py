@@ -0,0 +1,264 @@
+# state.py
+
+import random
+
+from deck import RECYCLE_LIMIT
+from faction_manager import SLOT_COUNT
+
+# Места, где может лежать карта. Слот стола совпадает с индексом слота
+# FactionManager: атака пары j - слот j * 2, защита - j * 2 + 1. Карты
+# колоды хэшируются отдельно, по позициям (см. draw_key)
+HAND_LOCATIONS = (0, 1)
+DISCARD_PILE = 2
+TABLE_BASE = 3
+LOCATION_COUNT = TABLE_BASE + SLOT_COUNT   # Мест для стола по умолчанию; больше - reserve_table_slots
+DRAW_KEYS = 64   # Сколько позиций колоды получают ключи сразу; дальше список растет вдвое
+
+_card_keys = {}
+_draw_keys = {}
+_faction_keys = {}
+_location_count = LOCATION_COUNT
+
+
+def card_keys(card):
+    """
+    Ключи Zobrist карты для каждого места (кортеж: руки, сброс, слоты стола).
+
+    Ключи выводятся из имени карты, поэтому совпадают во всех процессах.
+    Слотов стола SLOT_COUNT или больше, если стол больше (reserve_table_slots).
+    """
+    keys = _card_keys.get(card)
+    if keys is None:
+        rng = random.Random(f"card:{card.name}")
+        keys = tuple(rng.getrandbits(64) for _ in range(_location_count))
+        _card_keys[card] = keys
+    return keys
+
+
+def reserve_table_slots(slot_count):
+    """
+    Расширяет ключи card_keys до slot_count слотов стола.
+
+    Ключи берутся из того же генератора, поэтому первые ключи не меняются
+    и посчитанные раньше хэши остаются верными. full_hash вызывает эту
+    функцию сам, так что любая позиция engine.Game получает ключи своего стола.
+    """
+    global _location_count
+    if TABLE_BASE + slot_count > _location_count:
+        _location_count = TABLE_BASE + slot_count
+        _card_keys.clear()
+
+
+def draw_key(card, position):
+    """
+    Ключ Zobrist карты на позиции position колоды (0 - низ колоды).
+
+    Позиции считаются снизу: добор с верха не сдвигает остальные карты,
+    и хэш меняется только на взятые карты. Колоды, отличающиеся только
+    порядком карт, получают разные хэши.
+    """
+    keys = _draw_keys.get(card)
+    if keys is None or position >= len(keys):
+        size = DRAW_KEYS
+        while size <= position:
+            size *= 2
+        rng = random.Random(f"draw:{card.name}")
+        keys = tuple(rng.getrandbits(64) for _ in range(size))
+        _draw_keys[card] = keys
+    return keys[position]
+
+
+def _faction_key(bit):
+    keys = _faction_keys.get(bit)
+    if keys is None:
+        rng = random.Random(f"faction:{bit.bit_length()}")
+        keys = (rng.getrandbits(64), rng.getrandbits(64))
+        _faction_keys[bit] = keys
+    return keys
+
+
+_meta_rng = random.Random("meta")
+PHASE_KEYS = {phase: _meta_rng.getrandbits(64) for phase in ("ATTACK", "DEFENSE", "OVER")}
+ATTACKER_KEY = _meta_rng.getrandbits(64)
+# Ключ числа замешиваний сброса (engine.Game.recycles): от него зависит, будет ли добор
+RECYCLE_KEYS = (0,) + tuple(_meta_rng.getrandbits(64) for _ in range(RECYCLE_LIMIT))
+
+
+def meta_hash(phase, attacker, active_union, inactive_union):
+    """
+    Часть хэша, не связанная с положением карт: фаза, атакующий и фракции на столе.
+
+    От FactionManager учитываются объединения активных и неактивных фракций -
+    именно они определяют, как изменятся активные фракции при следующих картах.
+    """
+    key = PHASE_KEYS[phase]
+    if attacker:
+        key ^= ATTACKER_KEY
+    while active_union:
+        bit = active_union & -active_union
+        active_union ^= bit
+        key ^= _faction_key(bit)[0]
+    while inactive_union:
+        bit = inactive_union & -inactive_union
+        inactive_union ^= bit
+        key ^= _faction_key(bit)[1]
+    return key
+
+
+def meta_delta(old, new):
+    """
+    XOR-разница meta_hash между двумя кортежами (phase, attacker, active_union, inactive_union).
+
+    Обходит только изменившиеся биты, поэтому дешевле двух вызовов meta_hash.
+    """
+    key = 0
+    if old[0] != new[0]:
+        key = PHASE_KEYS[old[0]] ^ PHASE_KEYS[new[0]]
+    if old[1] != new[1]:
+        key ^= ATTACKER_KEY
+    changed = old[2] ^ new[2]
+    while changed:
+        bit = changed & -changed
+        changed ^= bit
+        key ^= _faction_key(bit)[0]
+    changed = old[3] ^ new[3]
+    while changed:
+        bit = changed & -changed
+        changed ^= bit
+        key ^= _faction_key(bit)[1]
+    return key
+
+
+def full_hash(game):
+    """Хэш Zobrist состояния engine.Game, посчитанный с нуля."""
+    reserve_table_slots(2 * len(game.table))
+    key = 0
+    for location, hand in zip(HAND_LOCATIONS, game.hands):
+        for card in game.cards.cards_of(hand):
+            key ^= card_keys(card)[location]
+    for position, card in enumerate(game.draw_pile):
+        key ^= draw_key(card, position)
+    for card in game.cards.cards_of(game.discard):
+        key ^= card_keys(card)[DISCARD_PILE]
+    for j, (attack, defense) in enumerate(game.table):
+        if attack is not None:
+            key ^= card_keys(attack)[TABLE_BASE + j * 2]
+        if defense is not None:
+            key ^= card_keys(defense)[TABLE_BASE + j * 2 + 1]
+    key ^= RECYCLE_KEYS[game.recycles]
+    faction_manager = game.faction_manager
+    return key ^ meta_hash(game.phase, game.attacker,
+                           faction_manager.active_union, faction_manager.inactive_union)
+
+
+class GameSnapshot:
+    """
+    Неизменяемый снимок engine.Game, пригодный как ключ словаря.
+
+    Руки и сброс - битборды, стол и колода - кортежи, хэш - готовый ключ
+    Zobrist. Порядок карт в колоде входит и в хэш, и в равенство. Номер хода
+    (turns) хранится, но не сравнивается: предела ходов нет, и продолжение
+    партии от него не зависит. Так же и known (открытые карты рук): это
+    сведения игроков, а не позиция.
+    """
+    __slots__ = ('cards', 'hands', 'known', 'table', 'table_bits', 'draw_pile', 'discard',
+                 'faction_manager', 'attacker', 'phase', 'winner', 'turns', 'recycles', 'key')
+
+    def __init__(self, game):
+        set_ = object.__setattr__
+        set_(self, 'cards', game.cards)
+        set_(self, 'hands', tuple(game.hands))
+        set_(self, 'known', tuple(game.known))
+        set_(self, 'table', tuple(game.table))
+        set_(self, 'table_bits', game.table_bits)
+        set_(self, 'draw_pile', tuple(game.draw_pile))
+        set_(self, 'discard', game.discard)
+        set_(self, 'faction_manager', game.faction_manager.copy())
+        set_(self, 'attacker', game.attacker)
+        set_(self, 'phase', game.phase)
+        set_(self, 'winner', game.winner)
+        set_(self, 'turns', game.turns)
+        set_(self, 'recycles', game.recycles)
+        set_(self, 'key', game.hash)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GameSnapshot is immutable")
+
+    def __hash__(self):
+        return self.key
+
+    def __eq__(self, other):
+        if not isinstance(other, GameSnapshot):
+            return NotImplemented
+        return (self.key == other.key
+                and self.cards is other.cards
+                and self.attacker == other.attacker
+                and self.phase == other.phase
+                and self.recycles == other.recycles
+                and self.hands == other.hands
+                and self.discard == other.discard
+                and self.table == other.table
+                and self.draw_pile == other.draw_pile
+                and self.faction_manager.active_union == other.faction_manager.active_union
+                and self.faction_manager.inactive_union == other.faction_manager.inactive_union)
+
+
+class TranspositionTable:
+    """
+    Таблица транспозиций ограниченного размера: ключ Zobrist -> значение.
+
+    В каждой корзине две записи. Первая заменяется только записью с не
+    меньшей глубиной или записью нового поколения (см. new_generation),
+    вытесненная запись переходит во вторую, которая заменяется всегда.
+    """
+
+    def __init__(self, size=1 << 16):
+        buckets = 1
+        while buckets < size:
+            buckets <<= 1
+        self._index_mask = buckets - 1
+        self._deep = [None] * buckets     # (key, depth, generation, value)
+        self._recent = [None] * buckets
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Значение по ключу или default."""
+        index = key & self._index_mask
+        entry = self._deep[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[3]
+        entry = self._recent[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[3]
+        self.misses += 1
+        return default
+
+    def store(self, key, value, depth=0):
+        """Сохраняет значение; depth - насколько дорого его пересчитать."""
+        index = key & self._index_mask
+        entry = self._deep[index]
+        new_entry = (key, depth, self.generation, value)
+        if entry is None or entry[0] == key or depth >= entry[1] or entry[2] != self.generation:
+            self._deep[index] = new_entry
+            if entry is not None and entry[0] != key:
+                self._recent[index] = entry
+        else:
+            self._recent[index] = new_entry
+
+    def new_generation(self):
+        """Помечает все текущие записи как устаревшие для замены."""
+        self.generation += 1
+
+    def clear(self):
+        self._deep = [None] * len(self._deep)
+        self._recent = [None] * len(self._recent)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return (sum(1 for entry in self._deep if entry is not None)
+                + sum(1 for entry in self._recent if entry is not None))
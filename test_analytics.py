@@ -0,0 +1,90 @@
+# test_analytics.py
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from analytics import COVERED, DEFENDED, PLAYED, TAKEN, Records, analyze, faction_matrix, simulate
+from cardset import default_index
+
+
+class AnalyticsTest(unittest.TestCase):
+    """analyze на небольшом прогоне совпадает с подсчетом в лоб по записям."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.records = simulate(40, ("greedy", "random"), seed=3, workers=1)
+        cls.summary = analyze(cls.records)
+
+    def test_records(self):
+        records = self.records
+        self.assertEqual(len(records), 40)
+        self.assertTrue(np.isin(records.winner, (0, 1)).all())
+        self.assertTrue((records.opening.sum(axis=2) == 6).all())
+        # Каждая защита покрывает ровно одну карту атаки
+        counts = records.counts.astype(np.int64)
+        self.assertEqual(counts[:, :, DEFENDED].sum(), counts[:, :, COVERED].sum())
+        self.assertGreater(counts[:, :, PLAYED].sum(), 0)
+        self.assertGreater(counts[:, :, TAKEN].sum(), 0)
+
+    def test_same_seed_gives_the_same_records(self):
+        again = simulate(40, ("greedy", "random"), seed=3, workers=1)
+        for name in ("winner", "first", "turns", "opening", "counts"):
+            self.assertTrue(np.array_equal(getattr(again, name), getattr(self.records, name)))
+
+    def test_card_rates_match_a_direct_count(self):
+        records = self.records
+        size = len(default_index())
+        games = np.zeros(size)
+        wins = np.zeros(size)
+        played = np.zeros(size)
+        played_wins = np.zeros(size)
+        for g in range(len(records)):
+            for player in (0, 1):
+                won = records.winner[g] == player
+                for i in range(size):
+                    if records.opening[g, player, i]:
+                        games[i] += 1
+                        wins[i] += won
+                    if records.counts[g, player, PLAYED, i]:
+                        played[i] += 1
+                        played_wins[i] += won
+        cards = self.summary["cards"]
+        self.assertTrue(np.array_equal(cards["opening_games"], games))
+        self.assertTrue(np.array_equal(cards["played_games"], played))
+        seen = games > 0
+        self.assertTrue(np.allclose(cards["opening_win_rate"][seen], wins[seen] / games[seen]))
+        self.assertTrue(np.isnan(cards["opening_win_rate"][~seen]).all())
+        seen = played > 0
+        self.assertTrue(np.allclose(cards["played_win_rate"][seen], played_wins[seen] / played[seen]))
+        self.assertTrue(np.array_equal(cards["taken_total"], records.counts[:, :, TAKEN].sum(axis=(0, 1))))
+
+    def test_faction_and_opening_summaries(self):
+        records = self.records
+        membership, _ = faction_matrix()
+        factions = self.summary["factions"]
+        openings = self.summary["openings"]
+        holds = (records.opening.reshape(-1, membership.shape[0]).astype(int) @ membership.astype(int)) > 0
+        self.assertTrue(np.array_equal(factions["opening_games"], holds.sum(axis=0)))
+        self.assertTrue(np.array_equal(factions["played_total"],
+                                       self.summary["cards"]["played_total"] @ membership.astype(np.int64)))
+        self.assertEqual(openings["rank_bucket_games"].sum(), 2 * len(records))
+        self.assertEqual(openings["largest_group_games"].sum(), 2 * len(records))
+        first_wins = (records.winner == records.first).mean()
+        self.assertAlmostEqual(openings["first_attacker_win_rate"], first_wins)
+        self.assertAlmostEqual(openings["mean_turns"], records.turns.mean())
+
+    def test_save_and_load(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "records.npz")
+        self.records.save(path)
+        loaded = Records.load(path)
+        self.assertTrue(np.array_equal(loaded.counts, self.records.counts))
+        self.assertTrue(np.array_equal(loaded.winner, self.records.winner))
+
+
+if __name__ == "__main__":
+    unittest.main()
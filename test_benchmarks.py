@@ -0,0 +1,59 @@
+# test_benchmarks.py
+
+import unittest
+
+from benchmarks import MEMORY_SLACK, compare, measure
+
+
+def _result(relative, bytes_per_op):
+    return {"ops_per_sec": 1000.0 * relative, "relative": relative, "bytes_per_op": bytes_per_op}
+
+
+class CompareTest(unittest.TestCase):
+    BASELINE = {"game": _result(1.0, 1000.0)}
+
+    def test_speed_threshold(self):
+        self.assertEqual(compare({"game": _result(0.75, 1000.0)}, self.BASELINE, 0.3), [])
+        self.assertEqual(compare({"game": _result(3.0, 1000.0)}, self.BASELINE, 0.3), [])
+        regressions = compare({"game": _result(0.65, 1000.0)}, self.BASELINE, 0.3)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("-35.0% speed", regressions[0])
+        # Более строгий порог ловит меньшее замедление
+        self.assertEqual(len(compare({"game": _result(0.85, 1000.0)}, self.BASELINE, 0.1)), 1)
+
+    def test_memory_threshold_with_slack(self):
+        allowed = 1000.0 * 1.3 + MEMORY_SLACK
+        self.assertEqual(compare({"game": _result(1.0, allowed)}, self.BASELINE, 0.3), [])
+        regressions = compare({"game": _result(1.0, allowed + 1)}, self.BASELINE, 0.3)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("B/op", regressions[0])
+        # Малые абсолютные изменения не считаются регрессией даже при нулевой базе
+        baseline = {"tiny": _result(1.0, 0.0)}
+        self.assertEqual(compare({"tiny": _result(1.0, MEMORY_SLACK)}, baseline, 0.3), [])
+
+    def test_speed_and_memory_are_reported_separately(self):
+        regressions = compare({"game": _result(0.5, 5000.0)}, self.BASELINE, 0.3)
+        self.assertEqual(len(regressions), 2)
+
+    def test_benchmarks_without_baseline_are_skipped(self):
+        self.assertEqual(compare({"new": _result(0.01, 1e9)}, self.BASELINE, 0.3), [])
+
+
+class MeasureTest(unittest.TestCase):
+
+    def test_measure_reports_rates_and_memory(self):
+        data = list(range(100))
+
+        def batch():
+            sum(data)
+            return 2
+
+        result = measure(batch, min_time=0.01, repeats=2)
+        self.assertEqual(set(result), {"ops_per_sec", "relative", "bytes_per_op"})
+        self.assertGreater(result["ops_per_sec"], 0)
+        self.assertGreater(result["relative"], 0)
+        self.assertGreaterEqual(result["bytes_per_op"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
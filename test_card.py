@@ -0,0 +1,80 @@
+# test_card.py
+
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+
+from card import Card, lookup, register, registered_cards
+from deck import Deck, create_card, populate_deck
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_same_name_gives_the_same_object(self):
+        first = create_card("Registry Test Pirate", 42, (1, 3))
+        second = create_card("Registry Test Pirate", 42, (3, 1))
+        self.assertIs(first, second)
+        self.assertIs(lookup("Registry Test Pirate"), first)
+        self.assertIn(first, registered_cards())
+
+    def test_populated_decks_share_cards(self):
+        decks = [Deck(), Deck()]
+        for deck in decks:
+            populate_deck(deck)
+        for first, second in zip(decks[0].cards, decks[1].cards):
+            self.assertIs(first, second)
+            self.assertIs(lookup(first.name), first)
+
+    def test_registered_cards_are_frozen(self):
+        card = register(Card.from_mask("Registry Test Frozen", 10, 0b101))
+        with self.assertRaises(AttributeError):
+            card.rank = 11
+        with self.assertRaises(AttributeError):
+            card.add_faction(2)
+        self.assertEqual(card.faction_ids, frozenset({1, 3}))
+
+    def test_conflicting_card_is_rejected(self):
+        register(Card.from_mask("Registry Test Conflict", 10, 0b1))
+        with self.assertRaises(ValueError):
+            register(Card.from_mask("Registry Test Conflict", 11, 0b1))
+        with self.assertRaises(ValueError):
+            register(Card.from_mask("Registry Test Conflict", 10, 0b10))
+
+    def test_unregistered_cards_stay_mutable(self):
+        card = Card("Registry Test Draft", 5)
+        card.add_faction(2)
+        card.rank = 6
+        self.assertIsNone(lookup("Registry Test Draft"))
+        self.assertEqual((card.rank, card.faction_ids), (6, frozenset({2})))
+
+
+class PickleTest(unittest.TestCase):
+
+    def test_registered_card_unpickles_to_the_registry_card(self):
+        card = create_card("Pickle Test Captain", 70, (2,))
+        self.assertIs(pickle.loads(pickle.dumps(card)), card)
+
+    def test_unregistered_card_stays_unregistered(self):
+        card = Card.from_mask("Pickle Test Draft", 3, 0b11)
+        copy = pickle.loads(pickle.dumps(card))
+        self.assertIsNot(copy, card)
+        self.assertEqual((copy.name, copy.rank, copy.faction_mask), ("Pickle Test Draft", 3, 0b11))
+        self.assertIsNone(lookup("Pickle Test Draft"))
+        copy.rank = 4
+
+    def test_other_process_registers_the_card(self):
+        card = create_card("Pickle Test Traveller", 55, (4, 5))
+        script = ("import pickle, sys\n"
+                  "from card import lookup\n"
+                  "card = pickle.loads(sys.stdin.buffer.read())\n"
+                  "print(card is lookup(card.name), card.rank, sorted(card.faction_ids))\n")
+        output = subprocess.run([sys.executable, "-c", script], input=pickle.dumps(card),
+                                capture_output=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.decode().split(), ["True", "55", "[4,", "5]"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# test_cardset.py
+
+import random
+import unittest
+
+from card import Card
+from cardset import CardIndex, default_index, from_words, index_for, iter_bits, to_words
+from deck import card_catalog
+from engine import OVER, Game, random_policy
+
+
+class BitOperationsTest(unittest.TestCase):
+
+    def test_iter_bits(self):
+        self.assertEqual(list(iter_bits(0)), [])
+        self.assertEqual(list(iter_bits(0b101001)), [0, 3, 5])
+        self.assertEqual(list(iter_bits(1 << 130 | 1 << 64)), [64, 130])
+
+    def test_words_round_trip(self):
+        rng = random.Random(0)
+        for words in (1, 2, 3):
+            for _ in range(50):
+                mask = rng.getrandbits(64 * words)
+                packed = to_words(mask, words)
+                self.assertEqual(len(packed), words)
+                self.assertTrue(all(0 <= word < 1 << 64 for word in packed))
+                self.assertEqual(from_words(packed), mask)
+
+
+class CardIndexTest(unittest.TestCase):
+
+    def test_default_index_fits_one_word(self):
+        index = default_index()
+        self.assertEqual(len(index), len(card_catalog()))
+        self.assertEqual(index.words, 1)
+        self.assertIs(index_for(card_catalog()[:5]), index)
+
+    def test_large_set_uses_several_words(self):
+        cards = [Card.from_mask(f"Card {i}", i % 100, 1 << (i % 20)) for i in range(150)]
+        index = index_for(cards)
+        self.assertIsNot(index, default_index())
+        self.assertEqual(index.words, 3)
+        rng = random.Random(1)
+        for _ in range(50):
+            chosen = rng.sample(cards, rng.randrange(len(cards)))
+            mask = index.mask(chosen)
+            self.assertEqual(mask.bit_count(), len(chosen))
+            self.assertEqual(set(index.cards_of(mask)), set(chosen))
+            self.assertEqual(from_words(to_words(mask, index.words)), mask)
+
+    def test_duplicate_cards_are_rejected(self):
+        card = card_catalog()[0]
+        with self.assertRaises(ValueError):
+            CardIndex([card, card])
+
+
+class GameBitboardsTest(unittest.TestCase):
+    """Руки, стол, сброс и колода engine.Game делят набор карт без пересечений."""
+
+    def test_locations_partition_the_cards(self):
+        rng = random.Random(2)
+        for _ in range(20):
+            game = Game.new_game(rng)
+            while game.phase != OVER:
+                index = game.cards
+                draw = index.mask(game.draw_pile)
+                table = index.mask(card for pair in game.table for card in pair if card is not None)
+                locations = (game.hands[0], game.hands[1], game.table_bits, game.discard, draw)
+                self.assertEqual(table, game.table_bits)
+                self.assertEqual(sum(mask.bit_count() for mask in locations), len(index))
+                self.assertEqual(game.hands[0] | game.hands[1] | game.table_bits | game.discard | draw,
+                                 index.all)
+                for player in (0, 1):
+                    self.assertEqual(game.unseen(player), game.hands[1 - player] | draw)
+                    self.assertEqual(index.mask(game.hand(player)), game.hands[player])
+                game.step(random_policy(game, rng), validate=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# test_catalog.py
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import factions
+from catalog import Catalog, compile_catalog, export_builtin, load_source
+from deck import card_catalog
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open_catalog(self, path):
+        catalog = Catalog(path)
+        self.addCleanup(catalog.close)
+        return catalog
+
+    def test_builtin_set_round_trip(self):
+        export_builtin(self.path("cards.json"))
+        faction_names, cards = load_source(self.path("cards.json"))
+        compile_catalog(faction_names, cards, self.path("cards.bin"))
+        catalog = self.open_catalog(self.path("cards.bin"))
+        self.assertEqual(len(catalog), len(card_catalog()))
+        self.assertEqual(catalog.factions(), factions.FACTIONS)
+        self.assertEqual(catalog.mask_words, 1)
+        # Карты из реестра: те же объекты, что у встроенного набора
+        self.assertEqual(catalog.cards(), tuple(card_catalog()))
+
+    def test_multi_word_masks_and_lazy_factions(self):
+        faction_names = {70: "Catalog Test Crew", 130: "Catalog Test Navy"}
+        cards = [("Catalog Test Captain", 77, (70, 130)), ("Catalog Test Cadet", 12, (130,))]
+        compile_catalog(faction_names, cards, self.path("wide.bin"))
+        catalog = self.open_catalog(self.path("wide.bin"))
+        self.assertEqual(catalog.mask_words, 3)
+        captain, cadet = catalog.cards()
+        self.assertEqual(captain.faction_mask, (1 << 69) | (1 << 129))
+        self.assertEqual(captain.faction_ids, frozenset({70, 130}))
+        self.assertEqual(cadet.rank, 12)
+        # Фракции каталога добавлены первой же картой, без install_factions
+        self.assertIn("Catalog Test Navy", str(cadet))
+
+    def test_csv_source(self):
+        with open(self.path("factions.csv"), "w", encoding="utf-8") as output:
+            output.write("id,name\n3,Csv Test Yonko\n")
+        with open(self.path("cards.csv"), "w", encoding="utf-8") as output:
+            output.write("name,rank,factions\nCsv Test Card,40,3\nCsv Test Loner,10,\n")
+        faction_names, cards = load_source(self.path("cards.csv"), self.path("factions.csv"))
+        self.assertEqual(faction_names, {3: "Csv Test Yonko"})
+        self.assertEqual(cards, [("Csv Test Card", 40, (3,)), ("Csv Test Loner", 10, ())])
+
+    def test_validation_errors_are_collected(self):
+        cards = [("Broken A", 10, (99,)), ("Broken A", 11, ()), ("Broken B", "high", (1,))]
+        with self.assertRaises(ValueError) as context:
+            compile_catalog({0: "Zero", 1: "One"}, cards, self.path("broken.bin"))
+        message = str(context.exception)
+        self.assertIn("Faction ID must be positive: 0", message)
+        self.assertIn("unknown faction ID '99'", message)
+        self.assertIn("Duplicate card name: 'Broken A'", message)
+        self.assertIn("non-integer rank 'high'", message)
+        self.assertFalse(os.path.exists(self.path("broken.bin")))
+
+    def test_other_files_are_rejected(self):
+        with open(self.path("other.bin"), "wb") as output:
+            output.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            Catalog(self.path("other.bin"))
+
+    def test_pickle_passes_the_path(self):
+        compile_catalog({1: factions.FACTIONS[1]}, [("Pickle Test Card", 5, (1,))], self.path("small.bin"))
+        catalog = self.open_catalog(self.path("small.bin"))
+        data = pickle.dumps(catalog)
+        self.assertLess(len(data), 200)
+        copy = pickle.loads(data)
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.path, catalog.path)
+        self.assertIs(copy.card(0), catalog.card(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
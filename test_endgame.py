@@ -0,0 +1,127 @@
+# test_endgame.py
+
+import random
+import unittest
+
+from card import lookup
+from deck import RECYCLE_LIMIT, card_catalog
+from endgame import _KEY_MASK, EndgameSolver, is_endgame
+from engine import ATTACK_MOVE, OVER, Game, greedy_policy, random_policy
+
+
+def _endgame(attacker_hand, defender_hand):
+    """Эндшпиль без колоды: остальные карты каталога в сбросе, атакует игрок 0."""
+    card_catalog()
+    hands = ([lookup(name) for name in attacker_hand], [lookup(name) for name in defender_hand])
+    used = set(hands[0]) | set(hands[1])
+    discard = [card for card in card_catalog() if card not in used]
+    return Game(hands, (), discard, recycles=RECYCLE_LIMIT)
+
+
+def _wins(game, memo):
+    """Полный перебор по engine.Game: выигрывает ли игрок, который ходит."""
+    snapshot = game.snapshot()
+    if snapshot not in memo:
+        mover = game.to_move
+        won = False
+        for action in game.legal_actions():
+            child = game.copy()
+            child.step(action, validate=False)
+            if child.phase == OVER:
+                won = child.winner == mover
+            else:
+                won = _wins(child, memo) == (child.to_move == mover)
+            if won:
+                break
+        memo[snapshot] = won
+    return memo[snapshot]
+
+
+class EndgameSolverTest(unittest.TestCase):
+
+    def test_single_card_attacker_wins(self):
+        game = _endgame(["Usopp"], ["Gol D Roger", "Shanks"])
+        self.assertEqual(EndgameSolver(time_limit=None).solve(game).value, 1)
+
+    def test_defender_wins_when_attacks_share_no_faction(self):
+        # Любую атаку Роджер кроет, после этого вторую карту подкинуть нельзя
+        game = _endgame(["Akainu", "Benn Beckman"], ["Gol D Roger"])
+        solution = EndgameSolver(time_limit=None).solve(game)
+        self.assertEqual(solution.value, -1)
+        self.assertTrue(solution.exact)
+
+    def test_attacker_wins_by_attacking_with_the_whole_hand(self):
+        # У Марко и Эйса общая фракция: атака обеими картами опустошает руку
+        game = _endgame(["Marco the Phoenix", "Portgas D Ace"], ["Gol D Roger", "Prime Whitebeard"])
+        solver = EndgameSolver(time_limit=None)
+        self.assertEqual(solver.solve(game).value, 1)
+        whole_hand = [action for action in game.legal_actions() if len(action.cards) == 2]
+        self.assertEqual(len(whole_hand), 1)
+        self.assertEqual(whole_hand[0].kind, ATTACK_MOVE)
+        game.step(whole_hand[0])
+        self.assertEqual(solver.solve(game).value, -1)
+
+    def test_matches_exhaustive_search_on_small_endgames(self):
+        rng = random.Random(0)
+        solver = EndgameSolver(time_limit=None)
+        checked = 0
+        while checked < 60:
+            game = Game.new_game(rng)
+            while game.phase != OVER:
+                cards = sum(hand.bit_count() for hand in game.hands) + game.table_bits.bit_count()
+                if is_endgame(game) and cards <= 7:
+                    solution = solver.solve(game)
+                    expected = _wins(game, {})
+                    self.assertEqual(solution.value, 1 if expected else -1)
+                    if expected:
+                        # Лучший ход сохраняет выигрыш
+                        child = game.copy()
+                        child.step(solution.action)
+                        if child.phase == OVER:
+                            self.assertEqual(child.winner, game.to_move)
+                        else:
+                            self.assertEqual(_wins(child, {}), child.to_move == game.to_move)
+                    checked += 1
+                    break
+                game.step(random_policy(game, rng))
+
+    def test_entries_of_other_positions_are_ignored(self):
+        # Записи с тем же ключом, но другой позицией (коллизия хэша) не читаются
+        game = _endgame(["Marco the Phoenix", "Portgas D Ace"], ["Gol D Roger", "Prime Whitebeard"])
+        solver = EndgameSolver(time_limit=None)
+        self.assertEqual(solver.solve(game).value, 1)
+        for action in game.legal_actions():
+            child = game.copy()
+            child.step(action)
+            if child.phase == OVER:
+                continue
+            state = solver._state(child)
+            other = (not state[0],) + state[1:]
+            solver.table.store(hash(state) & _KEY_MASK, (other, True))
+        self.assertEqual(solver.solve(game).value, 1)
+
+    def test_time_limit_gives_unsolved_result(self):
+        rng = random.Random(1)
+        solver = EndgameSolver(time_limit=0.001)
+        while True:
+            game = Game.new_game(rng)
+            while game.phase != OVER and not is_endgame(game):
+                game.step(greedy_policy(game, rng))
+            if game.phase != OVER and sum(hand.bit_count() for hand in game.hands) >= 12:
+                break
+        solution = solver.solve(game)
+        self.assertLess(solution.seconds, 0.5)
+        if not solution.exact:
+            self.assertIsNone(solution.action)
+
+    def test_outside_endgame_uses_fallback(self):
+        game = Game.new_game(random.Random(2))
+        self.assertFalse(is_endgame(game))
+        with self.assertRaises(ValueError):
+            EndgameSolver().solve(game)
+        action = EndgameSolver(fallback=greedy_policy)(game)
+        self.assertEqual(action, greedy_policy(game))
+
+
+if __name__ == "__main__":
+    unittest.main()
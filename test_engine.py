@@ -0,0 +1,174 @@
+# test_engine.py
+
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from deck import RECYCLE_LIMIT, Deck, card_catalog, populate_deck
+from engine import DEFENSE, OVER, TAKE, Game, greedy_policy, random_policy
+from faction_manager import FactionManager
+from gamelog import GameLog, GameLogWriter
+from sessions import SnapshotCodec
+from state import full_hash
+from vecenv import OVER as VECTOR_OVER, VectorGame, random_actions
+
+
+class GameTerminationTest(unittest.TestCase):
+    """Сброс замешивается в колоду ограниченное число раз, поэтому партия заканчивается сама."""
+
+    def play(self, policies, rng):
+        game = Game.new_game(rng)
+        # Предела ходов в engine нет; самые длинные случайные партии - около
+        # 450 шагов, поэтому 3600 шагов означают, что партия зациклилась
+        for _ in range(3600):
+            if game.phase == OVER:
+                return game
+            game.step(policies[game.to_move](game, rng), validate=False)
+        self.fail("game did not end")
+
+    def test_random_play_ends_with_a_winner(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            game = self.play((random_policy, random_policy), rng)
+            self.assertIn(game.winner, (0, 1))
+            self.assertLessEqual(game.recycles, RECYCLE_LIMIT)
+
+    def test_greedy_against_random_ends_with_a_winner(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            self.assertIn(self.play((greedy_policy, random_policy), rng).winner, (0, 1))
+
+    def test_hash_tracks_recycles(self):
+        rng = random.Random(2)
+        for _ in range(20):
+            game = Game.new_game(rng)
+            while game.phase != OVER:
+                game.step(random_policy(game, rng), validate=False)
+                self.assertEqual(game.hash, full_hash(game))
+
+    def test_deck_recycles_up_to_the_limit(self):
+        deck = Deck()
+        populate_deck(deck)
+        cards = deck.cards
+        deck.cards = []
+        for _ in range(RECYCLE_LIMIT):
+            deck.discard_pile = cards[:2]
+            self.assertEqual(len(deck.draw_many(2)), 2)
+        deck.discard_pile = cards[:2]
+        self.assertEqual(deck.draw_many(2), [])
+        self.assertIsNone(deck.draw())
+        self.assertEqual(deck.recycles, RECYCLE_LIMIT)
+
+
+class KnownCardsTest(unittest.TestCase):
+
+    def test_taken_cards_are_known_until_played(self):
+        rng = random.Random(6)
+        taken = 0
+        for _ in range(30):
+            game = Game.new_game(rng)
+            while game.phase != OVER:
+                action = random_policy(game, rng)
+                defender, table = game.defender, game.table_bits
+                known = game.known[:]
+                game.step(action)
+                for player in (0, 1):
+                    self.assertEqual(game.known[player] & ~game.hands[player], 0)
+                if action.kind == TAKE:
+                    taken += 1
+                    self.assertEqual(game.known[defender], known[defender] | table)
+                else:
+                    # Без TAKE открытые карты только убывают
+                    for player in (0, 1):
+                        self.assertEqual(game.known[player] & ~known[player], 0)
+        self.assertGreater(taken, 0)
+
+    def test_copy_and_snapshot_keep_known_cards(self):
+        game = Game.new_game(random.Random(7))
+        game.known[1] = game.hands[1] & -game.hands[1]
+        self.assertEqual(game.copy().known, game.known)
+        self.assertIsNot(game.copy().known, game.known)
+        self.assertEqual(Game.from_snapshot(game.snapshot()).known, game.known)
+
+
+class WideTableTest(unittest.TestCase):
+    """Стол шире engine.TABLE_SIZE: хэш, снимки сессий, журнал и VectorGame."""
+
+    def wide_game(self, seed, pairs=8):
+        cards = list(card_catalog())
+        random.Random(seed).shuffle(cards)
+        attack = cards[12]
+        table = [(None, None)] * (pairs - 1) + [(attack, None)]
+        faction_manager = FactionManager(2 * pairs)
+        faction_manager.add_card_factions(attack, 2 * pairs - 2)
+        return Game.from_table(cards[:6], cards[6:12], table, faction_manager, DEFENSE, cards[13:])
+
+    def test_engine_plays_on_a_wide_table(self):
+        rng = random.Random(0)
+        for seed in range(20):
+            game = self.wide_game(seed)
+            while game.phase != OVER:
+                self.assertTrue(game.legal_actions())
+                game.step(random_policy(game, rng))
+                self.assertEqual(len(game.table), 8)
+                self.assertEqual(game.hash, full_hash(game))
+
+    def test_faction_manager_must_cover_the_table(self):
+        with self.assertRaises(ValueError):
+            Game.from_table([], [], [(None, None)] * 8, FactionManager(), DEFENSE)
+
+    def test_session_snapshot_keeps_the_table_size(self):
+        game = self.wide_game(1)
+        codec = SnapshotCodec(game.cards)
+        restored = codec.load(codec.dump(game))
+        self.assertEqual(restored.snapshot(), game.snapshot())
+        self.assertEqual(restored.faction_manager.slot_count, 16)
+
+    def test_session_snapshot_with_more_than_255_pairs(self):
+        game = self.wide_game(2, pairs=300)
+        codec = SnapshotCodec(game.cards)
+        restored = codec.load(codec.dump(game))
+        self.assertEqual(len(restored.table), 300)
+        self.assertEqual(restored.snapshot(), game.snapshot())
+
+    def test_game_log_restores_the_table_size(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "wide.log")
+        game = self.wide_game(3)
+        rng = random.Random(3)
+        with GameLogWriter(path, cards=game.cards) as writer:
+            # Журнал пишется с начала хода, а не посреди защиты
+            with self.assertRaises(ValueError):
+                writer.start(game)
+        while game.turns == 0:
+            game.step(random_policy(game, rng))
+        turns = {game.turns: game.snapshot()}
+        with GameLogWriter(path, cards=game.cards, checkpoint_interval=2) as writer:
+            writer.start(game)
+            while game.phase != OVER:
+                writer.step(game, random_policy(game, rng))
+                turns.setdefault(game.turns, game.snapshot())
+        log = GameLog(path)
+        self.addCleanup(log.close)
+        for turn, snapshot in turns.items():
+            if snapshot.phase != OVER:
+                restored = log.seek(0, turn)
+                self.assertEqual(len(restored.table), 8)
+                self.assertEqual(restored.faction_manager.slot_count, 16)
+                self.assertEqual(restored.snapshot(), snapshot)
+
+    def test_vector_game_with_a_wide_table(self):
+        game = VectorGame(32, seed=0, table_size=8)
+        self.assertEqual(game.table.shape, (32, 16))
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            game.step(random_actions(game, rng))
+        self.assertTrue((game.phase == VECTOR_OVER).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
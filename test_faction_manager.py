@@ -0,0 +1,169 @@
+# test_faction_manager.py
+
+import random
+import unittest
+
+from card import Card
+from deck import Deck, populate_deck
+from faction_manager import FactionManager
+from factions import FACTIONS, faction_mask
+
+
+class ReferenceFactionManager:
+    """Исходная реализация на множествах, с которой сравнивается FactionManager."""
+
+    def __init__(self, slot_count=12):
+        self.slot_count = slot_count
+        self.faction_slots = [{'active': set(), 'inactive': set()} for _ in range(slot_count)]
+        self.active_factions = set()
+
+    def add_card_factions(self, card, slot_index):
+        if 0 <= slot_index < self.slot_count:
+            current_active = self.active_factions
+            self.faction_slots[slot_index]['active'] = set(card.faction_ids)
+            if current_active:
+                for slot in self.faction_slots:
+                    if slot['active']:
+                        non_matching = slot['active'] - card.faction_ids
+                        slot['inactive'].update(non_matching)
+                        slot['active'] = slot['active'] & card.faction_ids
+            self.update_active_factions()
+
+    def remove_card_factions(self, slot_index):
+        if 0 <= slot_index < self.slot_count:
+            self.faction_slots[slot_index]['active'].clear()
+            self.faction_slots[slot_index]['inactive'].clear()
+            self.update_active_factions()
+
+    def update_active_factions(self):
+        active_sets = [slot['active'] for slot in self.faction_slots if slot['active']]
+        inactive_sets = [slot['inactive'] for slot in self.faction_slots if slot['inactive']]
+        if active_sets:
+            all_active = set.union(*active_sets)
+            if inactive_sets:
+                self.active_factions = all_active - set.union(*inactive_sets)
+            else:
+                self.active_factions = all_active
+        else:
+            self.active_factions = set()
+
+    def clear(self):
+        self.faction_slots = [{'active': set(), 'inactive': set()} for _ in range(self.slot_count)]
+        self.active_factions = set()
+
+    def validate_card_factions(self, card):
+        if not self.active_factions:
+            return True
+        return bool(card.faction_ids & self.active_factions)
+
+    def validate_multiple_cards(self, cards):
+        if not cards:
+            return False
+        if len(cards) == 1:
+            return self.validate_card_factions(cards[0])
+        common_factions = set.intersection(*(set(card.faction_ids) for card in cards))
+        if not self.active_factions:
+            return bool(common_factions)
+        return bool(common_factions & self.active_factions)
+
+
+def random_card(rng, max_factions=4):
+    card = Card("Random", rng.randint(1, 100))
+    for faction_id in rng.sample(sorted(FACTIONS), rng.randint(0, max_factions)):
+        card.add_faction(faction_id)
+    return card
+
+
+class FactionManagerEquivalenceTest(unittest.TestCase):
+
+    def setUp(self):
+        deck = Deck()
+        populate_deck(deck)
+        self.cards = deck.cards
+
+    def assertSameState(self, manager, reference, message=""):
+        self.assertEqual(manager.active_factions, reference.active_factions, message)
+        self.assertEqual(manager.get_active_factions(), reference.active_factions, message)
+        self.assertEqual(manager.faction_slots, reference.faction_slots, message)
+
+    def run_sequence(self, rng, cards, steps, remove_rate, overwrite, slot_count=12):
+        manager = FactionManager(slot_count)
+        reference = ReferenceFactionManager(slot_count)
+        occupied = set()
+        for step in range(steps):
+            roll = rng.random()
+            if roll < remove_rate and occupied:
+                slot_index = rng.choice(sorted(occupied))
+                occupied.discard(slot_index)
+                manager.remove_card_factions(slot_index)
+                reference.remove_card_factions(slot_index)
+            elif roll < remove_rate + 0.02:
+                manager.clear()
+                reference.clear()
+                occupied.clear()
+            else:
+                free = [i for i in range(slot_count) if i not in occupied]
+                if overwrite or not free:
+                    slot_index = rng.randrange(slot_count)
+                else:
+                    slot_index = rng.choice(free)
+                occupied.add(slot_index)
+                card = rng.choice(cards)
+                manager.add_card_factions(card, slot_index)
+                reference.add_card_factions(card, slot_index)
+            self.assertSameState(manager, reference, f"step {step}")
+
+            probe = rng.sample(cards, rng.randint(1, 3))
+            self.assertEqual(manager.validate_card_factions(probe[0]),
+                             reference.validate_card_factions(probe[0]))
+            self.assertEqual(manager.validate_multiple_cards(probe),
+                             reference.validate_multiple_cards(probe))
+
+    def test_deck_cards_fresh_slots(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            self.run_sequence(rng, self.cards, 30, remove_rate=0.1, overwrite=False)
+
+    def test_deck_cards_with_overwrites(self):
+        rng = random.Random(2)
+        for _ in range(200):
+            self.run_sequence(rng, self.cards, 40, remove_rate=0.2, overwrite=True)
+
+    def test_random_cards_with_overwrites(self):
+        rng = random.Random(3)
+        cards = [random_card(rng) for _ in range(40)]
+        for _ in range(200):
+            self.run_sequence(rng, cards, 40, remove_rate=0.2, overwrite=True)
+
+    def test_long_sequence_compacts_history(self):
+        rng = random.Random(4)
+        cards = [random_card(rng, max_factions=12) for _ in range(40)]
+        self.run_sequence(rng, cards, 2000, remove_rate=0.3, overwrite=True)
+
+    def test_large_table_and_faction_universe(self):
+        rng = random.Random(5)
+        cards = []
+        for i in range(60):
+            ids = rng.sample(range(1, 301), rng.randint(1, 40))
+            cards.append(Card.from_mask(f"Card {i}", rng.randint(1, 100), faction_mask(ids)))
+        for _ in range(20):
+            self.run_sequence(rng, cards, 150, remove_rate=0.2, overwrite=True, slot_count=48)
+
+    def test_out_of_range_slot_is_ignored(self):
+        manager = FactionManager()
+        manager.add_card_factions(self.cards[0], 12)
+        manager.add_card_factions(self.cards[0], -1)
+        manager.remove_card_factions(12)
+        self.assertEqual(manager.active_factions, set())
+
+    def test_copy_is_independent(self):
+        manager = FactionManager()
+        manager.add_card_factions(self.cards[0], 0)
+        other = manager.copy()
+        other.add_card_factions(self.cards[1], 1)
+        self.assertEqual(manager.active_factions, set(self.cards[0].faction_ids))
+        self.assertNotEqual(other.active_factions, manager.active_factions)
+
+
+if __name__ == "__main__":
+    unittest.main()
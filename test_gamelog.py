@@ -0,0 +1,86 @@
+# test_gamelog.py
+
+import os
+import random
+import tempfile
+import unittest
+
+from cardset import CardIndex
+from deck import card_catalog
+from engine import OVER, Game, greedy_policy, random_policy
+from gamelog import GameLog, GameLogWriter
+
+
+def _record(writer, n_games, seed):
+    """Пишет партии в журнал; возвращает для каждой {ход: снимок в начале хода} и снимок конца."""
+    rng = random.Random(seed)
+    policies = (greedy_policy, random_policy)
+    games = []
+    for _ in range(n_games):
+        game = Game.new_game(rng)
+        turns = {0: game.snapshot()}
+        writer.start(game)
+        while game.phase != OVER:
+            writer.step(game, policies[game.to_move](game, rng))
+            turns.setdefault(game.turns, game.snapshot())
+        games.append((turns, game.snapshot()))
+    return games
+
+
+class GameLogTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "games.log")
+
+    def open_log(self):
+        log = GameLog(self.path)
+        self.addCleanup(log.close)
+        return log
+
+    def test_seek_restores_every_turn(self):
+        with GameLogWriter(self.path, checkpoint_interval=4, buffer_size=256) as writer:
+            games = _record(writer, 10, 0)
+        log = self.open_log()
+        self.assertEqual(len(log), len(games))
+        for number, (turns, final) in enumerate(games):
+            for turn, snapshot in turns.items():
+                if snapshot.phase != OVER:
+                    restored = log.seek(number, turn)
+                    self.assertEqual(restored.snapshot(), snapshot)
+                    self.assertEqual(tuple(restored.known), snapshot.known)
+            self.assertEqual(log.seek(number).snapshot(), final)
+
+    def test_events_describe_the_game(self):
+        with GameLogWriter(self.path) as writer:
+            games = _record(writer, 3, 1)
+        log = self.open_log()
+        for number, (turns, final) in enumerate(games):
+            events = log.events(number)
+            self.assertEqual([event.kind for event in events[:3]], ["deal", "deal", "checkpoint"])
+            self.assertEqual(events[-1].kind, "win")
+            self.assertEqual(events[-1].player, final.winner)
+            start = turns[0]
+            for player in (0, 1):
+                self.assertEqual(set(events[player].cards), set(start.cards.cards_of(start.hands[player])))
+
+    def test_appending_keeps_earlier_games(self):
+        with GameLogWriter(self.path) as writer:
+            first = _record(writer, 2, 2)
+        with GameLogWriter(self.path) as writer:
+            second = _record(writer, 2, 3)
+        log = self.open_log()
+        self.assertEqual(len(log), 4)
+        for number, (_, final) in enumerate(first + second):
+            self.assertEqual(log.seek(number).snapshot(), final)
+
+    def test_other_card_set_is_rejected(self):
+        with GameLogWriter(self.path) as writer:
+            _record(writer, 1, 4)
+        with self.assertRaises(ValueError):
+            GameLogWriter(self.path, cards=CardIndex(card_catalog()[:20]))
+
+
+if __name__ == "__main__":
+    unittest.main()
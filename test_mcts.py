@@ -0,0 +1,112 @@
+# test_mcts.py
+
+import random
+import unittest
+
+from engine import OVER, TAKE, Game, random_policy
+from mcts import MCTSPlayer, action_key, determinize, search
+from state import full_hash
+
+
+def _position(seed, steps=20):
+    rng = random.Random(seed)
+    game = Game.new_game(rng)
+    for _ in range(steps):
+        if game.phase == OVER:
+            break
+        game.step(random_policy(game, rng))
+    return game
+
+
+class DeterminizeTest(unittest.TestCase):
+
+    def test_hidden_cards_are_redistributed(self):
+        rng = random.Random(0)
+        for seed in range(20):
+            game = _position(seed)
+            player = game.to_move
+            opponent = 1 - player
+            hidden = game.hands[opponent] | game.cards.mask(game.draw_pile)
+            state = determinize(game, player, rng)
+            self.assertEqual(state.hands[player], game.hands[player])
+            self.assertEqual(state.table, game.table)
+            self.assertEqual(state.discard, game.discard)
+            self.assertEqual(state.hands[opponent].bit_count(), game.hands[opponent].bit_count())
+            self.assertEqual(len(state.draw_pile), len(game.draw_pile))
+            self.assertEqual(state.hands[opponent] | state.cards.mask(state.draw_pile), hidden)
+            self.assertEqual(state.hash, full_hash(state))
+
+    def test_cards_taken_by_the_opponent_stay_in_their_hand(self):
+        rng = random.Random(1)
+        checked = 0
+        for seed in range(40):
+            game = Game.new_game(random.Random(seed))
+            while game.phase != OVER:
+                action = random_policy(game, rng)
+                game.step(action)
+                if action.kind == TAKE and game.phase != OVER:
+                    break
+            if game.phase == OVER:
+                continue
+            # Забирал защищавшийся; определяем раскладку за его соперника
+            opponent = game.defender
+            known = game.known[opponent]
+            self.assertNotEqual(known, 0)
+            unknown = game.hands[opponent] & ~known
+            redistributed = False
+            for _ in range(10):
+                state = determinize(game, 1 - opponent, rng)
+                self.assertEqual(state.hands[opponent] & known, known)
+                self.assertEqual(state.hands[opponent].bit_count(), game.hands[opponent].bit_count())
+                redistributed |= state.hands[opponent] & unknown != unknown
+            if unknown and game.draw_pile:
+                self.assertTrue(redistributed)
+            checked += 1
+        self.assertGreater(checked, 0)
+
+
+class SearchTest(unittest.TestCase):
+
+    def test_rollout_budget_and_visits(self):
+        for seed in range(5):
+            game = _position(seed)
+            if game.phase == OVER:
+                continue
+            visits, rollouts = search(game, game.to_move, max_rollouts=60, seed=seed, determinizations=4)
+            self.assertEqual(rollouts, 60)
+            self.assertEqual(sum(visits.values()), 60)
+            # Раскладки скрытых карт не меняют ходы того, кто ходит: рука и стол известны
+            self.assertLessEqual(set(visits), {action_key(action) for action in game.legal_actions()})
+
+    def test_same_seed_same_search(self):
+        game = _position(7)
+        first = search(game, game.to_move, max_rollouts=40, seed=3, determinizations=4)
+        second = search(game, game.to_move, max_rollouts=40, seed=3, determinizations=4)
+        self.assertEqual(first, second)
+
+
+class MCTSPlayerTest(unittest.TestCase):
+
+    def test_budget_is_required(self):
+        with self.assertRaises(ValueError):
+            MCTSPlayer(time_budget=None, max_rollouts=None)
+
+    def test_chooses_legal_actions(self):
+        player = MCTSPlayer(time_budget=None, max_rollouts=20, workers=1, seed=0)
+        rng = random.Random(1)
+        game = Game.new_game(rng)
+        self.addCleanup(player.close)
+        for _ in range(30):
+            if game.phase == OVER:
+                break
+            if game.to_move == 0:
+                action = player(game)
+                self.assertTrue(game.is_legal(action))
+                self.assertLessEqual(player.last_rollouts, 20)
+            else:
+                action = random_policy(game, rng)
+            game.step(action)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+# test_metrics.py
+
+import importlib
+import random
+import unittest
+
+import metrics
+from engine import OVER, Game, random_policy
+from metrics import BUCKETS, Histogram, _bucket, _bucket_limit
+
+
+class EnableTest(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def originals(self):
+        """Текущие функции всех методов из INSTRUMENTED."""
+        functions = {}
+        for module_name, class_name, methods in metrics.INSTRUMENTED:
+            cls = getattr(importlib.import_module(module_name), class_name)
+            for method in methods:
+                functions[cls, method] = cls.__dict__[method]
+        return functions
+
+    def test_disable_restores_the_original_methods(self):
+        before = self.originals()
+        metrics.enable()
+        metrics.enable()   # Повторное включение не оборачивает методы второй раз
+        during = self.originals()
+        for key, function in before.items():
+            self.assertIsNot(during[key], function)
+            self.assertIs(during[key].__wrapped__, function)
+        metrics.disable()
+        self.assertEqual(self.originals(), before)
+        metrics.disable()
+        self.assertEqual(self.originals(), before)
+
+    def test_enabled_layer_times_engine_calls(self):
+        rng = random.Random(0)
+        game = Game.new_game(rng)
+        metrics.enable()
+        steps = 0
+        while game.phase != OVER:
+            game.step(random_policy(game, rng))
+            steps += 1
+        metrics.disable()
+        timings = metrics.summary()["timings"]
+        self.assertEqual(timings["step"]["count"], steps)
+        self.assertGreater(timings["add_card_factions"]["count"], 0)
+        # После выключения данные сохраняются, но не растут
+        game = Game.new_game(rng)
+        game.step(random_policy(game, rng))
+        metrics.count("ignored")
+        self.assertEqual(metrics.summary()["timings"]["step"]["count"], steps)
+        self.assertNotIn("ignored", metrics.summary()["counters"])
+
+    def test_phases_and_folded_stacks(self):
+        metrics.enable()
+        metrics.begin("frame")
+        metrics.phase("events")
+        metrics.phase("draw")
+        metrics.begin("blit")
+        metrics.end()
+        metrics.end()
+        metrics.count("frames")
+        self.assertEqual(set(metrics.summary()["timings"]), {"frame", "frame.events", "frame.draw", "blit"})
+        self.assertEqual(set(metrics._folded), {"frame", "frame;events", "frame;draw", "frame;draw;blit"})
+        self.assertEqual(metrics.summary()["counters"], {"frames": 1})
+        self.assertEqual(metrics._stack, [])
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_buckets_cover_values_in_order(self):
+        values = list(range(4096)) + [int(1.37 ** k) for k in range(20, 130)]
+        previous = 0
+        for value in sorted(values):
+            k = _bucket(value)
+            self.assertLess(k, BUCKETS)
+            self.assertGreaterEqual(k, previous)
+            previous = k
+            self.assertLessEqual(value, _bucket_limit(k))
+            if k:
+                self.assertGreater(value, _bucket_limit(k - 1))
+            # Четыре корзины на степень двойки: граница не больше чем на 25% выше значения
+            if value >= 4:
+                self.assertLess(_bucket_limit(k), 1.25 * value)
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.percentile(0.5), 0)
+        for value in range(1, 1001):
+            histogram.add(value)
+        self.assertEqual((histogram.count, histogram.min, histogram.max), (1000, 1, 1000))
+        self.assertTrue(500 <= histogram.percentile(0.5) < 625)
+        self.assertTrue(990 <= histogram.percentile(0.99) <= 1000)
+        self.assertEqual(histogram.percentile(1.0), 1000)
+        summary = histogram.summary()
+        self.assertAlmostEqual(summary["mean_us"], 0.5005)
+        self.assertEqual(summary["max_us"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
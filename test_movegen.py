@@ -0,0 +1,90 @@
+# test_movegen.py
+
+import random
+import unittest
+from itertools import combinations, permutations
+
+from cardset import index_for
+from deck import card_catalog
+from faction_manager import FactionManager
+from movegen import attack_masks, can_defend, cover_positions, find_cover, legal_attacks
+
+
+def _positions(seed, count=200):
+    """Случайные руки и менеджеры фракций с 0-2 картами на столе."""
+    rng = random.Random(seed)
+    cards = list(card_catalog())
+    for _ in range(count):
+        sample = rng.sample(cards, rng.randrange(1, 9) + 2)
+        hand, table = sample[:-2], sample[-2:][:rng.randrange(3)]
+        manager = FactionManager()
+        for slot, card in enumerate(table):
+            manager.add_card_factions(card, slot * 2)
+        yield rng, hand, manager
+
+
+class LegalAttacksTest(unittest.TestCase):
+    """Генератор атак совпадает с перебором через validate_multiple_cards."""
+
+    def test_matches_validate_multiple_cards(self):
+        for rng, hand, manager in _positions(0):
+            free = rng.randrange(1, 7)
+            expected = {combo for size in range(1, min(free, len(hand)) + 1)
+                        for combo in combinations(hand, size)
+                        if manager.validate_multiple_cards(list(combo))}
+            attacks = legal_attacks(hand, manager.active_mask, free)
+            self.assertEqual(len(attacks), len(set(attacks)))
+            self.assertEqual(set(attacks), expected)
+
+    def test_bitboard_attacks_match_card_attacks(self):
+        index = index_for(card_catalog())
+        for rng, hand, manager in _positions(1):
+            free = rng.randrange(1, 7)
+            expected = [index.mask(attack) for attack in legal_attacks(hand, manager.active_mask, free)]
+            masks = attack_masks(index.mask(hand), manager.active_mask, free, index)
+            self.assertEqual(sorted(masks), sorted(expected))
+
+
+class CoverTest(unittest.TestCase):
+    """Защита находится, если существует хоть одно покрытие, в любом порядке атак."""
+
+    def test_matches_exhaustive_search(self):
+        rng = random.Random(2)
+        cards = list(card_catalog())
+        for _ in range(300):
+            sample = rng.sample(cards, rng.randrange(2, 9))
+            split = rng.randrange(1, min(4, len(sample)) + 1)
+            attacks, hand = sample[:split], sample[split:]
+            exists = any(all(defense.rank > attack.rank for attack, defense in zip(attacks, order))
+                         for order in permutations(hand, len(attacks)))
+            cover = find_cover(attacks, hand)
+            self.assertEqual(cover is not None, exists)
+            self.assertEqual(can_defend(attacks, hand), exists)
+            if cover is not None:
+                self.assertEqual(len(set(cover)), len(attacks))
+                self.assertTrue(set(cover) <= set(hand))
+                self.assertTrue(all(defense.rank > attack.rank for attack, defense in zip(attacks, cover)))
+            shuffled = attacks[:]
+            rng.shuffle(shuffled)
+            self.assertEqual(find_cover(shuffled, hand) is not None, exists)
+
+    def test_bitboard_cover_matches_card_cover(self):
+        rng = random.Random(3)
+        index = index_for(card_catalog())
+        cards = list(index.cards)
+        for _ in range(300):
+            sample = rng.sample(cards, 8)
+            attacks, hand = sample[:3], sample[3:]
+            cover = find_cover(attacks, hand)
+            positions = cover_positions(tuple(card.rank for card in attacks), index.mask(hand), index)
+            if cover is None:
+                self.assertIsNone(positions)
+            else:
+                # При равных рангах карты могут быть другими, ранги - те же
+                defenses = [index.cards[i] for i in positions]
+                self.assertEqual([card.rank for card in defenses], [card.rank for card in cover])
+                self.assertTrue(set(defenses) <= set(hand))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# test_rlenv.py
+
+import random
+import unittest
+
+import numpy as np
+
+from engine import ATTACK, ATTACK_MOVE, OVER, Action, random_policy
+from rlenv import CardGameEnv
+
+
+def _attack_positions(env, count, seed):
+    """Позиции, где агент атакует: env после reset и случайных ходов."""
+    rng = np.random.default_rng(seed)
+    env.reset(seed=seed)
+    positions = []
+    while len(positions) < count:
+        if env.game.phase == ATTACK:
+            positions.append(env.game.copy())
+        legal = np.flatnonzero(env.legal_action_mask())
+        _, _, terminated, _, _ = env.step(rng.choice(legal))
+        if terminated:
+            env.reset()
+    return positions
+
+
+class MultiCardAttackTest(unittest.TestCase):
+    """Атака несколькими картами - последовательный выбор карт и PASS."""
+
+    def setUp(self):
+        self.env = CardGameEnv(seed=0)
+
+    def load(self, game):
+        env = self.env
+        env.game = game.copy()
+        env._selected = env._selected_common = 0
+        env._observe()
+
+    def test_every_engine_attack_is_expressible(self):
+        env = self.env
+        multi = 0
+        for game in _attack_positions(env, 60, 1):
+            for action in game.legal_actions():
+                if action.kind != ATTACK_MOVE:
+                    continue
+                multi += len(action.cards) > 1
+                self.load(game)
+                for card in action.cards:
+                    i = env.cards.cards.index(card)
+                    self.assertTrue(env.legal_action_mask()[i])
+                    _, reward, terminated, _, _ = env.step(i)
+                    self.assertEqual((reward, terminated), (0.0, False))
+                    self.assertTrue(env.views["selected"][i])
+                    self.assertFalse(env.views["hand"][i])
+                # Ход соперника после PASS зависит от rng, поэтому сравнивается только атака
+                self.assertEqual(env._to_action(env.PASS), Action(ATTACK_MOVE, action.cards))
+        self.assertGreater(multi, 0)
+
+    def test_picks_stay_within_legal_attacks(self):
+        env = self.env
+        rng = random.Random(2)
+        for game in _attack_positions(env, 60, 3):
+            self.load(game)
+            picked = []
+            while True:
+                cards = [i for i in np.flatnonzero(env.legal_action_mask()) if i != env.PASS]
+                if not cards:
+                    break
+                i = rng.choice(cards)
+                picked.append(env.cards.cards[i])
+                env.step(i)
+                self.assertTrue(game.is_legal(Action(ATTACK_MOVE, tuple(picked))))
+
+    def test_episodes_end_with_a_reward(self):
+        env = CardGameEnv(opponent=random_policy, seed=4)
+        rng = np.random.default_rng(4)
+        for _ in range(20):
+            env.reset()
+            while True:
+                legal = np.flatnonzero(env.legal_action_mask())
+                _, reward, terminated, truncated, _ = env.step(rng.choice(legal))
+                self.assertFalse(truncated)
+                if terminated:
+                    self.assertIn(reward, (1.0, -1.0))
+                    self.assertEqual(env.game.phase, OVER)
+                    break
+
+
+if __name__ == "__main__":
+    unittest.main()
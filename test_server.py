@@ -0,0 +1,166 @@
+# test_server.py
+
+import asyncio
+import random
+import unittest
+
+from server import BotClient, GameServer, load_test
+
+
+class ServerProtocolTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = GameServer(turn_timeout=60.0, seed=0)
+        self.port = await self.server.start()
+        self.connections = []
+
+    async def asyncTearDown(self):
+        for _, writer in self.connections:
+            writer.close()
+        await self.server.close()
+
+    async def connect(self):
+        connection = await asyncio.open_connection("127.0.0.1", self.port)
+        self.connections.append(connection)
+        return connection
+
+    async def read(self, reader):
+        line = await asyncio.wait_for(reader.readline(), 5)
+        return line.decode("ascii").split()
+
+    async def send(self, writer, line):
+        writer.write(line.encode("ascii") + b"\n")
+        await writer.drain()
+
+    async def start_match(self):
+        """Два клиента в матче; возвращает их по местам и первое состояние каждого."""
+        clients = [await self.connect(), await self.connect()]
+        await self.send(clients[0][1], "Q")
+        await asyncio.sleep(0.05)
+        await self.send(clients[1][1], "Q")
+        seats = {}
+        states = {}
+        for reader, writer in clients:
+            match_line = await self.read(reader)
+            self.assertEqual(match_line[0], "M")
+            seat = int(match_line[2])
+            seats[seat] = (reader, writer)
+            states[seat] = await self.read(reader)
+            self.assertEqual(states[seat][0], "S")
+        self.assertEqual(sorted(seats), [0, 1])
+        return seats, states
+
+    @staticmethod
+    def to_move(state):
+        attacker = int(state[2])
+        return attacker if state[1] == "A" else 1 - attacker
+
+    async def test_match_start_and_state_line(self):
+        seats, states = await self.start_match()
+        for seat, state in states.items():
+            self.assertEqual(state[1], "A")
+            self.assertEqual(len(state[7].split(",")), 6)
+            self.assertEqual(len(state[8].split(",")), 12)
+            self.assertEqual(int(state[6]), 6)
+        self.assertEqual(states[0][2:7], states[1][2:7])
+        self.assertTrue(set(states[0][7].split(",")).isdisjoint(states[1][7].split(",")))
+
+    async def test_errors_leave_the_state_unchanged(self):
+        reader, writer = await self.connect()
+        await self.send(writer, "F")
+        self.assertEqual(await self.read(reader), ["X", "not", "in", "a", "match"])
+
+        seats, states = await self.start_match()
+        mover = self.to_move(states[0])
+        reader, writer = seats[1 - mover]
+        await self.send(writer, "F")
+        self.assertEqual(await self.read(reader), ["X", "not", "your", "turn"])
+        reader, writer = seats[mover]
+        for command in ("F", "T", "A x", "A 999", "D 1,2"):
+            await self.send(writer, command)
+            self.assertEqual(await self.read(reader), ["X", "illegal", "move"])
+
+    async def test_legal_attack_updates_both_players(self):
+        seats, states = await self.start_match()
+        mover = self.to_move(states[0])
+        card = states[mover][7].split(",")[0]
+        reader, writer = seats[mover]
+        await self.send(writer, f"A {card}")
+        for seat in (0, 1):
+            state = await self.read(seats[seat][0])
+            self.assertEqual(state[1], "D")
+            self.assertIn(card, state[8].split(","))
+        self.assertNotIn(card, state[7].split(","))
+
+    async def test_disconnect_loses_the_match(self):
+        seats, states = await self.start_match()
+        seats[0][1].close()
+        reader, _ = seats[1]
+        while True:
+            line = await self.read(reader)
+            if line[0] == "E":
+                break
+        self.assertEqual(line, ["E", "1"])
+        self.assertEqual(self.server.finished, 1)
+        self.assertEqual(self.server.matches, {})
+
+    async def test_turn_timer_plays_for_idle_players(self):
+        self.server.turn_timeout = 0.01
+        seats, _ = await self.start_match()
+        reader, _ = seats[0]
+        while True:
+            line = await asyncio.wait_for(reader.readline(), 30)
+            if line.startswith(b"E"):
+                break
+        self.assertIn(line.split()[1], (b"0", b"1"))
+
+
+class BotClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_rejected_moves_do_not_loop(self):
+        """На отказ бот пасует один раз, а на отказ паса ждет следующего состояния."""
+        received = []
+
+        async def handle(reader, writer):
+            async def expect():
+                line = await asyncio.wait_for(reader.readline(), 5)
+                received.append(line.decode("ascii").split())
+
+            async def silent():
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(reader.readline(), 0.2)
+
+            await expect()
+            writer.write(b"M 0 0\nX not your turn\n")
+            await silent()
+            writer.write(b"S A 0 0 0 30 6 0,1 " + b",".join([b"."] * 12) + b"\n")
+            await expect()
+            writer.write(b"X illegal move\n")
+            await expect()
+            writer.write(b"X illegal move\n")
+            await silent()
+            writer.write(b"E 1\n")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        bot = BotClient("127.0.0.1", port, games=1, think=0.0, latencies=[], rng=random.Random(0))
+        played = await asyncio.wait_for(bot.run(), 10)
+        server.close()
+        await server.wait_closed()
+        self.assertEqual(played, 1)
+        self.assertEqual([words[0] for words in received], ["Q", "A", "F"])
+
+
+class LoadTestTest(unittest.TestCase):
+
+    def test_bots_finish_their_games(self):
+        result = asyncio.run(load_test(matches=4, games=2, think=0.0, seed=1))
+        self.assertEqual(result["games"], 8)
+        self.assertGreater(result["moves"], 0)
+        self.assertLessEqual(result["peak_matches"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# test_sessions.py
+
+import random
+import tempfile
+import unittest
+
+from engine import OVER, Game, random_policy
+from card import Card
+from cardset import CardIndex
+from sessions import SnapshotCodec, SessionStore
+
+
+def _games(count, seed):
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = Game.new_game(rng)
+        for _ in range(rng.randrange(30)):
+            if game.phase == OVER:
+                break
+            game.step(random_policy(game, rng))
+        games.append(game)
+    return games
+
+
+def _advance(game, rng):
+    """Следующее состояние: ход, если партия не закончена."""
+    if game.phase != OVER:
+        game.step(random_policy(game, rng))
+
+
+class SessionStoreEvictionTest(unittest.TestCase):
+    """get и put не вытесняют партию, которую только что вернули или добавили."""
+
+    def check_changes_survive(self, store):
+        games = _games(5, 0)
+        for key, game in enumerate(games):
+            store.put(key, game)
+        rng = random.Random(1)
+        for key in (0, 3, 0, 4, 1):
+            game = store.get(key)
+            self.assertIs(store.get(key), game)
+            _advance(game, rng)
+            expected = game.snapshot()
+            store.get((key + 1) % 5)
+            self.assertEqual(store.get(key).snapshot(), expected)
+        for key in range(5):
+            self.assertEqual(store.pop(key).cards, games[0].cards)
+        self.assertEqual(len(store), 0)
+
+    def test_max_live_zero(self):
+        self.check_changes_survive(SessionStore(max_live=0))
+
+    def test_reloading_the_oldest_entry(self):
+        self.check_changes_survive(SessionStore(max_live=2))
+
+    def test_spilled_entries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.check_changes_survive(SessionStore(max_live=1, max_bytes=0, directory=directory))
+
+    def test_put_keeps_the_new_game_live(self):
+        store = SessionStore(max_live=0)
+        game = _games(1, 2)[0]
+        store.put("a", game)
+        self.assertIs(store.get("a"), game)
+        self.assertEqual(store.stats["live"], 1)
+
+
+class SnapshotCodecTest(unittest.TestCase):
+    """Снимок и восстановление дают ту же позицию, включая хэш и менеджер фракций."""
+
+    def assert_round_trip(self, codec, game):
+        data = codec.dump(game)
+        restored = codec.load(data)
+        self.assertEqual(restored.snapshot(), game.snapshot())
+        self.assertEqual(restored.hash, game.hash)
+        self.assertEqual(restored.turns, game.turns)
+        self.assertEqual(restored.winner, game.winner)
+        self.assertEqual(restored.known, game.known)
+        self.assertEqual(restored.faction_manager.slot_active, game.faction_manager.slot_active)
+        self.assertEqual(restored.faction_manager.slot_inactive, game.faction_manager.slot_inactive)
+        self.assertEqual(codec.dump(restored), data)
+        return restored
+
+    def test_every_position_of_random_games(self):
+        codec = SnapshotCodec()
+        rng = random.Random(3)
+        for _ in range(20):
+            game = Game.new_game(rng)
+            while True:
+                self.assert_round_trip(codec, game)
+                if game.phase == OVER:
+                    break
+                game.step(random_policy(game, rng))
+
+    def test_restored_game_plays_on_identically(self):
+        codec = SnapshotCodec()
+        for game in _games(10, 4):
+            restored = self.assert_round_trip(codec, game)
+            first, second = random.Random(5), random.Random(5)
+            while game.phase != OVER:
+                game.step(random_policy(game, first))
+                restored.step(random_policy(restored, second))
+                self.assertEqual(restored.snapshot(), game.snapshot())
+
+    def test_large_card_set(self):
+        cards = [Card.from_mask(f"Card {i}", i % 90 + 1, 1 << (i % 70)) for i in range(300)]
+        index = CardIndex(cards)
+        codec = SnapshotCodec(index)
+        rng = random.Random(6)
+        # 300 карт: номера карт - по два байта, маски фракций - 9 байт
+        game = Game(([cards[i] for i in range(6)], [cards[i] for i in range(6, 12)]),
+                    cards[12:], cards=index)
+        for _ in range(30):
+            if game.phase == OVER:
+                break
+            self.assert_round_trip(codec, game)
+            game.step(random_policy(game, rng))
+
+    def test_other_card_index_is_rejected(self):
+        game = _games(1, 7)[0]
+        codec = SnapshotCodec(CardIndex(game.cards.cards[:20]))
+        with self.assertRaises(ValueError):
+            codec.dump(game)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+# test_state.py
+
+import random
+import unittest
+
+from engine import OVER, Game, random_policy
+from state import TranspositionTable, full_hash
+
+
+def _played(seed, steps):
+    """Партия после steps случайных действий (или раньше, если закончилась)."""
+    rng = random.Random(seed)
+    game = Game.new_game(rng)
+    for _ in range(steps):
+        if game.phase == OVER:
+            break
+        game.step(random_policy(game, rng), validate=False)
+    return game
+
+
+class DrawPileHashTest(unittest.TestCase):
+    """Хэш и равенство снимков учитывают порядок колоды."""
+
+    def test_swapped_draw_pile_changes_hash_and_snapshot(self):
+        game = Game.new_game(random.Random(0))
+        for i in range(len(game.draw_pile) - 1):
+            other = game.copy()
+            pile = other.draw_pile
+            pile[i], pile[i + 1] = pile[i + 1], pile[i]
+            other.hash = full_hash(other)
+            self.assertNotEqual(other.hash, game.hash)
+            self.assertNotEqual(other.snapshot(), game.snapshot())
+
+    def test_reordered_draw_piles_do_not_collide(self):
+        game = Game.new_game(random.Random(1))
+        rng = random.Random(2)
+        seen = {}
+        for _ in range(2000):
+            other = game.copy()
+            rng.shuffle(other.draw_pile)
+            other.hash = full_hash(other)
+            order = tuple(card.name for card in other.draw_pile)
+            self.assertEqual(seen.setdefault(other.hash, order), order)
+
+    def test_same_position_is_equal_regardless_of_turns(self):
+        game = _played(3, 40)
+        other = game.copy()
+        other.turns += 10
+        self.assertEqual(other.snapshot(), game.snapshot())
+        self.assertEqual(hash(other.snapshot()), hash(game.snapshot()))
+
+    def test_from_snapshot_restores_the_same_position(self):
+        for seed in range(10):
+            game = _played(seed, 120)
+            restored = Game.from_snapshot(game.snapshot())
+            self.assertEqual(restored.snapshot(), game.snapshot())
+            self.assertEqual(full_hash(restored), game.hash)
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_store_and_get(self):
+        table = TranspositionTable(100)
+        table.store(5, "five")
+        self.assertEqual(table.get(5), "five")
+        self.assertIsNone(table.get(6))
+        self.assertEqual(table.get(6, "missing"), "missing")
+        self.assertEqual((table.hits, table.misses), (1, 2))
+        table.store(5, "again")
+        self.assertEqual(table.get(5), "again")
+        self.assertEqual(len(table), 1)
+
+    def test_size_is_rounded_to_a_power_of_two(self):
+        table = TranspositionTable(100)
+        # 128 корзин: ключи 1 и 129 попадают в одну корзину, 1 и 65 - в разные
+        table.store(1, "a")
+        table.store(65, "b")
+        table.store(129, "c")
+        self.assertEqual((table.get(1), table.get(65), table.get(129)), ("a", "b", "c"))
+
+    def test_deeper_entries_survive_collisions(self):
+        table = TranspositionTable(16)
+        table.store(1, "deep", depth=5)
+        table.store(17, "shallow", depth=1)
+        table.store(33, "newer", depth=2)
+        self.assertEqual(table.get(1), "deep")
+        self.assertIsNone(table.get(17))   # Вторая запись заменяется всегда
+        self.assertEqual(table.get(33), "newer")
+        table.store(49, "deeper", depth=7)
+        self.assertEqual(table.get(49), "deeper")
+        self.assertEqual(table.get(1), "deep")   # Вытесненная запись ушла во вторую
+        self.assertIsNone(table.get(33))
+
+    def test_new_generation_replaces_deep_entries(self):
+        table = TranspositionTable(16)
+        table.store(1, "old", depth=9)
+        table.new_generation()
+        table.store(17, "new", depth=0)
+        self.assertEqual(table.get(17), "new")
+        self.assertEqual(table.get(1), "old")
+
+    def test_clear(self):
+        table = TranspositionTable(16)
+        for key in range(40):
+            table.store(key, key)
+        table.get(3)
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertEqual((table.hits, table.misses), (0, 0))
+        self.assertIsNone(table.get(3))
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def test_replayed_positions_are_found_in_a_dict(self):
+        # Две независимо сыгранные одинаковые партии: снимки равны и находятся по ключу
+        positions = {}
+        for _ in range(2):
+            rng = random.Random(6)
+            game = Game.new_game(rng)
+            step = 0
+            while game.phase != OVER:
+                snapshot = game.snapshot()
+                self.assertEqual(snapshot.key, game.hash)
+                self.assertEqual(positions.setdefault(snapshot, step), step)
+                game.step(random_policy(game, rng), validate=False)
+                step += 1
+        self.assertEqual(len(positions), step)
+
+    def test_snapshot_is_immutable_and_independent(self):
+        game = _played(4, 10)
+        snapshot = game.snapshot()
+        with self.assertRaises(AttributeError):
+            snapshot.phase = OVER
+        before = snapshot.faction_manager.active_union
+        rng = random.Random(5)
+        while game.phase != OVER:
+            game.step(random_policy(game, rng), validate=False)
+        self.assertEqual(snapshot.faction_manager.active_union, before)
+        self.assertEqual(Game.from_snapshot(snapshot).snapshot(), snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
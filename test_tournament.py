@@ -0,0 +1,53 @@
+# test_tournament.py
+
+import csv
+import os
+import tempfile
+import unittest
+
+from tournament import Tournament
+
+
+class TournamentResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, "results.csv")
+
+    def rows(self):
+        with open(self.output, newline="") as source:
+            return list(csv.DictReader(source))
+
+    def test_resume_skips_played_games(self):
+        with Tournament(["random", "greedy"], self.output, workers=1, seed=3) as tournament:
+            first = tournament.round_robin(4)
+        with Tournament(["random", "greedy"], self.output, workers=1, seed=3) as tournament:
+            resumed = tournament.round_robin(4)
+        self.assertEqual(len(self.rows()), 4)
+        self.assertEqual(resumed, first)
+
+    def test_seeded_policies_replay_the_same_games(self):
+        with Tournament(["random", "greedy"], self.output, workers=1, seed=5) as tournament:
+            first = tournament.round_robin(4)
+        os.remove(self.output)
+        with Tournament(["random", "greedy"], self.output, workers=1, seed=5) as tournament:
+            self.assertEqual(tournament.round_robin(4), first)
+
+    def test_resume_with_another_seed_raises(self):
+        with Tournament(["random", "greedy"], self.output, workers=1, seed=1) as tournament:
+            tournament.round_robin(2)
+        with Tournament(["random", "greedy"], self.output, workers=1, seed=2) as tournament:
+            with self.assertRaises(ValueError):
+                tournament.round_robin(2)
+
+    def test_resume_with_other_policies_raises(self):
+        with Tournament(["random", "greedy"], self.output, workers=1, seed=1) as tournament:
+            tournament.round_robin(2)
+        with Tournament(["greedy", "random"], self.output, workers=1, seed=1) as tournament:
+            with self.assertRaises(ValueError):
+                tournament.round_robin(2)
+
+
+if __name__ == "__main__":
+    unittest.main()
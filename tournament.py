@@ -0,0 +1,317 @@
+# tournament.py
+
+import csv
+import importlib
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import greedy_policy, play_game, random_policy
+
+RESULT_FIELDS = ("game", "first", "second", "winner", "turns", "seed")
+ELO_SCALE = 400 / math.log(10)
+CONFIDENCE_Z = 1.96       # 95% доверительный интервал
+GLICKO_PERIOD = 100       # Партий в одном рейтинговом периоде Glicko
+
+
+def _mcts(time_budget="0.1"):
+    from mcts import MCTSPlayer
+    return MCTSPlayer(time_budget=float(time_budget), workers=1)
+
+
+# Встроенные политики: имя -> фабрика. Спецификация "имя:аргумент" передает
+# аргумент фабрике (например "mcts:0.5"), "модуль:функция" подключает свою политику
+POLICIES = {
+    "random": lambda: random_policy,
+    "greedy": lambda: greedy_policy,
+    "mcts": _mcts,
+}
+
+# Политики, созданные в этом процессе (у MCTS есть пул и таблица транспозиций)
+_instances = {}
+
+
+def make_policy(spec):
+    """Политика engine по спецификации; создается один раз на процесс."""
+    policy = _instances.get(spec)
+    if policy is None:
+        name, _, argument = spec.partition(":")
+        if name in POLICIES:
+            policy = POLICIES[name](argument) if argument else POLICIES[name]()
+        else:
+            policy = getattr(importlib.import_module(name), argument)
+        _instances[spec] = policy
+    return policy
+
+
+def game_seed(seed, game_id):
+    """Сид партии, зависящий только от сида турнира и номера партии."""
+    return random.Random(f"{seed}:{game_id}").getrandbits(64)
+
+
+def _play(task):
+    game_id, first, second, seed = task
+    game = play_game((make_policy(first), make_policy(second)), random.Random(seed))
+    winner = "" if game.winner is None else (first, second)[game.winner]
+    return game_id, first, second, winner, game.turns, seed
+
+
+def round_robin(policies, games_per_pair):
+    """Пары (первый, второй) для круговой схемы; места чередуются."""
+    pairs = []
+    for i, first in enumerate(policies):
+        for second in policies[i + 1:]:
+            for n in range(games_per_pair):
+                pairs.append((first, second) if n % 2 == 0 else (second, first))
+    return pairs
+
+
+def swiss_pairings(policies, scores, played):
+    """
+    Пары одного тура швейцарской системы.
+
+    Участники упорядочены по очкам; каждый играет с ближайшим ниже по
+    таблице, с кем еще не встречался (если таких нет - с ближайшим).
+    При нечетном числе последний в таблице пропускает тур.
+    """
+    standings = sorted(policies, key=lambda name: (-scores[name], policies.index(name)))
+    pairs = []
+    while len(standings) > 1:
+        first = standings.pop(0)
+        opponent = next((name for name in standings if frozenset((first, name)) not in played),
+                        standings[0])
+        standings.remove(opponent)
+        pairs.append((first, opponent))
+    return pairs
+
+
+class Tournament:
+    """
+    Турнир политик engine на пуле процессов.
+
+    Каждая партия получает сид game_seed(seed, номер), поэтому результаты
+    не зависят от числа процессов и порядка выполнения - для политик,
+    которые зависят только от позиции и rng (random, greedy). MCTS
+    ограничена временем, а не числом итераций, и с тем же сидом играет
+    по-разному: ее партии не воспроизводятся.
+
+    Результаты построчно дописываются в CSV (output) по мере готовности;
+    при повторном запуске с тем же файлом сыгранные партии пропускаются.
+    Строка файла должна совпадать с заданием партии (первый, второй, сид),
+    иначе play вызывает ValueError: файл от другого турнира.
+    """
+
+    def __init__(self, policies, output, workers=None, seed=0, chunk_size=16):
+        self.policies = list(policies)
+        self.output = output
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.results = []
+        self._executor = None
+        self._next_game = 0
+        self._done = {}
+        if os.path.exists(output):
+            with open(output, newline="") as source:
+                for row in csv.DictReader(source):
+                    self._done[int(row["game"])] = row
+
+    def play(self, pairs):
+        """Играет партии для списка пар (первый, второй); возвращает их результаты."""
+        tasks = []
+        results = []
+        for first, second in pairs:
+            game_id = self._next_game
+            self._next_game += 1
+            seed = game_seed(self.seed, game_id)
+            if game_id in self._done:
+                row = self._done[game_id]
+                if (row["first"], row["second"], row["seed"]) != (first, second, str(seed)):
+                    raise ValueError(f"Game {game_id} in '{self.output}' is {row['first']} vs "
+                                     f"{row['second']} with seed {row['seed']}, expected {first} vs "
+                                     f"{second} with seed {seed}: the file is from another tournament")
+                results.append((game_id, row["first"], row["second"], row["winner"],
+                                int(row["turns"]), int(row["seed"])))
+            else:
+                tasks.append((game_id, first, second, seed))
+
+        new_file = not os.path.exists(self.output)
+        with open(self.output, "a", newline="") as output:
+            writer = csv.writer(output)
+            if new_file:
+                writer.writerow(RESULT_FIELDS)
+            if self.workers == 1:
+                played = map(_play, tasks)
+                self._write(played, writer, output, results)
+            elif tasks:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                chunk = max(1, min(self.chunk_size, len(tasks) // (self.workers * 4)))
+                self._write(self._executor.map(_play, tasks, chunksize=chunk), writer, output, results)
+        results.sort()
+        self.results.extend(results)
+        return results
+
+    def _write(self, played, writer, output, results):
+        for result in played:
+            writer.writerow(result)
+            output.flush()
+            results.append(result)
+
+    def close(self):
+        """Останавливает пул процессов."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def round_robin(self, games_per_pair):
+        return self.play(round_robin(self.policies, games_per_pair))
+
+    def swiss(self, rounds, games_per_pair):
+        """Швейцарская система: rounds туров, в каждой паре games_per_pair партий."""
+        scores = dict.fromkeys(self.policies, 0.0)
+        played = set()
+        for _ in range(rounds):
+            pairs = swiss_pairings(self.policies, scores, played)
+            schedule = []
+            for first, second in pairs:
+                played.add(frozenset((first, second)))
+                schedule += [(first, second) if n % 2 == 0 else (second, first)
+                             for n in range(games_per_pair)]
+            for _, first, second, winner, _, _ in self.play(schedule):
+                for name in (first, second):
+                    scores[name] += 1.0 if winner == name else 0.5 if not winner else 0.0
+        return self.results
+
+
+def _score(result, name):
+    winner = result[3]
+    return 0.5 if not winner else 1.0 if winner == name else 0.0
+
+
+def elo_ratings(results, anchor=1500, iterations=200):
+    """
+    Рейтинги Эло по модели Брэдли-Терри (максимум правдоподобия, ничья - пол-очка).
+
+    Не зависят от порядка партий. Интервал - z * стандартная ошибка по
+    информации Фишера для каждого участника при фиксированных остальных.
+
+    Returns:
+        dict: {политика: (рейтинг, полуширина 95% интервала)}; средний рейтинг = anchor
+    """
+    names = sorted({name for result in results for name in result[1:3]})
+    wins = dict.fromkeys(names, 0.0)
+    games = {}
+    for result in results:
+        first, second = result[1], result[2]
+        wins[first] += _score(result, first)
+        wins[second] += _score(result, second)
+        key = (first, second) if first < second else (second, first)
+        games[key] = games.get(key, 0) + 1
+
+    # MM-итерации для сил gamma. Фиктивная ничья с соперником силы 1 не дает
+    # силе уйти в 0 или бесконечность, если политика выиграла или проиграла все партии
+    strength = dict.fromkeys(names, 1.0)
+    for _ in range(iterations):
+        updated = {}
+        for name in names:
+            denominator = 1.0 / (strength[name] + 1.0)
+            for (a, b), count in games.items():
+                if name in (a, b):
+                    other = b if name == a else a
+                    denominator += count / (strength[name] + strength[other])
+            updated[name] = (wins[name] + 0.5) / denominator
+        mean = math.exp(sum(math.log(value) for value in updated.values()) / len(names))
+        strength = {name: value / mean for name, value in updated.items()}
+
+    ratings = {}
+    for name in names:
+        information = 0.0
+        for (a, b), count in games.items():
+            if name in (a, b):
+                other = b if name == a else a
+                p = strength[name] / (strength[name] + strength[other])
+                information += count * p * (1 - p)
+        error = ELO_SCALE / math.sqrt(information) if information else float("inf")
+        ratings[name] = (anchor + ELO_SCALE * math.log(strength[name]), CONFIDENCE_Z * error)
+    return ratings
+
+
+def glicko_ratings(results, period=GLICKO_PERIOD, initial=1500.0, deviation=350.0):
+    """
+    Рейтинги Glicko-1: партии в порядке номеров, по period партий в рейтинговом периоде.
+
+    Returns:
+        dict: {политика: (рейтинг, полуширина 95% интервала = z * RD)}
+    """
+    q = math.log(10) / 400
+    ratings = {}
+    results = sorted(results)
+    for start in range(0, len(results), period):
+        batch = results[start:start + period]
+        for result in batch:
+            for name in result[1:3]:
+                ratings.setdefault(name, (initial, deviation))
+        previous = dict(ratings)
+        for name in {name for result in batch for name in result[1:3]}:
+            rating, rd = previous[name]
+            d_inverse = 0.0
+            delta = 0.0
+            for result in batch:
+                if name not in result[1:3]:
+                    continue
+                other = result[2] if result[1] == name else result[1]
+                other_rating, other_rd = previous[other]
+                g = 1 / math.sqrt(1 + 3 * q * q * other_rd * other_rd / math.pi ** 2)
+                expected = 1 / (1 + 10 ** (-g * (rating - other_rating) / 400))
+                d_inverse += q * q * g * g * expected * (1 - expected)
+                delta += g * (_score(result, name) - expected)
+            new_rd = 1 / math.sqrt(1 / (rd * rd) + d_inverse)
+            ratings[name] = (rating + q * new_rd * new_rd * delta, new_rd)
+    return {name: (rating, CONFIDENCE_Z * rd) for name, (rating, rd) in ratings.items()}
+
+
+def print_ratings(results):
+    elo = elo_ratings(results)
+    glicko = glicko_ratings(results)
+    print(f"{'policy':<24}{'games':>7}{'score':>8}{'Elo':>14}{'Glicko':>14}")
+    for name in sorted(elo, key=lambda name: -elo[name][0]):
+        played = [result for result in results if name in result[1:3]]
+        score = sum(_score(result, name) for result in played)
+        print(f"{name:<24}{len(played):>7}{score:>8.1f}"
+              f"{elo[name][0]:>8.0f} ±{elo[name][1]:<4.0f}{glicko[name][0]:>8.0f} ±{glicko[name][1]:<4.0f}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Play a tournament between engine policies.")
+    parser.add_argument("policies", nargs="+", help="random, greedy, mcts[:seconds] or module:function")
+    parser.add_argument("--games", type=int, default=100, help="games per pairing")
+    parser.add_argument("--swiss", type=int, metavar="ROUNDS", help="play a Swiss schedule instead of round-robin")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="tournament.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with Tournament(args.policies, args.output, args.workers, args.seed) as tournament:
+        if args.swiss:
+            results = tournament.swiss(args.swiss, args.games)
+        else:
+            results = tournament.round_robin(args.games)
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} games in {elapsed:.1f}s on {tournament.workers} workers "
+          f"({len(results) / elapsed:.1f} games/s), results in {args.output}")
+    print_ratings(results)
+
+
+if __name__ == "__main__":
+    main()
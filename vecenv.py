@@ -0,0 +1,379 @@
+# vecenv.py
+
+import numpy as np
+
+from cardset import default_index
+from deck import RECYCLE_LIMIT
+from engine import HAND_SIZE, TABLE_SIZE
+
+# Фазы (как engine.ATTACK / DEFENSE / OVER)
+ATTACK, DEFENSE, OVER = 0, 1, 2
+_BIG = 1 << 30           # Ранг-заглушка для пустых позиций при сортировке
+
+
+class VectorGame:
+    """
+    n_games партий, которые делают ход одновременно; все состояние в массивах NumPy.
+
+    hands (партии, 2, карты) bool, discard (партии, карты) bool;
+    колода - deck (партии, карты) int16, верх - позиция deck_len - 1;
+    table (партии, 2 * table_size) int16 - номер карты в слоте или -1
+    (атака пары j - слот j * 2, защита - j * 2 + 1, как у FactionManager);
+    slot_active и slot_inactive (партии, 2 * table_size) int64 - маски
+    фракций слотов, active - активные фракции (те же правила, что у
+    FactionManager). table_size - число пар стола, как engine.TABLE_SIZE.
+
+    Действие партии - множество карт (строка bool): в фазе атаки это
+    карты атаки (пустое множество - закончить ход), в фазе защиты - карты
+    защиты для всех непокрытых атак (пустое - забрать карты). Защита
+    раскладывается по атакам в порядке рангов: если покрытие существует,
+    такое сопоставление его находит. Правила проверяются сразу для всех
+    партий; недопустимое действие вызывает ValueError.
+    Колода перемешивается пакетно (argsort случайных ключей), сброс
+    замешивается в колоду так же, когда ее не хватает для добора, но не
+    больше RECYCLE_LIMIT раз за партию (recycles), как в engine.Game.
+    """
+
+    def __init__(self, n_games, seed=None, cards=None, table_size=TABLE_SIZE):
+        index = cards or default_index()
+        if any(mask >> 63 for mask in index.faction_masks):
+            raise ValueError("VectorGame supports faction IDs up to 63")
+        size = len(index)
+        self.cards = index
+        self.n_games = n_games
+        self.table_size = table_size
+        self.ranks = np.array(index.ranks, np.int32)
+        self.faction_masks = np.array(index.faction_masks, np.int64)
+        self.all_factions = np.bitwise_or.reduce(self.faction_masks)
+        self.rng = np.random.default_rng(seed)
+        self._games = np.arange(n_games)
+        self._positions = np.arange(size)
+        self.hands = np.zeros((n_games, 2, size), bool)
+        self.discard = np.zeros((n_games, size), bool)
+        self.deck = np.zeros((n_games, size), np.int16)
+        self.deck_len = np.zeros(n_games, np.int32)
+        self.table = np.full((n_games, 2 * table_size), -1, np.int16)
+        self.slot_active = np.zeros((n_games, 2 * table_size), np.int64)
+        self.slot_inactive = np.zeros((n_games, 2 * table_size), np.int64)
+        self.active = np.zeros(n_games, np.int64)
+        self.attacker = np.zeros(n_games, np.int8)
+        self.phase = np.zeros(n_games, np.int8)
+        self.turns = np.zeros(n_games, np.int32)
+        self.recycles = np.zeros(n_games, np.int8)
+        self.winner = np.full(n_games, -1, np.int8)
+        self.reset()
+
+    def reset(self, games=None):
+        """Новые партии (все или с номерами games): пакетное перемешивание и раздача."""
+        games = self._games if games is None else np.asarray(games)
+        count = len(games)
+        size = len(self.cards)
+        order = np.argsort(self.rng.random((count, size)), axis=1).astype(np.int16)
+        self.deck[games] = order
+        self.deck_len[games] = size - 2 * HAND_SIZE
+
+        # Раздача как в engine.Game.new_game: с верха колоды по одной карте игрокам 0 и 1
+        dealt = order[:, size - 2 * HAND_SIZE:][:, ::-1]
+        players = np.tile([0, 1], HAND_SIZE)
+        self.hands[games] = False
+        self.hands[games[:, None], players[None, :], dealt] = True
+        self.discard[games] = False
+        self.table[games] = -1
+        self.slot_active[games] = 0
+        self.slot_inactive[games] = 0
+        self.active[games] = 0
+        self.phase[games] = ATTACK
+        self.turns[games] = 0
+        self.recycles[games] = 0
+        self.winner[games] = -1
+        lowest = np.where(self.hands[games], self.ranks, _BIG).min(axis=2)
+        self.attacker[games] = lowest[:, 1] < lowest[:, 0]
+
+    @property
+    def to_move(self):
+        return np.where(self.phase == ATTACK, self.attacker, 1 - self.attacker)
+
+    def own_hands(self):
+        """(партии, карты): рука игрока, который сейчас ходит."""
+        return self.hands[self._games, self.to_move]
+
+    def table_cards(self):
+        """(партии, карты): карты на столе."""
+        mask = np.zeros(self.discard.shape, bool)
+        rows, slots = np.nonzero(self.table >= 0)
+        mask[rows, self.table[rows, slots]] = True
+        return mask
+
+    # Проверка правил для всех партий сразу
+
+    def _rows(self, games):
+        return self._games if games is None else np.asarray(games)
+
+    def valid_attacks(self, selected, games=None):
+        """
+        FactionManager.validate_multiple_cards и свободные слоты для множеств карт selected.
+
+        Если задан games (номера партий), строки selected относятся к этим партиям.
+        """
+        rows = self._rows(games)
+        count = selected.sum(axis=1)
+        hand = self.hands[rows, self.attacker[rows]]
+        in_hand = ~(selected & ~hand).any(axis=1)
+        free = (self.table[rows, 0::2] < 0).sum(axis=1)
+        active = self.active[rows]
+        common = np.bitwise_and.reduce(np.where(selected, self.faction_masks, self.all_factions), axis=1)
+        factions = np.where(active == 0, (count == 1) | (common != 0), (common & active) != 0)
+        return (self.phase[rows] == ATTACK) & (count >= 1) & in_hand & (count <= free) & factions
+
+    def valid_defenses(self, selected, games=None):
+        """Проверка рангов: отсортированные карты защиты строго старше отсортированных атак."""
+        rows = self._rows(games)
+        table = self.table[rows]
+        uncovered = (table[:, 0::2] >= 0) & (table[:, 1::2] < 0)
+        count = selected.sum(axis=1)
+        hand = self.hands[rows, 1 - self.attacker[rows]]
+        in_hand = ~(selected & ~hand).any(axis=1)
+        attacks = np.sort(np.where(uncovered, self.ranks[table[:, 0::2]], _BIG), axis=1)
+        defenses = np.sort(np.where(selected, self.ranks, _BIG), axis=1)[:, :self.table_size]
+        ranks_ok = ((defenses > attacks) | (attacks == _BIG)).all(axis=1)
+        return (self.phase[rows] == DEFENSE) & (count == uncovered.sum(axis=1)) & in_hand & ranks_ok
+
+    def valid_single_attacks(self, games=None):
+        """(партии, карты): карты, которыми можно атаковать по одной."""
+        rows = self._rows(games)
+        active = self.active[rows, None]
+        hand = self.hands[rows, self.attacker[rows]]
+        matches = (active == 0) | ((self.faction_masks & active) != 0)
+        free = (self.table[rows, 0::2] < 0).any(axis=1) & (self.phase[rows] == ATTACK)
+        return hand & matches & free[:, None]
+
+    def cover(self, games=None):
+        """
+        (партии, карты): жадная защита как в movegen.find_cover - каждой атаке,
+        начиная с младшей, самая младшая подходящая карта; пустая строка,
+        если покрыть нельзя или партия не в фазе защиты.
+        """
+        rows = self._rows(games)
+        table = self.table[rows]
+        possible = self.phase[rows] == DEFENSE
+        available = self.hands[rows, 1 - self.attacker[rows]] & possible[:, None]
+        uncovered = (table[:, 0::2] >= 0) & (table[:, 1::2] < 0)
+        attack_ranks = np.sort(np.where(uncovered, self.ranks[table[:, 0::2]], _BIG), axis=1)
+        selected = np.zeros(available.shape, bool)
+        local = np.arange(len(rows))
+        for i in range(self.table_size):
+            rank = attack_ranks[:, i]
+            pending = rank < _BIG
+            if not pending.any():
+                break
+            candidates = available & (self.ranks > rank[:, None])
+            best = np.argmin(np.where(candidates, self.ranks, _BIG), axis=1)
+            found = candidates[local, best]
+            possible &= found | ~pending
+            take = pending & found
+            selected[local[take], best[take]] = True
+            available[local[take], best[take]] = False
+        selected[~possible] = False
+        return selected
+
+    # Ход
+
+    def step(self, actions):
+        """
+        Применяет действия (партии, карты) bool всех незаконченных партий.
+
+        Returns:
+            ndarray: winner после хода - -1 (идет), 0 или 1
+        """
+        actions = np.asarray(actions, bool)
+        live = self.phase != OVER
+        empty = ~actions.any(axis=1)
+        attack = live & (self.phase == ATTACK)
+        defense = live & (self.phase == DEFENSE)
+        on_table = (self.table[:, 0::2] >= 0).any(axis=1)
+        finish = attack & empty
+        take = defense & empty
+        play = attack & ~empty
+        defend = defense & ~empty
+        ok = np.ones(self.n_games, bool)
+        ok[finish] = on_table[finish]
+        if play.any():
+            ok[play] = self.valid_attacks(actions[play], np.flatnonzero(play))
+        if defend.any():
+            ok[defend] = self.valid_defenses(actions[defend], np.flatnonzero(defend))
+        if not ok.all():
+            raise ValueError(f"Illegal actions in games {np.flatnonzero(~ok)[:10].tolist()}")
+
+        if play.any():
+            self._attack(np.flatnonzero(play), actions)
+        if defend.any():
+            self._defend(np.flatnonzero(defend), actions)
+        if finish.any() or take.any():
+            self._end_turn(np.flatnonzero(finish), np.flatnonzero(take))
+        return self.winner.copy()
+
+    def _add_factions(self, rows, slots, masks):
+        """FactionManager.add_card_factions для строк rows: карта с масками masks в слоты slots."""
+        narrow = self.active[rows] != 0
+        slot_active = self.slot_active[rows]
+        slot_inactive = self.slot_inactive[rows]
+        slot_active[np.arange(len(rows)), slots] = masks
+        slot_inactive[narrow] |= slot_active[narrow] & ~masks[narrow, None]
+        slot_active[narrow] &= masks[narrow, None]
+        self.slot_active[rows] = slot_active
+        self.slot_inactive[rows] = slot_inactive
+        self.active[rows] = (np.bitwise_or.reduce(slot_active, axis=1)
+                             & ~np.bitwise_or.reduce(slot_inactive, axis=1))
+
+    def _attack(self, rows, actions):
+        # Карты атаки по возрастанию номера ложатся в свободные пары по порядку
+        selected = actions[rows]
+        cards = np.argsort(~selected, axis=1, kind='stable')[:, :self.table_size]
+        count = selected.sum(axis=1)
+        free_pairs = np.argsort(self.table[rows, 0::2] >= 0, axis=1, kind='stable')
+        attacker = self.attacker[rows]
+        for i in range(self.table_size):
+            placing = count > i
+            if not placing.any():
+                break
+            games, card = rows[placing], cards[placing, i]
+            slot = 2 * free_pairs[placing, i]
+            self.table[games, slot] = card
+            self.hands[games, attacker[placing], card] = False
+            self._add_factions(games, slot, self.faction_masks[card])
+        self.phase[rows] = DEFENSE
+
+    def _defend(self, rows, actions):
+        # k-я по рангу карта защиты покрывает k-ю по рангу непокрытую атаку
+        table = self.table[rows]
+        uncovered = (table[:, 0::2] >= 0) & (table[:, 1::2] < 0)
+        attack_ranks = np.where(uncovered, self.ranks[table[:, 0::2]], _BIG)
+        pairs = np.argsort(attack_ranks, axis=1, kind='stable')
+        cards = np.argsort(np.where(actions[rows], self.ranks, _BIG), axis=1, kind='stable')[:, :self.table_size]
+        count = uncovered.sum(axis=1)
+        defender = 1 - self.attacker[rows]
+        placed = np.full((len(rows), self.table_size), -1, np.int16)
+        for i in range(self.table_size):
+            placing = count > i
+            placed[np.flatnonzero(placing), pairs[placing, i]] = cards[placing, i]
+        # Фракции добавляются в порядке слотов, как в engine.Game._defend
+        for pair in range(self.table_size):
+            placing = placed[:, pair] >= 0
+            if not placing.any():
+                continue
+            games, card = rows[placing], placed[placing, pair]
+            self.table[games, 2 * pair + 1] = card
+            self.hands[games, defender[placing], card] = False
+            self._add_factions(games, np.full(len(games), 2 * pair + 1), self.faction_masks[card])
+        self.phase[rows] = ATTACK
+
+    def _end_turn(self, finished, taken):
+        on_table = self.table_cards()
+        self.discard[finished] |= on_table[finished]
+        self.hands[taken, 1 - self.attacker[taken]] |= on_table[taken]
+        rows = np.concatenate([finished, taken])
+        self.table[rows] = -1
+        self.slot_active[rows] = 0
+        self.slot_inactive[rows] = 0
+        self.active[rows] = 0
+        self.turns[rows] += 1
+
+        attacker = self.attacker[rows]
+        attacker_empty = ~self.hands[rows, attacker].any(axis=1)
+        defender_empty = ~self.hands[rows, 1 - attacker].any(axis=1)
+        is_finish = np.arange(len(rows)) < len(finished)
+        winner = np.where(attacker_empty, attacker,
+                          np.where(is_finish & defender_empty, 1 - attacker, -1))
+        over = winner >= 0
+        self.winner[rows[over]] = winner[over]
+        self.phase[rows[over]] = OVER
+
+        going = rows[~over]
+        going_attacker = attacker[~over]
+        self._refill(going, going_attacker)
+        self._refill(going, 1 - going_attacker)
+        swap = going[is_finish[~over]]
+        self.attacker[swap] = 1 - self.attacker[swap]
+        self.phase[going] = ATTACK
+
+    def _refill(self, rows, players):
+        if not len(rows):
+            return
+        need = np.maximum(HAND_SIZE - self.hands[rows, players].sum(axis=1), 0)
+        recycle = ((need > self.deck_len[rows]) & self.discard[rows].any(axis=1)
+                   & (self.recycles[rows] < RECYCLE_LIMIT))
+        if recycle.any():
+            self._recycle(rows[recycle])
+        deck_len = self.deck_len[rows]
+        count = np.minimum(need, deck_len)
+        drawn = ((self._positions >= (deck_len - count)[:, None])
+                 & (self._positions < deck_len[:, None]))
+        which, positions = np.nonzero(drawn)
+        self.hands[rows[which], players[which], self.deck[rows[which], positions]] = True
+        self.deck_len[rows] = deck_len - count
+
+    def _recycle(self, rows):
+        """Сброс в случайном порядке уходит под колоду, порядок оставшейся колоды сохраняется."""
+        keys = np.where(self.discard[rows], self.rng.random(self.discard[rows].shape), np.inf)
+        in_deck = self._positions < self.deck_len[rows][:, None]
+        which, positions = np.nonzero(in_deck)
+        keys[which, self.deck[rows[which], positions]] = 2 + positions
+        self.deck_len[rows] += self.discard[rows].sum(axis=1)
+        self.deck[rows] = np.argsort(keys, axis=1)
+        self.discard[rows] = False
+        self.recycles[rows] += 1
+
+
+def random_actions(game, rng):
+    """
+    Пакетная политика: атака случайной допустимой картой (или конец хода с
+    вероятностью 1/4, если на столе уже есть карты), защита жадным покрытием,
+    иначе забрать карты.
+    """
+    actions = np.zeros(game.discard.shape, bool)
+    attacking = np.flatnonzero(game.phase == ATTACK)
+    singles = game.valid_single_attacks(attacking)
+    choice = np.argmax(np.where(singles, rng.random(singles.shape), -1.0), axis=1)
+    on_table = (game.table[attacking, 0::2] >= 0).any(axis=1)
+    attack = singles.any(axis=1) & ~(on_table & (rng.random(len(attacking)) < 0.25))
+    actions[attacking[attack], choice[attack]] = True
+    defending = np.flatnonzero(game.phase == DEFENSE)
+    actions[defending] = game.cover(defending)
+    return actions
+
+
+def main():
+    import random
+    import sys
+    import time
+    from engine import Game, greedy_policy, random_policy
+
+    n_games = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    game = VectorGame(n_games, seed=0)
+    rng = np.random.default_rng(1)
+    finished = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        game.step(random_actions(game, rng))
+        done = np.flatnonzero(game.phase == OVER)
+        finished += len(done)
+        game.reset(done)
+    elapsed = time.perf_counter() - start
+    print(f"VectorGame: {n_games} games x {steps} steps in {elapsed:.2f}s "
+          f"({n_games * steps / elapsed:,.0f} game-steps/s, {finished} games finished)")
+
+    rng = random.Random(0)
+    total = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 2:
+        state = Game.new_game(rng)
+        while not state.is_over and total < 10 ** 6:
+            state.step((greedy_policy, random_policy)[state.to_move](state, rng))
+            total += 1
+    elapsed = time.perf_counter() - start
+    print(f"engine.Game: {total / elapsed:,.0f} game-steps/s")
+
+
+if __name__ == "__main__":
+    main()